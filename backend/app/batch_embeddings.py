@@ -0,0 +1,164 @@
+from __future__ import annotations
+
+import functools
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Iterator, Sequence
+
+import numpy as np
+
+from .config import get_settings
+from .embeddings import get_voyage_client, hash_embeddings
+from .metrics import external_call
+
+logger = logging.getLogger(__name__)
+
+ProgressCallback = Callable[[int, int], None]
+
+_RETRYABLE_NAMES = ("RateLimitError", "ServiceUnavailableError", "ServerError", "Timeout", "APIConnectionError", "TryAgain")
+
+
+@functools.cache
+def _retryable_errors() -> tuple[type[Exception], ...]:
+    import voyageai
+
+    return tuple(getattr(voyageai.error, name) for name in _RETRYABLE_NAMES if hasattr(voyageai.error, name))
+
+
+class EmbeddingBatchError(RuntimeError):
+    pass
+
+
+def estimate_tokens(text: str) -> int:
+    # Conservative upper bound (~3 chars per token) so batches stay under the provider limit.
+    return len(text) // 3 + 1
+
+
+def plan_batches(texts: Sequence[str], max_items: int, max_tokens: int) -> Iterator[tuple[int, int]]:
+    """Yield ``(start, end)`` slices that respect both the item and token budgets."""
+    start = 0
+    tokens = 0
+    for idx, text in enumerate(texts):
+        cost = estimate_tokens(text)
+        if idx > start and (idx - start >= max_items or tokens + cost > max_tokens):
+            yield start, idx
+            start = idx
+            tokens = 0
+        tokens += cost
+    if start < len(texts):
+        yield start, len(texts)
+
+
+class _Backoff:
+    """Shared pause so one rate-limited worker slows every worker down."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._resume_at = 0.0
+
+    def wait(self) -> None:
+        delay = self._resume_at - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+    def trip(self, delay: float) -> None:
+        with self._lock:
+            self._resume_at = max(self._resume_at, time.monotonic() + delay)
+
+
+def _embed_batch(texts: list[str], input_type: str, backoff: _Backoff) -> list[list[float]]:
+    settings = get_settings()
+    client = get_voyage_client()
+    for attempt in range(settings.voyage_max_retries + 1):
+        backoff.wait()
+        try:
+            with external_call("voyage", "embed_batch"):
+                response = client.embed(texts, model=settings.voyage_model, input_type=input_type)
+            return response.embeddings
+        except _retryable_errors() as exc:
+            if attempt == settings.voyage_max_retries:
+                raise EmbeddingBatchError(
+                    f"Voyage embedding failed after {attempt + 1} attempts: {exc}"
+                ) from exc
+            delay = min(settings.voyage_backoff_max, settings.voyage_backoff_base * 2**attempt)
+            delay *= 0.5 + random.random()
+            logger.warning("Voyage request throttled (%s); retrying in %.1fs.", exc, delay)
+            backoff.trip(delay)
+    raise AssertionError("unreachable")
+
+
+def embed_in_batches(
+    texts: Sequence[str],
+    input_type: str = "document",
+    progress: ProgressCallback | None = None,
+) -> list[list[float]]:
+    total = len(texts)
+    if not total:
+        return []
+
+    settings = get_settings()
+    if not settings.voyage_api_key:
+        logger.warning("VOYAGE_API_KEY missing; using deterministic fallback embeddings.")
+        vectors = hash_embeddings(texts, dtype=np.float64).tolist()
+        if progress:
+            progress(total, total)
+        return vectors
+
+    if settings.embedding_store_enabled:
+        # Text already embedded by this model (an earlier rebuild, a re-ingest)
+        # comes from Postgres; only new text reaches the provider.
+        from .embedding_store import embed_with_store
+
+        def embed_missing(missing: list[str]) -> tuple[list[list[float]], str]:
+            stored = total - len(missing)
+            on_progress = (lambda done, _: progress(stored + done, total)) if progress else None
+            return _embed_all(missing, input_type, on_progress), "voyage"
+
+        vectors = embed_with_store(texts, input_type, embed_missing)
+        if progress:
+            progress(total, total)
+        return vectors
+
+    return _embed_all(texts, input_type, progress)
+
+
+def _embed_all(
+    texts: Sequence[str],
+    input_type: str,
+    progress: ProgressCallback | None = None,
+) -> list[list[float]]:
+    settings = get_settings()
+    total = len(texts)
+    slices = list(plan_batches(texts, settings.voyage_batch_size, settings.voyage_batch_tokens))
+    results: list[list[float]] = [[] for _ in range(total)]
+    backoff = _Backoff()
+    done = 0
+
+    with ThreadPoolExecutor(max_workers=max(1, settings.voyage_concurrency)) as pool:
+        futures = {
+            pool.submit(_embed_batch, list(texts[start:end]), input_type, backoff): (start, end)
+            for start, end in slices
+        }
+        try:
+            for future in as_completed(futures):
+                start, end = futures[future]
+                vectors = future.result()
+                # A short reply would shift every later vector onto the wrong text.
+                if len(vectors) != end - start:
+                    raise EmbeddingBatchError(
+                        f"Voyage returned {len(vectors)} embeddings for a batch of {end - start} texts"
+                    )
+                results[start:end] = vectors
+                done += end - start
+                if progress:
+                    progress(done, total)
+        except BaseException:
+            for future in futures:
+                future.cancel()
+            raise
+
+    return results
+
@@ -0,0 +1,69 @@
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Generic, Hashable, TypeVar
+
+V = TypeVar("V")
+
+_MISSING = object()
+
+
+class TTLCache(Generic[V]):
+    """Thread-safe LRU cache whose entries also expire after ``ttl`` seconds."""
+
+    def __init__(self, max_size: int = 1024, ttl: float = 3600.0, clock: Callable[[], float] = time.monotonic) -> None:
+        self.max_size = max(0, max_size)
+        self.ttl = ttl
+        self._clock = clock
+        self._data: OrderedDict[Hashable, tuple[float, V]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0}
+
+    def get(self, key: Hashable, default: Any = None) -> V | Any:
+        now = self._clock()
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING:
+                self._stats["misses"] += 1
+                return default
+            expires_at, value = entry
+            if expires_at <= now:
+                del self._data[key]
+                self._stats["expirations"] += 1
+                self._stats["misses"] += 1
+                return default
+            self._data.move_to_end(key)
+            self._stats["hits"] += 1
+            return value
+
+    def peek(self, key: Hashable, default: Any = None) -> V | Any:
+        # A live value without counting a hit or miss or refreshing its LRU position.
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+        if entry is _MISSING or entry[0] <= self._clock():
+            return default
+        return entry[1]
+
+    def set(self, key: Hashable, value: V, ttl: float | None = None) -> None:
+        if self.max_size == 0:
+            return
+        expires_at = self._clock() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {**self._stats, "size": len(self._data), "max_size": self.max_size, "ttl": self.ttl}
@@ -0,0 +1,256 @@
+from __future__ import annotations
+
+import datetime as dt
+import logging
+import threading
+import time
+from typing import Any, Callable, Iterable
+
+from .config import get_settings
+from .db import afetch_all, fetch_all, iter_pages
+from .lexical import LexicalIndex
+from .result_cache import recommendation_cache
+
+logger = logging.getLogger(__name__)
+
+EPOCH = dt.datetime(1970, 1, 1, tzinfo=dt.timezone.utc)
+# Rows stamped just before the previous refresh can commit after it ran; the
+# window is re-read on every refresh so a late commit is still picked up.
+REFRESH_OVERLAP = dt.timedelta(seconds=30)
+
+
+def _product_entry(row: dict) -> dict[str, Any]:
+    return {
+        "id": row["id"],
+        "title": row["title"],
+        "brand": row["brand"],
+        "category": row["category"],
+        "price": float(row["price"]),
+        "description": row["description"],
+    }
+
+
+def _friend_entry(row: dict) -> dict[str, Any]:
+    return {
+        "id": row["id"],
+        "name": row["name"],
+        "avatar_url": row["avatar_url"],
+        "strength": float(row["strength"]),
+    }
+
+
+TABLES: dict[str, tuple[str, Callable[[dict], dict[str, Any]]]] = {
+    "products": (
+        "SELECT id, title, brand, category, price, description, updated_at FROM products",
+        _product_entry,
+    ),
+    "friends": ("SELECT id, name, avatar_url, strength, updated_at FROM friends", _friend_entry),
+}
+
+
+class Catalog:
+    # Display fields for products and friends, held in process so vector results
+    # and ingests are hydrated without a join. The first refresh loads every row;
+    # later ones re-read rows whose updated_at moved. Ids that are not held yet
+    # (rows newer than the last refresh) are fetched by id and kept. Products are
+    # also indexed for lexical retrieval as they change. Deletes leave no
+    # updated_at behind, so every reconcile_interval a refresh also reads the
+    # live ids and evicts held rows that are gone.
+    def __init__(self, refresh_interval: float, lexical_max_postings: int, reconcile_interval: float = 300.0) -> None:
+        self.refresh_interval = refresh_interval
+        self.reconcile_interval = reconcile_interval
+        self.lexical = LexicalIndex(max_postings=lexical_max_postings)
+        self._lock = threading.Lock()
+        self._rows: dict[str, dict[int, dict[str, Any]]] = {table: {} for table in TABLES}
+        self._watermarks: dict[str, dt.datetime | None] = {table: None for table in TABLES}
+        self._version = 0
+        self._checked_at = 0.0
+        self._reconciled_at = time.monotonic()
+        self._refreshing = False
+        self._stats = {"refreshes": 0, "refresh_errors": 0, "misses": 0, "evictions": 0}
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    def refresh(self, force: bool = False) -> int:
+        if not self._claim(force):
+            return 0
+        changed = 0
+        try:
+            for table, (select, _) in TABLES.items():
+                query, params = self._changed_query(table, select)
+                for page in iter_pages(query, params, page_size=get_settings().rebuild_page_size):
+                    changed += self._apply(table, page)
+            if self._reconcile_due():
+                for table in TABLES:
+                    held = self._held_ids(table)
+                    pages = iter_pages(f"SELECT id FROM {table}", page_size=get_settings().rebuild_page_size)
+                    changed += self._evict(table, held - {row["id"] for page in pages for row in page})
+        except Exception:
+            self._count("refresh_errors")
+            if force:
+                raise
+            logger.exception("Catalog refresh failed; serving version %d.", self._version)
+        finally:
+            self._finish(changed)
+        return changed
+
+    async def arefresh(self, force: bool = False) -> int:
+        if not self._claim(force):
+            return 0
+        changed = 0
+        try:
+            for table, (select, _) in TABLES.items():
+                changed += self._apply(table, await afetch_all(*self._changed_query(table, select)))
+            if self._reconcile_due():
+                for table in TABLES:
+                    held = self._held_ids(table)
+                    live = await afetch_all(f"SELECT id FROM {table}")
+                    changed += self._evict(table, held - {row["id"] for row in live})
+        except Exception:
+            self._count("refresh_errors")
+            if force:
+                raise
+            logger.exception("Catalog refresh failed; serving version %d.", self._version)
+        finally:
+            self._finish(changed)
+        return changed
+
+    def products(self, ids: Iterable[int]) -> dict[int, dict[str, Any]]:
+        return self._get("products", ids)
+
+    def friends(self, ids: Iterable[int]) -> dict[int, dict[str, Any]]:
+        return self._get("friends", ids)
+
+    async def aproducts(self, ids: Iterable[int]) -> dict[int, dict[str, Any]]:
+        return await self._aget("products", ids)
+
+    async def afriends(self, ids: Iterable[int]) -> dict[int, dict[str, Any]]:
+        return await self._aget("friends", ids)
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            watermarks = {
+                table: watermark.isoformat() if watermark else None for table, watermark in self._watermarks.items()
+            }
+            return {
+                **self._stats,
+                "version": self._version,
+                "products": len(self._rows["products"]),
+                "friends": len(self._rows["friends"]),
+                "lexical": self.lexical.stats(),
+                "watermarks": watermarks,
+            }
+
+    def _get(self, table: str, ids: Iterable[int]) -> dict[int, dict[str, Any]]:
+        self.refresh()
+        found, missing = self._lookup(table, ids)
+        if missing:
+            select, _ = TABLES[table]
+            self._apply(table, fetch_all(f"{select} WHERE id = ANY(%s)", (missing,)), advance=False)
+            found.update(self._lookup(table, missing)[0])
+        return found
+
+    async def _aget(self, table: str, ids: Iterable[int]) -> dict[int, dict[str, Any]]:
+        await self.arefresh()
+        found, missing = self._lookup(table, ids)
+        if missing:
+            select, _ = TABLES[table]
+            self._apply(table, await afetch_all(f"{select} WHERE id = ANY(%s)", (missing,)), advance=False)
+            found.update(self._lookup(table, missing)[0])
+        return found
+
+    def _lookup(self, table: str, ids: Iterable[int]) -> tuple[dict[int, dict[str, Any]], list[int]]:
+        found: dict[int, dict[str, Any]] = {}
+        missing: set[int] = set()
+        with self._lock:
+            rows = self._rows[table]
+            for row_id in ids:
+                entry = rows.get(int(row_id))
+                if entry is None:
+                    missing.add(int(row_id))
+                else:
+                    found[int(row_id)] = entry
+            self._stats["misses"] += len(missing)
+        return found, sorted(missing)
+
+    def _changed_query(self, table: str, select: str) -> tuple[str, tuple]:
+        watermark = self._watermarks[table]
+        since = watermark - REFRESH_OVERLAP if watermark else EPOCH
+        return f"{select} WHERE updated_at > %s", (since,)
+
+    def _apply(self, table: str, rows: list[dict], advance: bool = True) -> int:
+        # Returns how many held entries changed. Rows fetched by id do not move
+        # the watermark: older changes may still be unread.
+        _, shape = TABLES[table]
+        changed = 0
+        with self._lock:
+            held = self._rows[table]
+            watermark = self._watermarks[table]
+            for row in rows:
+                entry = shape(row)
+                previous = held.get(entry["id"])
+                if previous != entry:
+                    held[entry["id"]] = entry
+                    changed += previous is not None
+                    if table == "products":
+                        self.lexical.update(entry)
+                if advance and (watermark is None or row["updated_at"] > watermark):
+                    watermark = row["updated_at"]
+            if advance:
+                self._watermarks[table] = watermark or EPOCH
+        return changed
+
+    def _held_ids(self, table: str) -> set[int]:
+        # Taken before the live ids are read: a row fetched by id in between is
+        # not evicted for missing from an older read.
+        with self._lock:
+            return set(self._rows[table])
+
+    def _evict(self, table: str, ids: set[int]) -> int:
+        with self._lock:
+            for row_id in ids:
+                del self._rows[table][row_id]
+                if table == "products":
+                    self.lexical.remove(row_id)
+            self._stats["evictions"] += len(ids)
+        return len(ids)
+
+    def _reconcile_due(self) -> bool:
+        now = time.monotonic()
+        with self._lock:
+            if now - self._reconciled_at < self.reconcile_interval:
+                return False
+            self._reconciled_at = now
+            return True
+
+    def _claim(self, force: bool) -> bool:
+        now = time.monotonic()
+        with self._lock:
+            if self._refreshing or (not force and now - self._checked_at < self.refresh_interval):
+                return False
+            self._refreshing = True
+            self._checked_at = now
+            return True
+
+    def _finish(self, changed: int) -> None:
+        with self._lock:
+            self._refreshing = False
+            self._stats["refreshes"] += 1
+            if changed:
+                self._version += 1
+        if changed:
+            # Cached responses carry the old titles, prices and avatars.
+            recommendation_cache.invalidate()
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self._stats[name] += 1
+
+
+catalog = Catalog(
+    refresh_interval=get_settings().catalog_refresh_interval,
+    lexical_max_postings=get_settings().lexical_max_postings,
+    reconcile_interval=get_settings().catalog_reconcile_interval,
+)
@@ -12,6 +12,54 @@ class Settings:
     voyage_model: str = os.getenv("VOYAGE_MODEL", "voyage-2")
     confidence_distance_high: float = float(os.getenv("CONFIDENCE_DISTANCE_HIGH", "0.25"))
     confidence_distance_med: float = float(os.getenv("CONFIDENCE_DISTANCE_MED", "0.45"))
+    db_pool_min: int = int(os.getenv("DB_POOL_MIN", "1"))
+    db_pool_max: int = int(os.getenv("DB_POOL_MAX", "10"))
+    db_pool_timeout: float = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+    db_pool_max_lifetime: float = float(os.getenv("DB_POOL_MAX_LIFETIME", "1800"))
+    db_pool_check_idle: float = float(os.getenv("DB_POOL_CHECK_IDLE", "30"))
+    query_cache_size: int = int(os.getenv("QUERY_CACHE_SIZE", "2048"))
+    query_cache_ttl: float = float(os.getenv("QUERY_CACHE_TTL", "3600"))
+    voyage_batch_size: int = int(os.getenv("VOYAGE_BATCH_SIZE", "128"))
+    voyage_batch_tokens: int = int(os.getenv("VOYAGE_BATCH_TOKENS", "100000"))
+    voyage_concurrency: int = int(os.getenv("VOYAGE_CONCURRENCY", "4"))
+    voyage_max_retries: int = int(os.getenv("VOYAGE_MAX_RETRIES", "6"))
+    voyage_backoff_base: float = float(os.getenv("VOYAGE_BACKOFF_BASE", "1.0"))
+    voyage_backoff_max: float = float(os.getenv("VOYAGE_BACKOFF_MAX", "60"))
+    embedding_store_enabled: bool = os.getenv("EMBEDDING_STORE_ENABLED", "true").lower() == "true"
+    rebuild_page_size: int = int(os.getenv("REBUILD_PAGE_SIZE", "2000"))
+    chroma_upsert_batch: int = int(os.getenv("CHROMA_UPSERT_BATCH", "500"))
+    vector_alias_ttl: float = float(os.getenv("VECTOR_ALIAS_TTL", "5"))
+    vector_keep_versions: int = int(os.getenv("VECTOR_KEEP_VERSIONS", "1"))
+    semantic_min_depth: int = int(os.getenv("SEMANTIC_MIN_DEPTH", "24"))
+    semantic_max_depth: int = int(os.getenv("SEMANTIC_MAX_DEPTH", "400"))
+    semantic_depth_factor: float = float(os.getenv("SEMANTIC_DEPTH_FACTOR", "2"))
+    ingest_mode: str = os.getenv("INGEST_MODE", "sync")
+    vector_queue_max: int = int(os.getenv("VECTOR_QUEUE_MAX", "50000"))
+    vector_worker_enabled: bool = os.getenv("VECTOR_WORKER_ENABLED", "true").lower() == "true"
+    vector_worker_batch_size: int = int(os.getenv("VECTOR_WORKER_BATCH_SIZE", "256"))
+    vector_worker_poll_interval: float = float(os.getenv("VECTOR_WORKER_POLL_INTERVAL", "1"))
+    vector_worker_visibility_timeout: float = float(os.getenv("VECTOR_WORKER_VISIBILITY_TIMEOUT", "120"))
+    vector_worker_max_attempts: int = int(os.getenv("VECTOR_WORKER_MAX_ATTEMPTS", "5"))
+    vector_queue_depth_ttl: float = float(os.getenv("VECTOR_QUEUE_DEPTH_TTL", "1"))
+    result_cache_size: int = int(os.getenv("RESULT_CACHE_SIZE", "1024"))
+    result_cache_ttl: float = float(os.getenv("RESULT_CACHE_TTL", "10"))
+    result_cache_stale_ttl: float = float(os.getenv("RESULT_CACHE_STALE_TTL", "30"))
+    result_cache_generation_ttl: float = float(os.getenv("RESULT_CACHE_GENERATION_TTL", "1"))
+    health_cache_ttl: float = float(os.getenv("HEALTH_CACHE_TTL", "5"))
+    vector_snapshot_dir: str = os.getenv("VECTOR_SNAPSHOT_DIR", "")
+    vector_snapshot_check_interval: float = float(os.getenv("VECTOR_SNAPSHOT_CHECK_INTERVAL", "30"))
+    chroma_query_timeout: float = float(os.getenv("CHROMA_QUERY_TIMEOUT", "2"))
+    chroma_retry_after: float = float(os.getenv("CHROMA_RETRY_AFTER", "15"))
+    lexical_candidates: int = int(os.getenv("LEXICAL_CANDIDATES", "20"))
+    lexical_max_postings: int = int(os.getenv("LEXICAL_MAX_POSTINGS", "50000"))
+    query_log_size: int = int(os.getenv("QUERY_LOG_SIZE", "1000"))
+    query_log_retention_days: int = int(os.getenv("QUERY_LOG_RETENTION_DAYS", "7"))
+    prewarm_interval: float = float(os.getenv("PREWARM_INTERVAL", "25"))
+    prewarm_top: int = int(os.getenv("PREWARM_TOP", "50"))
+    prewarm_batch_size: int = int(os.getenv("PREWARM_BATCH_SIZE", "16"))
+    catalog_refresh_interval: float = float(os.getenv("CATALOG_REFRESH_INTERVAL", "5"))
+    catalog_reconcile_interval: float = float(os.getenv("CATALOG_RECONCILE_INTERVAL", "300"))
+    chroma_heartbeat_interval: float = float(os.getenv("CHROMA_HEARTBEAT_INTERVAL", "15"))
 
 
 def get_settings() -> Settings:
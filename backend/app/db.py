@@ -1,42 +1,526 @@
 from __future__ import annotations
 
+import asyncio
 import contextlib
-from typing import Iterator
+import contextvars
+import io
+import re
+import threading
+import time
+import uuid
+import weakref
+from typing import Any, AsyncIterator, Iterator
 
+import psycopg
 import psycopg2
+from psycopg.pq import TransactionStatus
+from psycopg.rows import dict_row
+from psycopg2 import extras
 from psycopg2.extras import RealDictCursor
+from psycopg_pool import AsyncConnectionPool, PoolTimeout
 
 from .config import get_settings
+from .metrics import db_query
+
+
+class PoolTimeoutError(RuntimeError):
+    pass
+
+
+class ConnectionPool:
+    def __init__(
+        self,
+        dsn: str,
+        min_size: int = 1,
+        max_size: int = 10,
+        timeout: float = 10.0,
+        max_lifetime: float = 1800.0,
+        check_idle: float = 30.0,
+    ) -> None:
+        if max_size < 1 or min_size < 0 or min_size > max_size:
+            raise ValueError("Invalid pool size bounds")
+        self.dsn = dsn
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self.check_idle = check_idle
+        # (connection, idle since)
+        self._idle: list[tuple[psycopg2.extensions.connection, float]] = []
+        self._born: dict[int, float] = {}
+        self._size = 0
+        self._closed = False
+        self._cond = threading.Condition()
+        self._stats = {
+            "checkouts": 0,
+            "waits": 0,
+            "timeouts": 0,
+            "created": 0,
+            "discarded": 0,
+        }
+        for _ in range(min_size):
+            conn = self._connect()
+            with self._cond:
+                self._register(conn)
+                self._idle.append((conn, time.monotonic()))
+                self._size += 1
+
+    def _connect(self) -> psycopg2.extensions.connection:
+        conn = psycopg2.connect(self.dsn, cursor_factory=RealDictCursor)
+        conn.autocommit = True
+        return conn
+
+    def _register(self, conn: psycopg2.extensions.connection) -> None:
+        # Called with the lock held.
+        self._born[id(conn)] = time.monotonic()
+        self._stats["created"] += 1
+
+    def _discard(self, conn: psycopg2.extensions.connection) -> None:
+        # Called with the lock held.
+        self._born.pop(id(conn), None)
+        self._stats["discarded"] += 1
+        with contextlib.suppress(Exception):
+            conn.close()
+
+    def _alive(self, conn: psycopg2.extensions.connection, idle_since: float) -> bool:
+        # poll() consumes whatever the server sent while the connection sat idle,
+        # so a dropped socket or a terminated backend shows up here; connections
+        # idle longer than check_idle also get a round trip.
+        try:
+            conn.poll()
+            if time.monotonic() - idle_since > self.check_idle:
+                with conn.cursor() as cursor:
+                    cursor.execute("SELECT 1")
+        except psycopg2.Error:
+            return False
+        return not conn.closed
+
+    def getconn(self, timeout: float | None = None) -> psycopg2.extensions.connection:
+        deadline = time.monotonic() + (self.timeout if timeout is None else timeout)
+        while True:
+            idle = self._checkout(deadline)
+            if idle is None:
+                break
+            conn, idle_since = idle
+            # Liveness is checked outside the lock: it may wait on the network.
+            alive = self._alive(conn, idle_since)
+            with self._cond:
+                if alive:
+                    self._stats["checkouts"] += 1
+                    return conn
+                self._size -= 1
+                self._discard(conn)
+                self._cond.notify()
+
+        # Open new connections outside the lock so slow handshakes do not block checkins.
+        try:
+            conn = self._connect()
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise
+        with self._cond:
+            self._register(conn)
+            self._stats["checkouts"] += 1
+        return conn
+
+    def _checkout(self, deadline: float) -> tuple[psycopg2.extensions.connection, float] | None:
+        # An idle connection to hand out, or None once a slot for a new one is reserved.
+        with self._cond:
+            waited = False
+            while True:
+                if self._closed:
+                    raise RuntimeError("Connection pool is closed")
+                while self._idle:
+                    conn, idle_since = self._idle.pop()
+                    if conn.closed or time.monotonic() - self._born.get(id(conn), 0.0) > self.max_lifetime:
+                        self._size -= 1
+                        self._discard(conn)
+                        continue
+                    return conn, idle_since
+                if self._size < self.max_size:
+                    self._size += 1
+                    return None
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._stats["timeouts"] += 1
+                    raise PoolTimeoutError(
+                        f"Timed out after {self.timeout:.1f}s waiting for a database connection"
+                    )
+                if not waited:
+                    self._stats["waits"] += 1
+                    waited = True
+                self._cond.wait(remaining)
+
+    def putconn(self, conn: psycopg2.extensions.connection, broken: bool = False) -> None:
+        if not broken and not conn.closed:
+            try:
+                if conn.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+                if not conn.autocommit:
+                    conn.autocommit = True
+            except psycopg2.Error:
+                broken = True
+        with self._cond:
+            born = self._born.get(id(conn), 0.0)
+            if broken or conn.closed or self._closed or time.monotonic() - born > self.max_lifetime:
+                self._size -= 1
+                self._discard(conn)
+            else:
+                self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    def close(self) -> None:
+        with self._cond:
+            self._closed = True
+            for conn, _ in self._idle:
+                self._size -= 1
+                self._discard(conn)
+            self._idle.clear()
+            self._cond.notify_all()
+
+    def stats(self) -> dict[str, Any]:
+        with self._cond:
+            return {
+                **self._stats,
+                "size": self._size,
+                "idle": len(self._idle),
+                "in_use": self._size - len(self._idle),
+                "min_size": self.min_size,
+                "max_size": self.max_size,
+            }
+
+
+_pool: ConnectionPool | None = None
+_pool_lock = threading.Lock()
+_current_conn: contextvars.ContextVar[psycopg2.extensions.connection | None] = contextvars.ContextVar(
+    "phiademo_current_conn", default=None
+)
+
+
+def get_pool() -> ConnectionPool:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                settings = get_settings()
+                if not settings.db_url:
+                    raise RuntimeError("DB_URL is not set")
+                _pool = ConnectionPool(
+                    settings.db_url,
+                    min_size=settings.db_pool_min,
+                    max_size=settings.db_pool_max,
+                    timeout=settings.db_pool_timeout,
+                    max_lifetime=settings.db_pool_max_lifetime,
+                    check_idle=settings.db_pool_check_idle,
+                )
+    return _pool
+
+
+def close_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
+
+
+def pool_stats() -> dict[str, Any] | None:
+    return _pool.stats() if _pool is not None else None
 
 
 @contextlib.contextmanager
 def get_conn() -> Iterator[psycopg2.extensions.connection]:
-    settings = get_settings()
-    if not settings.db_url:
-        raise RuntimeError("DB_URL is not set")
-    conn = psycopg2.connect(settings.db_url, cursor_factory=RealDictCursor)
-    conn.autocommit = True
+    # Nested calls reuse the connection already checked out by this context.
+    current = _current_conn.get()
+    if current is not None:
+        yield current
+        return
+
+    pool = get_pool()
+    conn = pool.getconn()
+    token = _current_conn.set(conn)
+    broken = False
     try:
         yield conn
+    except (psycopg2.OperationalError, psycopg2.InterfaceError):
+        broken = True
+        raise
     finally:
-        conn.close()
+        _current_conn.reset(token)
+        pool.putconn(conn, broken=broken or bool(conn.closed))
 
 
-def fetch_all(query: str, params: tuple | None = None) -> list[dict]:
+@contextlib.contextmanager
+def transaction() -> Iterator[psycopg2.extensions.connection]:
     with get_conn() as conn:
+        if not conn.autocommit:
+            # Already inside a transaction; join it.
+            yield conn
+            return
+        conn.autocommit = False
+        try:
+            yield conn
+            conn.commit()
+        except BaseException:
+            with contextlib.suppress(psycopg2.Error):
+                conn.rollback()
+            raise
+        finally:
+            if not conn.closed:
+                with contextlib.suppress(psycopg2.Error):
+                    conn.autocommit = True
+
+
+def fetch_all(query: str, params: tuple | None = None) -> list[dict]:
+    with db_query("fetch_all"), get_conn() as conn:
         with conn.cursor() as cur:
             cur.execute(query, params)
             return cur.fetchall()
 
 
 def fetch_one(query: str, params: tuple | None = None) -> dict | None:
-    with get_conn() as conn:
+    with db_query("fetch_one"), get_conn() as conn:
         with conn.cursor() as cur:
             cur.execute(query, params)
             return cur.fetchone()
 
 
 def execute(query: str, params: tuple | None = None) -> None:
-    with get_conn() as conn:
+    with db_query("execute"), get_conn() as conn:
+        with conn.cursor() as cur:
+            cur.execute(query, params)
+
+
+def execute_values(
+    query: str,
+    rows: list[tuple],
+    template: str | None = None,
+    page_size: int = 1000,
+    fetch: bool = False,
+) -> list[dict]:
+    # Multi-row VALUES in as few statements as page_size allows; with fetch=True
+    # returns the RETURNING rows in input order.
+    with db_query("execute_values"), get_conn() as conn:
+        with conn.cursor() as cur:
+            result = extras.execute_values(cur, query, rows, template=template, page_size=page_size, fetch=fetch)
+            return result or []
+
+
+class _ChunkStream(io.RawIOBase):
+    # File-like view over an iterator of byte chunks, so COPY can stream without
+    # materializing the whole payload.
+    def __init__(self, chunks: Iterator[bytes]) -> None:
+        self._chunks = chunks
+        self._buffer = b""
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, target) -> int:
+        while not self._buffer:
+            try:
+                self._buffer = next(self._chunks)
+            except StopIteration:
+                return 0
+        size = min(len(target), len(self._buffer))
+        target[:size] = self._buffer[:size]
+        self._buffer = self._buffer[size:]
+        return size
+
+
+def copy_rows(table: str, columns: list[str], chunks: Iterator[bytes]) -> None:
+    # Chunks are tab-separated text rows in COPY's default format.
+    stream = io.BufferedReader(_ChunkStream(chunks), buffer_size=1 << 20)
+    with db_query("copy"), get_conn() as conn:
         with conn.cursor() as cur:
+            cur.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN", stream, size=1 << 20)
+
+
+def iter_pages(query: str, params: tuple | None = None, page_size: int = 1000) -> Iterator[list[dict]]:
+    # Streams rows through a server-side cursor on a dedicated connection that is
+    # not shared with the caller, so writes made between pages commit on their own.
+    pool = get_pool()
+    conn = pool.getconn()
+    broken = False
+    try:
+        conn.autocommit = False
+        with conn.cursor(name=f"phiademo_{uuid.uuid4().hex}") as cur:
+            cur.itersize = page_size
             cur.execute(query, params)
+            while True:
+                rows = cur.fetchmany(page_size)
+                if not rows:
+                    break
+                yield rows
+        conn.commit()
+    except (psycopg2.OperationalError, psycopg2.InterfaceError):
+        broken = True
+        raise
+    finally:
+        pool.putconn(conn, broken=broken or bool(conn.closed))
+
+
+# Async variant for the request path. psycopg 3 speaks the same %s/%(name)s
+# placeholders and returns plain dict rows, so queries are shared with the sync
+# helpers above; the sync pool keeps serving scripts, rebuilds and the worker.
+_async_pool: AsyncConnectionPool | None = None
+_async_pool_loop: asyncio.AbstractEventLoop | None = None
+_async_pool_locks: weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Lock] = weakref.WeakKeyDictionary()
+_current_async_conn: contextvars.ContextVar[psycopg.AsyncConnection | None] = contextvars.ContextVar(
+    "phiademo_current_async_conn", default=None
+)
+
+
+def _async_pool_lock() -> asyncio.Lock:
+    # The pool and its lock belong to the event loop that opened them; a process
+    # that runs more than one loop (tests, TestClient portals) gets one per loop.
+    loop = asyncio.get_running_loop()
+    lock = _async_pool_locks.get(loop)
+    if lock is None:
+        lock = _async_pool_locks[loop] = asyncio.Lock()
+    return lock
+
+
+async def get_async_pool() -> AsyncConnectionPool:
+    global _async_pool, _async_pool_loop
+    loop = asyncio.get_running_loop()
+    if _async_pool is None or _async_pool_loop is not loop:
+        async with _async_pool_lock():
+            if _async_pool is None or _async_pool_loop is not loop:
+                settings = get_settings()
+                if not settings.db_url:
+                    raise RuntimeError("DB_URL is not set")
+                pool = AsyncConnectionPool(
+                    settings.db_url,
+                    min_size=settings.db_pool_min,
+                    max_size=settings.db_pool_max,
+                    timeout=settings.db_pool_timeout,
+                    max_lifetime=settings.db_pool_max_lifetime,
+                    kwargs={"autocommit": True, "row_factory": dict_row},
+                    check=AsyncConnectionPool.check_connection,
+                    name="phiademo-async",
+                    open=False,
+                )
+                await pool.open()
+                # A pool left behind by an earlier loop cannot be closed from
+                # this one; its connections go when that loop's tasks are gone.
+                _async_pool, _async_pool_loop = pool, loop
+    return _async_pool
+
+
+async def close_async_pool() -> None:
+    global _async_pool, _async_pool_loop
+    async with _async_pool_lock():
+        if _async_pool is not None and _async_pool_loop is asyncio.get_running_loop():
+            await _async_pool.close()
+        _async_pool, _async_pool_loop = None, None
+
+
+def async_pool_stats() -> dict[str, Any] | None:
+    if _async_pool is None:
+        return None
+    stats = _async_pool.get_stats()
+    return {
+        "checkouts": stats.get("requests_num", 0),
+        "waits": stats.get("requests_queued", 0),
+        "timeouts": stats.get("requests_errors", 0),
+        "created": stats.get("connections_num", 0),
+        "discarded": stats.get("returns_bad", 0) + stats.get("connections_lost", 0),
+        "size": stats.get("pool_size", 0),
+        "idle": stats.get("pool_available", 0),
+        "in_use": stats.get("pool_size", 0) - stats.get("pool_available", 0),
+        "min_size": stats.get("pool_min", _async_pool.min_size),
+        "max_size": stats.get("pool_max", _async_pool.max_size),
+    }
+
+
+@contextlib.asynccontextmanager
+async def get_async_conn() -> AsyncIterator[psycopg.AsyncConnection]:
+    # Same pinning rule as get_conn(): nested calls in one task share a connection.
+    current = _current_async_conn.get()
+    if current is not None:
+        yield current
+        return
+
+    pool = await get_async_pool()
+    try:
+        conn = await pool.getconn()
+    except PoolTimeout as exc:
+        raise PoolTimeoutError(f"Timed out after {pool.timeout:.1f}s waiting for a database connection") from exc
+    token = _current_async_conn.set(conn)
+    try:
+        yield conn
+    finally:
+        _current_async_conn.reset(token)
+        # The pool rolls back an open transaction and drops broken connections.
+        await pool.putconn(conn)
+
+
+@contextlib.asynccontextmanager
+async def async_transaction() -> AsyncIterator[psycopg.AsyncConnection]:
+    async with get_async_conn() as conn:
+        if conn.info.transaction_status != TransactionStatus.IDLE:
+            # Already inside a transaction; join it.
+            yield conn
+            return
+        async with conn.transaction():
+            yield conn
+
+
+async def afetch_all(query: str, params: tuple | dict | None = None) -> list[dict]:
+    with db_query("fetch_all"):
+        async with get_async_conn() as conn:
+            cur = await conn.execute(query, params)
+            return await cur.fetchall()
+
+
+async def afetch_one(query: str, params: tuple | dict | None = None) -> dict | None:
+    with db_query("fetch_one"):
+        async with get_async_conn() as conn:
+            cur = await conn.execute(query, params)
+            return await cur.fetchone()
+
+
+async def aexecute(query: str, params: tuple | dict | None = None) -> None:
+    with db_query("execute"):
+        async with get_async_conn() as conn:
+            await conn.execute(query, params)
+
+
+_VALUES_PLACEHOLDER = re.compile(r"\bVALUES\s+%s", re.IGNORECASE)
+
+
+def _split_values_placeholder(query: str) -> tuple[str, str]:
+    # The only parameter must be the rows' "VALUES %s"; any other %s would be
+    # bound to row values.
+    match = _VALUES_PLACEHOLDER.search(query)
+    if match is None or query.count("%s") != 1:
+        raise ValueError('aexecute_values needs exactly one "VALUES %s" placeholder and no other %s')
+    return query[: match.end() - 2], query[match.end() :]
+
+
+async def aexecute_values(
+    query: str,
+    rows: list[tuple],
+    template: str | None = None,
+    page_size: int = 1000,
+    fetch: bool = False,
+) -> list[dict]:
+    # psycopg 3 has no execute_values; expand the single "VALUES %s" placeholder
+    # into one multi-row VALUES list per page, as the psycopg2 helper does.
+    head, tail = _split_values_placeholder(query)
+    result: list[dict] = []
+    if not rows:
+        return result
+    row_template = template or "(" + ", ".join(["%s"] * len(rows[0])) + ")"
+    with db_query("execute_values"):
+        async with get_async_conn() as conn:
+            for start in range(0, len(rows), page_size):
+                page = rows[start : start + page_size]
+                statement = head + ", ".join([row_template] * len(page)) + tail
+                cur = await conn.execute(statement, [value for row in page for value in row])
+                if fetch:
+                    result.extend(await cur.fetchall())
+    return result
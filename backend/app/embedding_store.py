@@ -0,0 +1,64 @@
+from __future__ import annotations
+
+import hashlib
+import logging
+from typing import Callable, Sequence
+
+import numpy as np
+
+from .config import get_settings
+from .db import execute_values, fetch_all
+
+logger = logging.getLogger(__name__)
+
+LOOKUP_SQL = "SELECT key, embedding FROM embedding_store WHERE key = ANY(%s)"
+STORE_SQL = """
+    INSERT INTO embedding_store (key, model, input_type, embedding)
+    VALUES %s
+    ON CONFLICT (key) DO NOTHING
+"""
+
+# Embeds the texts it is given and reports the provider that produced them;
+# only "voyage" results are persisted.
+EmbedMissing = Callable[[list[str]], tuple[list[list[float]], str]]
+
+
+def embedding_key(model: str, input_type: str, text: str) -> bytes:
+    # NUL separators keep ("a", "b c") and ("a b", "c") apart.
+    return hashlib.sha256(f"{model}\0{input_type}\0{text}".encode("utf-8")).digest()
+
+
+def load_embeddings(keys: Sequence[bytes], page_size: int = 1000) -> dict[bytes, list[float]]:
+    found: dict[bytes, list[float]] = {}
+    for start in range(0, len(keys), page_size):
+        for row in fetch_all(LOOKUP_SQL, (list(keys[start : start + page_size]),)):
+            found[bytes(row["key"])] = np.frombuffer(row["embedding"], dtype="<f4").tolist()
+    return found
+
+
+def save_embeddings(model: str, input_type: str, entries: Sequence[tuple[bytes, Sequence[float]]]) -> None:
+    if not entries:
+        return
+    rows = [
+        (key, model, input_type, np.asarray(vector, dtype="<f4").tobytes())
+        for key, vector in entries
+    ]
+    execute_values(STORE_SQL, rows)
+
+
+def embed_with_store(texts: Sequence[str], input_type: str, embed_missing: EmbedMissing) -> list[list[float]]:
+    # One bulk lookup, then the provider only sees distinct texts that are not
+    # stored yet. Results come back in input order.
+    model = get_settings().voyage_model
+    keys = [embedding_key(model, input_type, text) for text in texts]
+    unique = dict(zip(keys, texts))
+    found = load_embeddings(list(unique))
+    missing = [key for key in unique if key not in found]
+    if missing:
+        vectors, provider = embed_missing([unique[key] for key in missing])
+        found.update(zip(missing, vectors))
+        if provider == "voyage":
+            save_embeddings(model, input_type, list(zip(missing, vectors)))
+    logger.debug("Embedding store: %d of %d distinct texts stored.", len(unique) - len(missing), len(unique))
+    return [found[key] for key in keys]
+
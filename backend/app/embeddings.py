@@ -2,67 +2,238 @@ from __future__ import annotations
 
 import hashlib
 import logging
-import math
-from typing import Iterable
+import threading
+from typing import TYPE_CHECKING, Iterable, Sequence
 
-import voyageai
+import numpy as np
 
+from .cache import TTLCache
 from .config import get_settings
+from .metrics import external_call
+
+if TYPE_CHECKING:
+    import voyageai
 
 logger = logging.getLogger(__name__)
 
+_query_cache: TTLCache[tuple[float, ...]] = TTLCache(
+    max_size=get_settings().query_cache_size,
+    ttl=get_settings().query_cache_ttl,
+)
+
+_voyage_lock = threading.Lock()
+_voyage_clients: dict[str, voyageai.Client] = {}
+_async_voyage_clients: dict[str, voyageai.AsyncClient] = {}
+
+
+def hash_embeddings(
+    texts: Sequence[str],
+    dim: int = 256,
+    dtype: type = np.float32,
+    chunk_size: int = 8192,
+) -> np.ndarray:
+    # Batched form of the deterministic fallback: each distinct token is hashed once
+    # per chunk and bucket sums are accumulated with bincount, which adds in input
+    # order just like the original per-token loop, so float64 output is bit-identical.
+    out = np.empty((len(texts), dim), dtype=dtype)
+    for start in range(0, len(texts), chunk_size):
+        out[start : start + chunk_size] = _hash_embedding_chunk(texts[start : start + chunk_size], dim)
+    return out
+
+
+def _hash_embedding_chunk(texts: Sequence[str], dim: int) -> np.ndarray:
+    vocab: dict[str, int] = {}
+    token_ids: list[int] = []
+    rows: list[int] = []
+    for row, text in enumerate(texts):
+        for token in text.lower().split():
+            token_id = vocab.get(token)
+            if token_id is None:
+                token_id = vocab[token] = len(vocab)
+            token_ids.append(token_id)
+            rows.append(row)
+
+    matrix = np.zeros((len(texts), dim), dtype=np.float64)
+    if token_ids:
+        digests = np.frombuffer(
+            b"".join(hashlib.sha256(token.encode("utf-8")).digest() for token in vocab),
+            dtype=np.uint8,
+        ).reshape(-1, 32)
+        buckets = digests[:, ::4].astype(np.int64) % dim
+        values = (digests.view("<u4") % 1000) / 1000.0
+        ids = np.asarray(token_ids, dtype=np.int64)
+        flat = (np.asarray(rows, dtype=np.int64)[:, None] * dim + buckets[ids]).ravel()
+        matrix = np.bincount(flat, weights=values[ids].ravel(), minlength=len(texts) * dim).reshape(len(texts), dim)
+
+    # cumsum reduces left to right like the builtin sum(); np.sum's pairwise order would not.
+    norms = np.sqrt(np.cumsum(matrix * matrix, axis=1)[:, -1])
+    norms[norms == 0.0] = 1.0
+    return matrix / norms[:, None]
+
 
 def _hash_embedding(text: str, dim: int = 256) -> list[float]:
-    tokens = [t for t in text.lower().split() if t.strip()]
-    vector = [0.0] * dim
-    for token in tokens:
-        digest = hashlib.sha256(token.encode("utf-8")).digest()
-        for idx in range(0, len(digest), 4):
-            bucket = digest[idx] % dim
-            value = int.from_bytes(digest[idx : idx + 4], "little") % 1000
-            vector[bucket] += value / 1000.0
-    norm = math.sqrt(sum(v * v for v in vector)) or 1.0
-    return [v / norm for v in vector]
+    return hash_embeddings([text], dim=dim, dtype=np.float64)[0].tolist()
 
 
-def embed_texts(texts: Iterable[str], input_type: str = "document") -> list[list[float]]:
+def get_voyage_client() -> voyageai.Client:
+    # The SDK client holds its HTTP session; reuse it instead of re-handshaking per call.
+    # The SDK is imported on first use, keeping it off the startup path.
+    import voyageai
+
+    api_key = get_settings().voyage_api_key
+    with _voyage_lock:
+        client = _voyage_clients.get(api_key)
+        if client is None:
+            client = voyageai.Client(api_key=api_key)
+            _voyage_clients.clear()
+            _voyage_clients[api_key] = client
+        return client
+
+
+def get_async_voyage_client() -> voyageai.AsyncClient:
+    import voyageai
+
+    api_key = get_settings().voyage_api_key
+    with _voyage_lock:
+        client = _async_voyage_clients.get(api_key)
+        if client is None:
+            client = voyageai.AsyncClient(api_key=api_key)
+            _async_voyage_clients.clear()
+            _async_voyage_clients[api_key] = client
+        return client
+
+
+def _log_rate_limited(error: Exception) -> None:
+    logger.warning(
+        "VoyageAI rate limit hit (%s); falling back to hash embeddings. "
+        "Add a payment method at https://dashboard.voyageai.com/ for higher limits.",
+        error,
+    )
+
+
+def _embed_with_provider(texts: Iterable[str], input_type: str) -> tuple[list[list[float]], str]:
     settings = get_settings()
     if not settings.voyage_api_key:
         logger.warning("VOYAGE_API_KEY missing; using deterministic fallback embeddings.")
-        return [_hash_embedding(text) for text in texts]
+        return hash_embeddings(list(texts), dtype=np.float64).tolist(), "fallback"
 
+    import voyageai
+
+    texts = list(texts)
     try:
-        client = voyageai.Client(api_key=settings.voyage_api_key)
-        response = client.embed(
-            list(texts),
-            model=settings.voyage_model,
-            input_type=input_type,
-        )
-        return response.embeddings
+        client = get_voyage_client()
+        with external_call("voyage", "embed"):
+            response = client.embed(
+                texts,
+                model=settings.voyage_model,
+                input_type=input_type,
+            )
+        return response.embeddings, "voyage"
     except voyageai.error.RateLimitError as e:
-        logger.warning(
-            "VoyageAI rate limit hit (%s); falling back to hash embeddings. "
-            "Add a payment method at https://dashboard.voyageai.com/ for higher limits.",
-            e,
-        )
-        return [_hash_embedding(text) for text in texts]
+        _log_rate_limited(e)
+        return hash_embeddings(texts, dtype=np.float64).tolist(), "fallback"
+
+
+async def _aembed_with_provider(texts: Iterable[str], input_type: str) -> tuple[list[list[float]], str]:
+    settings = get_settings()
+    texts = list(texts)
+    if not settings.voyage_api_key:
+        logger.warning("VOYAGE_API_KEY missing; using deterministic fallback embeddings.")
+        return hash_embeddings(texts, dtype=np.float64).tolist(), "fallback"
+
+    import voyageai
+
+    try:
+        client = get_async_voyage_client()
+        with external_call("voyage", "embed"):
+            response = await client.embed(
+                texts,
+                model=settings.voyage_model,
+                input_type=input_type,
+            )
+        return response.embeddings, "voyage"
+    except voyageai.error.RateLimitError as e:
+        _log_rate_limited(e)
+        return hash_embeddings(texts, dtype=np.float64).tolist(), "fallback"
+
+
+def embed_texts(texts: Iterable[str], input_type: str = "document") -> list[list[float]]:
+    texts = list(texts)
+    if voyage_enabled() and get_settings().embedding_store_enabled and texts:
+        from .embedding_store import embed_with_store
+
+        return embed_with_store(texts, input_type, lambda missing: _embed_with_provider(missing, input_type))
+    return _embed_with_provider(texts, input_type)[0]
+
+
+def normalize_query(text: str) -> str:
+    return " ".join(text.casefold().split())
+
+
+def _query_cache_key(namespace: str, text: str, input_type: str) -> tuple[str, str, str, str]:
+    model = get_settings().voyage_model if namespace == "voyage" else "hash-256"
+    return (namespace, model, input_type, normalize_query(text))
 
 
 def embed_query(text: str) -> list[float]:
-    return embed_texts([text], input_type="query")[0]
+    # Fallback vectors live under their own namespace so a rate-limited request
+    # can never serve a hash vector in place of a real Voyage vector.
+    namespace = "voyage" if voyage_enabled() else "fallback"
+    cached = _query_cache.get(_query_cache_key(namespace, text, "query"))
+    if cached is not None:
+        return list(cached)
 
+    embeddings, provider = _embed_with_provider([text], input_type="query")
+    embedding = embeddings[0]
+    _query_cache.set(_query_cache_key(provider, text, "query"), tuple(embedding))
+    return list(embedding)
+
+
+async def aembed_query(text: str) -> list[float]:
+    return (await aembed_queries([text]))[0]
 
-def embed_documents(texts: Iterable[str]) -> list[list[float]]:
-    return embed_texts(texts, input_type="document")
 
+async def aembed_queries(texts: Sequence[str]) -> list[list[float]]:
+    return (await aembed_queries_with_provider(texts))[0]
 
-def lexical_boost(query: str, title: str, description: str) -> float:
-    tokens = [token for token in query.lower().split() if token.strip()]
-    if not tokens:
-        return 0.0
-    haystack = f"{title} {description}".lower()
-    matches = sum(1 for token in tokens if token in haystack)
-    return min(matches * 0.05, 0.15)
+
+async def aembed_queries_with_provider(texts: Sequence[str]) -> tuple[list[list[float]], str]:
+    # Queries missing from the cache go to the provider in a single request;
+    # spellings that normalize to the same key are embedded once. The provider
+    # is "fallback" when a rate-limited Voyage call fell back to hash vectors.
+    namespace = "voyage" if voyage_enabled() else "fallback"
+    vectors: dict[str, tuple[float, ...]] = {}
+    missing: dict[str, str] = {}
+    for text in texts:
+        key = normalize_query(text)
+        if key in vectors or key in missing:
+            continue
+        cached = _query_cache.get(_query_cache_key(namespace, text, "query"))
+        if cached is not None:
+            vectors[key] = cached
+        else:
+            missing[key] = text
+
+    provider = namespace
+    if missing:
+        embeddings, provider = await _aembed_with_provider(list(missing.values()), input_type="query")
+        for (key, text), embedding in zip(missing.items(), embeddings):
+            vectors[key] = tuple(embedding)
+            _query_cache.set(_query_cache_key(provider, text, "query"), vectors[key])
+    return [list(vectors[normalize_query(text)]) for text in texts], provider
+
+
+def query_embedding_cached(text: str) -> bool:
+    namespace = "voyage" if voyage_enabled() else "fallback"
+    return _query_cache.peek(_query_cache_key(namespace, text, "query")) is not None
+
+
+def query_cache_stats() -> dict:
+    return _query_cache.stats()
+
+
+def embed_documents(texts: Iterable[str]) -> list[list[float]]:
+    return embed_texts(texts, input_type="document")
 
 
 def voyage_enabled() -> bool:
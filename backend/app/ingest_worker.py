@@ -0,0 +1,296 @@
+from __future__ import annotations
+
+import datetime as dt
+import logging
+import threading
+import time
+from typing import Any, Iterable
+
+import anyio
+
+from .batch_embeddings import embed_in_batches
+from .catalog import catalog
+from .config import get_settings
+from .db import aexecute_values, afetch_one, execute, execute_values, fetch_all, fetch_one, transaction
+from .metrics import external_call
+from .result_cache import recommendation_cache
+from .vector_store import aget_collection, get_collection, product_document, product_metadata
+
+logger = logging.getLogger(__name__)
+
+
+class QueueFullError(RuntimeError):
+    pass
+
+
+def index_missing_products(products: Iterable[dict[str, Any]]) -> int:
+    # Vectors are per product: embed only the distinct products the index has not seen.
+    by_id = {int(product["id"]): product for product in products}
+    if not by_id:
+        return 0
+    collection = get_collection()
+    with external_call("chroma", "get"):
+        indexed = set(collection.get(ids=[str(product_id) for product_id in by_id], include=[])["ids"])
+    missing = [product for product_id, product in sorted(by_id.items()) if str(product_id) not in indexed]
+    if missing:
+        documents = [product_document(product) for product in missing]
+        embeddings = embed_in_batches(documents)
+        with external_call("chroma", "upsert"):
+            collection.upsert(
+                ids=[str(product["id"]) for product in missing],
+                embeddings=embeddings,
+                metadatas=[product_metadata(product) for product in missing],
+                documents=documents,
+            )
+    return len(missing)
+
+
+async def aindex_missing_products(products: Iterable[dict[str, Any]]) -> int:
+    by_id = {int(product["id"]): product for product in products}
+    if not by_id:
+        return 0
+    collection = await aget_collection()
+    with external_call("chroma", "get"):
+        found = await collection.get(ids=[str(product_id) for product_id in by_id], include=[])
+    indexed = set(found["ids"])
+    missing = [product for product_id, product in sorted(by_id.items()) if str(product_id) not in indexed]
+    if missing:
+        documents = [product_document(product) for product in missing]
+        # The batch embedder keeps its own thread pool, retries and backoff; run it
+        # off the event loop rather than re-implementing that on asyncio.
+        embeddings = await anyio.to_thread.run_sync(embed_in_batches, documents)
+        with external_call("chroma", "upsert"):
+            await collection.upsert(
+                ids=[str(product["id"]) for product in missing],
+                embeddings=embeddings,
+                metadatas=[product_metadata(product) for product in missing],
+                documents=documents,
+            )
+    return len(missing)
+
+
+QUEUE_DEPTH_SQL = "SELECT COUNT(*) AS count FROM vector_jobs WHERE failed_at IS NULL"
+# A pending job absorbs the new event as is; a job marked failed is revived with
+# a fresh attempt budget, so a later ingest still gets the product its vector.
+ENQUEUE_SQL = """
+    INSERT INTO vector_jobs (product_id) VALUES %s
+    ON CONFLICT (product_id) DO UPDATE
+    SET enqueued_at = NOW(),
+        attempts = 0,
+        locked_until = 'epoch',
+        failed_at = NULL
+    WHERE vector_jobs.failed_at IS NOT NULL
+"""
+
+
+class QueueDepth:
+    # Backlog size for backpressure, counted at most once per ttl seconds per
+    # process instead of on every enqueue. Enqueues in between add to it, so a
+    # burst is refused before the next count; the bound is approximate either way.
+    def __init__(self, ttl: float) -> None:
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._count = 0
+        self._counted_at = float("-inf")
+
+    def due(self) -> bool:
+        return time.monotonic() - self._counted_at >= self.ttl
+
+    def value(self) -> int:
+        return self._count
+
+    def set(self, count: int) -> None:
+        with self._lock:
+            self._count = count
+            self._counted_at = time.monotonic()
+
+    def add(self, count: int) -> None:
+        with self._lock:
+            self._count += count
+
+
+_depth = QueueDepth(ttl=get_settings().vector_queue_depth_ttl)
+
+
+def queue_depth() -> int:
+    if _depth.due():
+        row = fetch_one(QUEUE_DEPTH_SQL)
+        _depth.set(row["count"] if row else 0)
+    return _depth.value()
+
+
+async def aqueue_depth() -> int:
+    if _depth.due():
+        row = await afetch_one(QUEUE_DEPTH_SQL)
+        _depth.set(row["count"] if row else 0)
+    return _depth.value()
+
+
+def enqueue_products(product_ids: Iterable[int]) -> None:
+    ids = sorted({int(product_id) for product_id in product_ids})
+    if not ids:
+        return
+    # Backpressure: refuse new work (before anything is committed) once the
+    # backlog is over the bound, so producers slow down instead of piling up lag.
+    if queue_depth() >= get_settings().vector_queue_max:
+        raise QueueFullError("Vectorization queue is full")
+    execute_values(ENQUEUE_SQL, [(product_id,) for product_id in ids])
+    _depth.add(len(ids))
+
+
+async def aenqueue_products(product_ids: Iterable[int]) -> None:
+    ids = sorted({int(product_id) for product_id in product_ids})
+    if not ids:
+        return
+    if await aqueue_depth() >= get_settings().vector_queue_max:
+        raise QueueFullError("Vectorization queue is full")
+    await aexecute_values(ENQUEUE_SQL, [(product_id,) for product_id in ids])
+    _depth.add(len(ids))
+
+
+def _fail_exhausted_jobs(max_attempts: int) -> int:
+    # A job whose last claim expired without it being deleted failed that attempt;
+    # after max_attempts it is set aside instead of blocking the queue forever.
+    rows = fetch_all(
+        """
+        UPDATE vector_jobs
+        SET failed_at = NOW()
+        WHERE failed_at IS NULL AND locked_until <= NOW() AND attempts >= %s
+        RETURNING product_id
+        """,
+        (max_attempts,),
+    )
+    if rows:
+        logger.error(
+            "Vector jobs for products %s failed %d times; marked failed.",
+            [row["product_id"] for row in rows],
+            max_attempts,
+        )
+    return len(rows)
+
+
+def _claim_jobs(batch_size: int, visibility: float) -> list[dict[str, Any]]:
+    # At-least-once: a claimed job stays in the table, invisible until locked_until.
+    # It is deleted only after its vectors are written; a crash makes it visible again.
+    return fetch_all(
+        """
+        UPDATE vector_jobs
+        SET locked_until = NOW() + make_interval(secs => %s),
+            attempts = attempts + 1
+        WHERE product_id IN (
+            SELECT product_id FROM vector_jobs
+            WHERE locked_until <= NOW() AND failed_at IS NULL
+            ORDER BY enqueued_at
+            LIMIT %s
+            FOR UPDATE SKIP LOCKED
+        )
+        RETURNING product_id, enqueued_at, attempts
+        """,
+        (visibility, batch_size),
+    )
+
+
+class VectorWorker:
+    def __init__(self) -> None:
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+        self._stats: dict[str, Any] = {
+            "processed_jobs": 0,
+            "embedded_products": 0,
+            "failed_batches": 0,
+            "failed_jobs": 0,
+            "last_batch_at": None,
+            "last_error": None,
+        }
+
+    def start(self) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="vector-worker", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join(timeout)
+
+    def wake(self) -> None:
+        self._wake.set()
+
+    @property
+    def running(self) -> bool:
+        return bool(self._thread and self._thread.is_alive())
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return dict(self._stats)
+
+    def _run(self) -> None:
+        settings = get_settings()
+        while not self._stop.is_set():
+            try:
+                handled = self.process_batch()
+            except Exception as exc:  # pragma: no cover - keep the worker alive
+                logger.exception("Vector worker batch failed.")
+                with self._lock:
+                    self._stats["failed_batches"] += 1
+                    self._stats["last_error"] = str(exc)
+                handled = 0
+            if handled == 0:
+                self._wake.wait(settings.vector_worker_poll_interval)
+                self._wake.clear()
+
+    def process_batch(self) -> int:
+        settings = get_settings()
+        with transaction():
+            failed = _fail_exhausted_jobs(settings.vector_worker_max_attempts)
+            jobs = _claim_jobs(settings.vector_worker_batch_size, settings.vector_worker_visibility_timeout)
+        if failed:
+            with self._lock:
+                self._stats["failed_jobs"] += failed
+        if not jobs:
+            return 0
+        ids = [job["product_id"] for job in jobs]
+        embedded = index_missing_products(catalog.products(ids).values())
+        execute("DELETE FROM vector_jobs WHERE product_id = ANY(%s)", (ids,))
+        if embedded:
+            recommendation_cache.bump_shared()
+            recommendation_cache.invalidate()
+        with self._lock:
+            self._stats["processed_jobs"] += len(jobs)
+            self._stats["embedded_products"] += embedded
+            self._stats["last_batch_at"] = dt.datetime.now(dt.timezone.utc).isoformat()
+        return len(jobs)
+
+
+worker = VectorWorker()
+
+
+def queue_status() -> dict[str, Any]:
+    row = fetch_one(
+        """
+        SELECT
+            COUNT(*) FILTER (WHERE failed_at IS NULL) AS depth,
+            COUNT(*) FILTER (WHERE failed_at IS NULL AND locked_until > NOW()) AS in_flight,
+            COUNT(*) FILTER (WHERE failed_at IS NOT NULL) AS failed,
+            EXTRACT(EPOCH FROM NOW() - MIN(enqueued_at) FILTER (WHERE failed_at IS NULL)) AS lag_seconds,
+            MAX(attempts) FILTER (WHERE failed_at IS NULL) AS max_attempts
+        FROM vector_jobs
+        """
+    )
+    settings = get_settings()
+    return {
+        "depth": row["depth"],
+        "inFlight": row["in_flight"],
+        "failed": row["failed"],
+        "lagSeconds": float(row["lag_seconds"]) if row["lag_seconds"] is not None else 0.0,
+        "maxAttempts": row["max_attempts"] or 0,
+        "capacity": settings.vector_queue_max,
+        "maxJobAttempts": settings.vector_worker_max_attempts,
+        "workerRunning": worker.running,
+        "worker": worker.stats(),
+    }
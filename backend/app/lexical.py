@@ -0,0 +1,94 @@
+from __future__ import annotations
+
+import heapq
+import re
+import sys
+import threading
+from collections import Counter
+from typing import Any, Collection, Iterable
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> list[str]:
+    return TOKEN_PATTERN.findall(text.casefold())
+
+
+def query_tokens(query: str) -> frozenset[str]:
+    return frozenset(tokenize(query))
+
+
+def lexical_boost(matches: int) -> float:
+    return min(matches * 0.05, 0.15)
+
+
+class LexicalIndex:
+    # Inverted index over product titles and descriptions, kept in step with the
+    # catalog. Token sets are computed once per product version, so scoring a
+    # candidate is a set intersection instead of substring scans per request.
+    def __init__(self, max_postings: int) -> None:
+        self.max_postings = max_postings
+        self._lock = threading.Lock()
+        self._postings: dict[str, set[int]] = {}
+        self._docs: dict[int, tuple[str, frozenset[str], frozenset[str]]] = {}
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def update(self, product: dict[str, Any]) -> None:
+        title_tokens = frozenset(sys.intern(token) for token in tokenize(product["title"]))
+        tokens = title_tokens | frozenset(sys.intern(token) for token in tokenize(product["description"]))
+        with self._lock:
+            previous = self._docs.get(product["id"])
+            if previous is not None:
+                self._unpost(product["id"], previous[2] - tokens)
+            for token in tokens:
+                self._postings.setdefault(token, set()).add(product["id"])
+            self._docs[product["id"]] = (product["category"], title_tokens, tokens)
+
+    def remove(self, product_id: int) -> None:
+        with self._lock:
+            previous = self._docs.pop(product_id, None)
+            if previous is not None:
+                self._unpost(product_id, previous[2])
+
+    def matches(self, tokens: frozenset[str], product_id: int) -> int:
+        doc = self._docs.get(product_id)
+        return len(tokens & doc[2]) if doc else 0
+
+    def search(
+        self,
+        tokens: frozenset[str],
+        limit: int,
+        categories: Collection[str] | None = None,
+    ) -> list[int]:
+        # Products matching the most query tokens, title matches breaking ties.
+        # Tokens found in more than max_postings products (stop words, in effect)
+        # do not nominate candidates; they still count towards the boost.
+        if limit <= 0 or not tokens:
+            return []
+        counts: Counter[int] = Counter()
+        with self._lock:
+            for token in tokens:
+                postings = self._postings.get(token)
+                if postings and len(postings) <= self.max_postings:
+                    counts.update(postings)
+            ranked: Iterable[tuple[int, int, int]] = (
+                (-count, -len(tokens & self._docs[product_id][1]), product_id)
+                for product_id, count in counts.items()
+                if categories is None or self._docs[product_id][0] in categories
+            )
+            return [product_id for _, _, product_id in heapq.nsmallest(limit, ranked)]
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {"products": len(self._docs), "tokens": len(self._postings)}
+
+    def _unpost(self, product_id: int, tokens: Iterable[str]) -> None:
+        # Caller holds the lock.
+        for token in tokens:
+            postings = self._postings.get(token)
+            if postings is not None:
+                postings.discard(product_id)
+                if not postings:
+                    del self._postings[token]
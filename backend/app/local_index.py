@@ -0,0 +1,222 @@
+from __future__ import annotations
+
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Sequence
+
+import anyio
+import numpy as np
+
+from .config import get_settings
+from .db import iter_pages
+
+logger = logging.getLogger(__name__)
+
+POINTER_FILE = "current.json"
+SNAPSHOT_IDS_QUERY = "SELECT id FROM products WHERE id > %s ORDER BY id"
+
+
+class LocalIndex:
+    # Exact cosine search over a read-only, memory-mapped float32 matrix. The
+    # vectors stay in the page cache, so processes (or pods on one node) mapping
+    # the same snapshot file share a single copy instead of each loading it.
+    def __init__(
+        self,
+        version: str,
+        vectors: np.ndarray,
+        ids: list[str],
+        metadatas: list[dict],
+        chunk_rows: int = 65536,
+    ) -> None:
+        self.version = version
+        self.vectors = vectors
+        self.ids = ids
+        self.metadatas = metadatas
+        self.chunk_rows = chunk_rows
+        self.dim = vectors.shape[1] if vectors.ndim == 2 else 0
+        self._category_codes: dict[str, int] = {}
+        codes = []
+        for metadata in metadatas:
+            category = metadata.get("category", "")
+            codes.append(self._category_codes.setdefault(category, len(self._category_codes)))
+        self._categories = np.asarray(codes, dtype=np.int32)
+        self._rows: dict[str, int] | None = None
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def _mask(self, where: dict[str, Any] | None) -> np.ndarray | None:
+        # Supports the filters the API issues: {"category": v} and {"category": {"$in": [...]}}.
+        if not where:
+            return None
+        condition = where.get("category")
+        values = condition.get("$in", []) if isinstance(condition, dict) else [condition]
+        codes = [self._category_codes[value] for value in values if value in self._category_codes]
+        return np.isin(self._categories, codes)
+
+    def vectors_for(self, ids: Sequence[str]) -> dict[str, list[float]]:
+        # Rows are unit-normalized, which cosine distance does not mind.
+        if self._rows is None:
+            self._rows = {product_id: row for row, product_id in enumerate(self.ids)}
+        rows = self._rows
+        return {product_id: self.vectors[rows[product_id]].tolist() for product_id in ids if product_id in rows}
+
+    def query(self, embedding: Sequence[float], n_results: int, where: dict[str, Any] | None = None) -> dict[str, Any]:
+        # Same shape (and cosine distance) as a one-query Chroma result.
+        return self.query_many([embedding], n_results, where)
+
+    def query_many(
+        self,
+        embeddings: Sequence[Sequence[float]],
+        n_results: int,
+        where: dict[str, Any] | None = None,
+    ) -> dict[str, Any]:
+        # One pass over the matrix scores every query vector; results are listed
+        # per query, as with a multi-vector Chroma query.
+        queries = np.atleast_2d(np.asarray(embeddings, dtype=np.float32))
+        if queries.shape[1] != self.dim:
+            raise ValueError(f"Query has {queries.shape[1]} dimensions; snapshot {self.version} has {self.dim}")
+        norms = np.linalg.norm(queries, axis=1, keepdims=True)
+        norms[norms == 0.0] = 1.0
+        queries = queries / norms
+
+        scores = np.empty((len(self.ids), len(queries)), dtype=np.float32)
+        for start in range(0, len(self.ids), self.chunk_rows):
+            scores[start : start + self.chunk_rows] = self.vectors[start : start + self.chunk_rows] @ queries.T
+        mask = self._mask(where)
+        if mask is not None:
+            scores[~mask] = -np.inf
+        available = int(np.count_nonzero(mask)) if mask is not None else len(self.ids)
+        k = min(n_results, available)
+
+        results: dict[str, Any] = {"ids": [], "distances": [], "metadatas": []}
+        for column in scores.T:
+            top = np.argpartition(-column, k - 1)[:k] if k > 0 else np.empty(0, dtype=np.int64)
+            top = top[np.argsort(-column[top], kind="stable")]
+            results["ids"].append([self.ids[i] for i in top])
+            results["distances"].append((1.0 - column[top].astype(np.float64)).tolist())
+            results["metadatas"].append([self.metadatas[i] for i in top])
+        return results
+
+
+def _snapshot_files(directory: str, version: str) -> tuple[str, str]:
+    return os.path.join(directory, f"{version}.f32"), os.path.join(directory, f"{version}.json")
+
+
+def _write_json(path: str, payload: dict[str, Any]) -> None:
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as handle:
+        json.dump(payload, handle)
+    os.replace(tmp, path)
+
+
+def export_snapshot(collection, collection_name: str, directory: str | None = None) -> str | None:
+    # Copies the collection into <version>.f32 (unit-normalized rows) plus
+    # <version>.json (ids, metadata), then flips current.json. Readers only ever
+    # see complete snapshots; older files are pruned once the pointer moves.
+    settings = get_settings()
+    directory = directory or settings.vector_snapshot_dir
+    if not directory:
+        return None
+    os.makedirs(directory, exist_ok=True)
+    version = f"{collection_name}-{int(time.time() * 1000)}"
+    vectors_path, meta_path = _snapshot_files(directory, version)
+
+    ids: list[str] = []
+    metadatas: list[dict] = []
+    dim = 0
+    with open(f"{vectors_path}.tmp", "wb") as handle:
+        for page in iter_pages(SNAPSHOT_IDS_QUERY, (0,), page_size=settings.rebuild_page_size):
+            found = collection.get(ids=[str(row["id"]) for row in page], include=["embeddings", "metadatas"])
+            if not found["ids"]:
+                continue
+            matrix = np.asarray(found["embeddings"], dtype=np.float32)
+            norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+            norms[norms == 0.0] = 1.0
+            handle.write(np.ascontiguousarray(matrix / norms).tobytes())
+            dim = matrix.shape[1]
+            ids.extend(found["ids"])
+            metadatas.extend(found["metadatas"])
+    os.replace(f"{vectors_path}.tmp", vectors_path)
+    _write_json(
+        meta_path,
+        {"version": version, "collection": collection_name, "dim": dim, "ids": ids, "metadatas": metadatas},
+    )
+    _write_json(os.path.join(directory, POINTER_FILE), {"version": version})
+
+    for name in os.listdir(directory):
+        if name != POINTER_FILE and not name.startswith(version) and name.endswith((".f32", ".json")):
+            os.remove(os.path.join(directory, name))
+    logger.info("Exported %d vectors from %s to snapshot %s.", len(ids), collection_name, version)
+    return version
+
+
+def load_snapshot(directory: str) -> LocalIndex | None:
+    try:
+        with open(os.path.join(directory, POINTER_FILE), encoding="utf-8") as handle:
+            version = json.load(handle)["version"]
+        vectors_path, meta_path = _snapshot_files(directory, version)
+        with open(meta_path, encoding="utf-8") as handle:
+            meta = json.load(handle)
+    except FileNotFoundError:
+        return None
+    count = len(meta["ids"])
+    if count == 0 or not meta["dim"]:
+        return None
+    vectors = np.memmap(vectors_path, dtype=np.float32, mode="r", shape=(count, meta["dim"]))
+    return LocalIndex(version, vectors, meta["ids"], meta["metadatas"])
+
+
+_index_lock = threading.Lock()
+_index: LocalIndex | None = None
+_index_stamp: int | None = None
+_index_checked_at = 0.0
+
+
+def local_index() -> LocalIndex | None:
+    # Picks up a newer snapshot (current.json rewritten by any process) within
+    # vector_snapshot_check_interval seconds.
+    global _index, _index_stamp, _index_checked_at
+    settings = get_settings()
+    if not settings.vector_snapshot_dir:
+        return None
+    now = time.monotonic()
+    with _index_lock:
+        if now - _index_checked_at < settings.vector_snapshot_check_interval:
+            return _index
+        _index_checked_at = now
+        try:
+            stamp = os.stat(os.path.join(settings.vector_snapshot_dir, POINTER_FILE)).st_mtime_ns
+        except FileNotFoundError:
+            return _index
+        if stamp != _index_stamp:
+            try:
+                loaded = load_snapshot(settings.vector_snapshot_dir)
+            except Exception:
+                logger.exception("Could not load vector snapshot; keeping %s.", _index.version if _index else "none")
+                loaded = None
+            # A snapshot pruned between reading the pointer and its files is retried next check.
+            if loaded is not None:
+                _index, _index_stamp = loaded, stamp
+        return _index
+
+
+async def alocal_index() -> LocalIndex | None:
+    # For request handlers: between checks this is a plain read; a due check
+    # (stat plus a possible reload) runs in a worker thread, off the event loop.
+    settings = get_settings()
+    if not settings.vector_snapshot_dir:
+        return None
+    if time.monotonic() - _index_checked_at < settings.vector_snapshot_check_interval:
+        return _index
+    return await anyio.to_thread.run_sync(local_index)
+
+
+def local_index_status() -> dict[str, Any] | None:
+    index = _index
+    if index is None:
+        return None
+    return {"version": index.version, "vectors": len(index), "dim": index.dim}
@@ -1,23 +1,82 @@
 from __future__ import annotations
 
+import asyncio
 import datetime as dt
-from collections import defaultdict
+import functools
+import math
+import time
 from typing import Any
 
-from fastapi import FastAPI, HTTPException, Query
+import numpy as np
+from fastapi import FastAPI, HTTPException, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
+from .cache import TTLCache
+from .catalog import catalog
 from .config import get_settings
-from .db import execute, fetch_all, fetch_one
-from .embeddings import embed_documents, embed_query, lexical_boost, voyage_enabled
-from .seed_data import ensure_seeded, ensure_vector_ready
-from .vector_store import get_collection
+from .db import (
+    aexecute_values,
+    afetch_all,
+    afetch_one,
+    async_pool_stats,
+    async_transaction,
+    close_async_pool,
+    close_pool,
+    fetch_all,
+    get_async_conn,
+    pool_stats,
+)
+from .embeddings import (
+    aembed_queries_with_provider,
+    embed_query,
+    normalize_query,
+    query_cache_stats,
+    query_embedding_cached,
+    voyage_enabled,
+)
+from .ingest_worker import QueueFullError, aenqueue_products, aindex_missing_products, queue_status, worker
+from .metrics import (
+    HTTP_REQUESTS,
+    current_timings,
+    render_prometheus,
+    stage,
+    start_request_timings,
+    stop_request_timings,
+)
+from .result_cache import recommendation_cache
+from .scoring import epoch_micros, normalized_similarity, recency_scores, semantic_scores, top_k
+from .social import (
+    afetch_recent_events,
+    afetch_social_feed,
+    afetch_social_signals,
+    arecord_event_signals,
+    fetch_social_signals,
+)
+from .lexical import lexical_boost, query_tokens
+from .local_index import local_index_status
+from .prewarm import QuerySpec, prewarmer, query_log
+from .vector_store import (
+    aget_collection,
+    aget_vectors,
+    alive_collection_name,
+    aquery_vectors,
+    get_collection,
+    reset_vector_clients,
+)
+from .warmup import warmup
 
 
 app = FastAPI(title="phiademo API")
 settings = get_settings()
 
+_category_variants: TTLCache[tuple[str, ...]] = TTLCache(max_size=256, ttl=300)
+_candidate_yield = {"ratio": 1.0}
+_health_checks: TTLCache[dict[str, Any]] = TTLCache(max_size=1, ttl=settings.health_cache_ttl)
+
+DEBUG_TIMINGS_HEADER = "x-debug-timings"
+DEBUG_MATCHES = 10
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -32,6 +91,20 @@ class IngestPayload(BaseModel):
     event_type: str = "purchase"
 
 
+class IngestBatchPayload(BaseModel):
+    events: list[IngestPayload] = Field(..., min_length=1, max_length=5000)
+
+
+class RecommendationSpec(BaseModel):
+    q: str | None = None
+    category: str | None = None
+    limit: int = Field(12, ge=1, le=50)
+
+
+class RecommendationBatchPayload(BaseModel):
+    queries: list[RecommendationSpec] = Field(..., min_length=1, max_length=32)
+
+
 def _distance_to_confidence(distance: float) -> str:
     if distance <= settings.confidence_distance_high:
         return "High"
@@ -44,16 +117,46 @@ def _event_verb(event_type: str) -> str:
     return "bought" if event_type == "purchase" else "viewed"
 
 
-def _normalize(value: float, min_value: float, max_value: float) -> float:
-    if max_value - min_value <= 1e-6:
-        return 0.0
-    return (value - min_value) / (max_value - min_value)
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    # Per-stage breakdowns are only collected for callers that ask for them.
+    debug = request.headers.get(DEBUG_TIMINGS_HEADER, "").lower() in {"1", "true", "yes"}
+    token = start_request_timings() if debug else None
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        if debug:
+            timings = current_timings() or {}
+            response.headers["Server-Timing"] = ", ".join(
+                f"{key.replace('.', '-')};dur={entry['ms']}" for key, entry in timings.items()
+            )
+        return response
+    finally:
+        route = request.scope.get("route")
+        HTTP_REQUESTS.observe(
+            time.perf_counter() - started,
+            (request.method, getattr(route, "path", "unmatched"), str(status)),
+        )
+        if token is not None:
+            stop_request_timings(token)
 
 
 @app.on_event("startup")
-def on_startup() -> None:
-    ensure_seeded()
-    ensure_vector_ready()
+async def on_startup() -> None:
+    warmup.start(on_complete=worker.start if settings.vector_worker_enabled else None)
+    prewarmer.start(_prewarm, ready=lambda: warmup.ready)
+
+
+@app.on_event("shutdown")
+async def on_shutdown() -> None:
+    await prewarmer.stop()
+    warmup.stop()
+    worker.stop()
+    recommendation_cache.close()
+    close_pool()
+    await close_async_pool()
 
 
 @app.get("/api/friends")
@@ -62,330 +165,646 @@ def get_friends() -> dict[str, Any]:
     return {"friends": friends}
 
 
+@app.get("/api/metrics")
+def metrics() -> Response:
+    return Response(render_prometheus(), media_type="text/plain; version=0.0.4")
+
+
 @app.get("/api/debug/vector")
 def debug_vector(q: str = Query(..., min_length=1)) -> dict[str, Any]:
     collection = get_collection()
     query_embedding = embed_query(q)
-    results = collection.query(query_embeddings=[query_embedding], n_results=10)
-    matches = []
-    for metadata, distance in zip(results["metadatas"][0], results["distances"][0]):
-        matches.append(
-            {
-                "product_id": metadata["product_id"],
-                "title": metadata["title"],
-                "friend_name": metadata["friend_name"],
-                "event_type": metadata["event_type"],
-                "distance": distance,
-                "category": metadata["category"],
-            }
-        )
+    # Every match carries a friend event, as when the index held one vector per
+    # event: products without friend activity (or gone from the catalog) are
+    # skipped, widening the query until ten remain or the index runs out.
+    matches: list[dict[str, Any]] = []
+    depth = DEBUG_MATCHES
+    while True:
+        results = collection.query(query_embeddings=[query_embedding], n_results=depth)
+        product_ids = [int(metadata["product_id"]) for metadata in results["metadatas"][0]]
+        signals = fetch_social_signals(product_ids)
+        products = catalog.products(product_ids)
+        matches = []
+        for product_id, metadata, distance in zip(product_ids, results["metadatas"][0], results["distances"][0]):
+            events = signals.get(product_id, {}).get("events")
+            if not events or product_id not in products:
+                continue
+            matches.append(
+                {
+                    "product_id": product_id,
+                    "title": products[product_id]["title"],
+                    "friend_name": events[0]["friend_name"],
+                    "event_type": events[0]["event_type"],
+                    "distance": distance,
+                    "category": metadata["category"],
+                }
+            )
+        if len(matches) >= DEBUG_MATCHES or len(product_ids) < depth or depth >= settings.semantic_max_depth:
+            break
+        depth = min(depth * 2, settings.semantic_max_depth)
     return {
         "voyageEnabled": voyage_enabled(),
         "model": settings.voyage_model,
         "collectionCount": collection.count(),
-        "matches": matches,
+        "matches": matches[:DEBUG_MATCHES],
     }
 
 
+def _require_warm() -> None:
+    if warmup.blocking:
+        raise HTTPException(status_code=503, detail="Warming up", headers={"Retry-After": "5"})
+
+
+@app.get("/api/ready")
+def ready(response: Response) -> dict[str, Any]:
+    if not warmup.ready:
+        response.status_code = 503
+    return {"ready": warmup.ready, "warmup": warmup.status()}
+
+
 @app.get("/api/health")
-def health() -> dict[str, Any]:
+async def health() -> dict[str, Any]:
+    # Probes hit this often; the connectivity checks are reused for a few seconds.
+    checks = _health_checks.get("checks")
+    if checks is None:
+        checks = await _run_health_checks()
+        _health_checks.set("checks", checks)
+    return {
+        **checks,
+        "embedding_mode": "voyage" if voyage_enabled() else "fallback",
+        "warmup": warmup.status(),
+        "db_pool": pool_stats(),
+        "db_async_pool": async_pool_stats(),
+        "query_cache": query_cache_stats(),
+        "result_cache": recommendation_cache.stats(),
+        "catalog": catalog.stats(),
+        "vector_snapshot": local_index_status(),
+    }
+
+
+async def _run_health_checks() -> dict[str, Any]:
     db_connected = True
     tables_present = True
     seeded = False
     chroma_connected = True
-    embedding_mode = "voyage" if voyage_enabled() else "fallback"
 
     try:
-        fetch_one("SELECT 1")
+        async with get_async_conn():
+            await afetch_one("SELECT 1")
+            try:
+                table_check = await afetch_one(
+                    """
+                    SELECT COUNT(*) AS count
+                    FROM information_schema.tables
+                    WHERE table_schema = 'public'
+                      AND table_name IN ('friends', 'products', 'friend_events', 'users')
+                    """
+                )
+                tables_present = bool(table_check and table_check["count"] == 4)
+                seed_check = await afetch_one("SELECT COUNT(*) AS count FROM friends")
+                seeded = bool(seed_check and seed_check["count"] > 0)
+            except Exception:
+                tables_present = False
     except Exception:
         db_connected = False
         tables_present = False
 
-    if db_connected:
-        try:
-            table_check = fetch_one(
-                """
-                SELECT COUNT(*) AS count
-                FROM information_schema.tables
-                WHERE table_schema = 'public'
-                  AND table_name IN ('friends', 'products', 'friend_events', 'users')
-                """
-            )
-            tables_present = bool(table_check and table_check["count"] == 4)
-            seed_check = fetch_one("SELECT COUNT(*) AS count FROM friends")
-            seeded = bool(seed_check and seed_check["count"] > 0)
-        except Exception:
-            tables_present = False
-
     try:
-        collection = get_collection()
-        collection.count()
+        collection = await aget_collection()
+        await collection.count()
     except Exception:
         chroma_connected = False
+        reset_vector_clients()
 
     return {
         "db_connected": db_connected,
         "tables_present": tables_present,
         "seeded": seeded,
         "chroma_connected": chroma_connected,
-        "embedding_mode": embedding_mode,
     }
 
 
+async def _recommendation_key(query: str, category: str | None, limit: int) -> tuple:
+    # Keyed on the live vector version too, so an alias flip made by another
+    # process is picked up without waiting for the TTL.
+    return (
+        normalize_query(query),
+        (category or "").casefold(),
+        limit,
+        "voyage" if voyage_enabled() else "fallback",
+        await alive_collection_name() if query else None,
+    )
+
+
 @app.get("/api/recommendations")
-def recommendations(
+async def recommendations(
     q: str | None = None,
     category: str | None = None,
     limit: int = Query(12, ge=1, le=50),
 ) -> dict[str, Any]:
+    _require_warm()
     query = (q or "").strip()
+    query_log.record(_query_spec(query, category, limit))
 
+    key = await _recommendation_key(query, category, limit)
     if query:
-        return _semantic_recommendations(query, category, limit)
-
-    return _social_recommendations(category, limit)
-
-
-def _semantic_recommendations(query: str, category: str | None, limit: int) -> dict[str, Any]:
-    collection = get_collection()
-    query_embedding = embed_query(query)
-    results = collection.query(query_embeddings=[query_embedding], n_results=50)
+        compute = functools.partial(_semantic_recommendations, query, category, limit)
+    else:
+        compute = functools.partial(_social_recommendations, category, limit)
+    result = dict(await recommendation_cache.aget_or_compute(key, compute))
+
+    timings = current_timings()
+    if timings is not None:
+        result["timings"] = timings
+    return result
+
+
+@app.post("/api/recommendations/batch")
+async def recommendations_batch(payload: RecommendationBatchPayload) -> dict[str, Any]:
+    _require_warm()
+    specs = [((spec.q or "").strip(), spec.category, spec.limit) for spec in payload.queries]
+    for spec in specs:
+        query_log.record(_query_spec(*spec))
+
+    response: dict[str, Any] = {"results": await _cached_batch(specs)}
+    timings = current_timings()
+    if timings is not None:
+        response["timings"] = timings
+    return response
+
+
+async def _cached_batch(specs: list[tuple[str, str | None, int]]) -> list[dict[str, Any]]:
+    # Cached specs are answered as is; the semantic misses are computed together.
+    await recommendation_cache.arefresh_generation()
+    keys = [await _recommendation_key(*spec) for spec in specs]
+    generation = recommendation_cache.generation
+    results: list[dict[str, Any] | None] = [recommendation_cache.peek(key) for key in keys]
+
+    misses: dict[tuple, list[int]] = {}
+    for index, key in enumerate(keys):
+        if results[index] is None:
+            misses.setdefault(key, []).append(index)
+    semantic = [indexes for indexes in misses.values() if specs[indexes[0]][0]]
+    social = [indexes for indexes in misses.values() if not specs[indexes[0]][0]]
+
+    semantic_results, *social_results = await asyncio.gather(
+        _semantic_batch([specs[indexes[0]] for indexes in semantic]),
+        *(_social_recommendations(specs[indexes[0]][1], specs[indexes[0]][2]) for indexes in social),
+    )
+    for indexes, result in zip(semantic + social, [*semantic_results, *social_results]):
+        recommendation_cache.put(keys[indexes[0]], result, generation)
+        for index in indexes:
+            results[index] = result
+    return results
 
-    provider = "voyage" if voyage_enabled() else "fallback"
 
-    if not results["ids"] or not results["ids"][0]:
-        return {"mode": "semantic", "embeddingProvider": provider, "items": []}
+def _query_spec(query: str, category: str | None, limit: int) -> QuerySpec:
+    return (normalize_query(query), (category or "").casefold(), limit)
 
-    distances = results["distances"][0]
-    min_distance = min(distances)
-    max_distance = max(distances)
 
-    grouped: dict[int, dict[str, Any]] = {}
+async def _prewarm(specs: list[QuerySpec]) -> None:
+    # Computing the batch stores both the query embeddings and the responses.
+    await _cached_batch([(query, category or None, limit) for query, category, limit in specs])
 
-    for metadata, distance in zip(results["metadatas"][0], distances):
-        product_id = int(metadata["product_id"])
-        if category and metadata["category"].lower() != category.lower():
-            continue
 
-        entry = grouped.setdefault(
-            product_id,
+@app.get("/api/admin/prewarm")
+async def prewarm_status() -> dict[str, Any]:
+    # How much of the popular-query head is currently served from warm caches.
+    head = []
+    for (query, category, limit), hits in prewarmer.head():
+        key = await _recommendation_key(query, category or None, limit)
+        head.append(
             {
-                "product": metadata,
-                "matches": [],
-                "best_distance": distance,
-                "best_event": metadata,
-            },
+                "q": query,
+                "category": category or None,
+                "limit": limit,
+                "hits": hits,
+                "result_cached": recommendation_cache.fresh(key),
+                "embedding_cached": query_embedding_cached(query) if query else None,
+            }
         )
-        entry["matches"].append({**metadata, "distance": distance})
-        if distance < entry["best_distance"]:
-            entry["best_distance"] = distance
-            entry["best_event"] = metadata
+    semantic = [entry for entry in head if entry["q"]]
+    return {
+        **prewarmer.status(),
+        "coverage": {
+            "results": f"{sum(entry['result_cached'] for entry in head)}/{len(head)}",
+            "embeddings": f"{sum(entry['embedding_cached'] for entry in semantic)}/{len(semantic)}",
+        },
+        "head": head,
+    }
 
-    scored_items = []
-    now = dt.datetime.now(dt.timezone.utc)
 
-    for product_id, payload in grouped.items():
-        product_meta = payload["product"]
-        best_distance = payload["best_distance"]
-        similarity = max(0.0, 1 - best_distance)
-        similarity_norm = 1 - _normalize(best_distance, min_distance, max_distance)
-
-        strongest_friend = max(match["friend_strength"] for match in payload["matches"])
-        latest_ts = max(dt.datetime.fromisoformat(match["timestamp"]) for match in payload["matches"])
-        days_ago = (now - latest_ts).days
-        recency_score = max(0.0, 1 - min(days_ago / 30.0, 1))
-
-        event_weight = max(1.0 if match["event_type"] == "purchase" else 0.6 for match in payload["matches"])
-        lex_boost = lexical_boost(query, product_meta["title"], product_meta["description"])
-
-        score = (
-            0.75 * similarity_norm
-            + 0.08 * strongest_friend
-            + 0.07 * recency_score
-            + 0.05 * event_weight
-            + lex_boost
+async def _category_spellings(category: str) -> tuple[str, ...]:
+    # Stored categories keep their original casing; match case-insensitively by
+    # expanding to the spellings that exist in the catalog.
+    key = category.lower()
+    variants = _category_variants.get(key)
+    if variants is None:
+        rows = await afetch_all("SELECT DISTINCT category FROM products WHERE lower(category) = %s", (key,))
+        variants = tuple(row["category"] for row in rows)
+        _category_variants.set(key, variants)
+    return variants
+
+
+def _category_where(variants: tuple[str, ...]) -> dict[str, Any]:
+    if len(variants) == 1:
+        return {"category": variants[0]}
+    return {"category": {"$in": list(variants)}}
+
+
+def _candidate_depth(limit: int) -> int:
+    # Start deep enough that, at the recently observed share of ANN hits that
+    # survive (products with friend activity), one query usually fills the page.
+    depth = math.ceil(limit * settings.semantic_depth_factor / max(_candidate_yield["ratio"], 0.05))
+    return max(settings.semantic_min_depth, min(depth, settings.semantic_max_depth))
+
+
+def _record_candidate_yield(kept: int, returned: int) -> None:
+    if returned:
+        _candidate_yield["ratio"] = 0.8 * _candidate_yield["ratio"] + 0.2 * (kept / returned)
+
+
+async def _semantic_recommendations(query: str, category: str | None, limit: int) -> dict[str, Any]:
+    return (await _semantic_batch([(query, category, limit)]))[0]
+
+
+async def _semantic_batch(specs: list[tuple[str, str | None, int]]) -> list[dict[str, Any]]:
+    # Every (query, category, limit) spec shares one embedding request, one
+    # multi-vector query per distinct category filter, one social-signal read
+    # and one scoring pass, so a batch costs about as much as a single query.
+    with stage("embed_query"):
+        embeddings, provider = await aembed_queries_with_provider([query for query, _, _ in specs])
+
+    filters: dict[int, tuple[str, ...] | None] = {}
+    for index, (_, category, _) in enumerate(specs):
+        if not category:
+            filters[index] = None
+        elif variants := await _category_spellings(category):
+            filters[index] = variants
+
+    # Lexical hits are nominated up front so their social signals arrive with the
+    # first round of vector hits.
+    tokens = {index: query_tokens(specs[index][0]) for index in filters}
+    with stage("lexical"):
+        lexical = {
+            index: catalog.lexical.search(tokens[index], settings.lexical_candidates, filters[index])
+            for index in filters
+        }
+    lexical_ids = {product_id for product_ids in lexical.values() for product_id in product_ids}
+
+    depths = {index: _candidate_depth(specs[index][2]) for index in filters}
+    signals: dict[int, dict[str, Any]] = {}
+    products: dict[int, dict[str, Any]] = {}
+    seen: set[int] = set()
+    found: dict[int, tuple[list[tuple[dict[str, Any], float]], list[float]]] = {}
+    sources: dict[int, str] = {}
+    pending = list(filters)
+    while pending:
+        groups: dict[tuple[str, ...] | None, list[int]] = {}
+        for index in pending:
+            groups.setdefault(filters[index], []).append(index)
+        group_depths = [max(depths[index] for index in group) for group in groups.values()]
+        group_results = await asyncio.gather(
+            *(
+                aquery_vectors(
+                    [embeddings[index] for index in group],
+                    depth,
+                    _category_where(variants) if variants else None,
+                )
+                for (variants, group), depth in zip(groups.items(), group_depths)
+            )
         )
 
-        matches_sorted = sorted(payload["matches"], key=lambda item: item["distance"])[:3]
-        best_event = payload["best_event"]
-
-        scored_items.append(
-            {
-                "id": product_id,
-                "title": product_meta["title"],
-                "brand": product_meta.get("brand", ""),
-                "category": product_meta["category"],
-                "price": f"{float(product_meta['price']):.2f}",
-                "description": product_meta["description"],
-                "friendName": best_event["friend_name"],
-                "friendAvatar": best_event["friend_avatar"],
-                "eventType": best_event["event_type"],
-                "distance": best_distance,
-                "similarity": similarity,
-                "confidence": _distance_to_confidence(best_distance),
-                "score": score,
-                "explanation": {
-                    "summary": f"Because {best_event['friend_name']} {_event_verb(best_event['event_type'])} {product_meta['title']}",
-                    "semanticScore": round(similarity_norm, 3),
-                    "friendStrength": round(strongest_friend, 3),
-                    "recencyScore": round(recency_score, 3),
-                    "eventWeight": event_weight,
-                    "lexicalBoost": round(lex_boost, 3),
-                    "matches": [
-                        {
-                            "friendName": match["friend_name"],
-                            "eventType": match["event_type"],
-                            "distance": match["distance"],
-                            "timestamp": match["timestamp"],
-                            "productTitle": match["title"],
-                        }
-                        for match in matches_sorted
-                    ],
-                },
-            }
+        # A group is queried at its deepest spec's depth; each spec keeps only its
+        # own depth of the (distance-ordered) hits, as if it had been queried alone.
+        hits: dict[int, tuple[list[int], list[float], str]] = {}
+        for group, (results, vector_source) in zip(groups.values(), group_results):
+            for position, index in enumerate(group):
+                metadatas = results["metadatas"][position][: depths[index]]
+                distances = results["distances"][position][: depths[index]]
+                hits[index] = ([int(metadata["product_id"]) for metadata in metadatas], distances, vector_source)
+
+        hit_ids = {product_id for product_ids, *_ in hits.values() for product_id in product_ids}
+        new_ids = (hit_ids | lexical_ids) - seen
+        seen |= new_ids
+        with stage("social_signals"):
+            signals.update(await afetch_social_signals(new_ids))
+        with stage("catalog"):
+            products.update(await catalog.aproducts(product_id for product_id in new_ids if product_id in signals))
+
+        pending = []
+        for index, (product_ids, distances, vector_source) in hits.items():
+            depth = depths[index]
+            sources[index] = vector_source
+            if not product_ids:
+                continue
+            candidates = [
+                (products[product_id], distance)
+                for product_id, distance in zip(product_ids, distances)
+                if product_id in products
+            ]
+            exhausted = len(distances) < depth or depth >= settings.semantic_max_depth
+            if len(candidates) >= specs[index][2] or exhausted:
+                _record_candidate_yield(len(candidates), len(distances))
+                if candidates:
+                    found[index] = (candidates, distances)
+            else:
+                depths[index] = min(depth * 2, settings.semantic_max_depth)
+                pending.append(index)
+
+    # Lexical hits the vector search did not return join with their distance to
+    # the query, so text matches beyond the ANN depth can still rank.
+    merged: dict[int, list[int]] = {}
+    for index, product_ids in lexical.items():
+        returned = {product["id"] for product, _ in found[index][0]} if index in found else set()
+        extra = [product_id for product_id in product_ids if product_id in products and product_id not in returned]
+        if extra:
+            merged[index] = extra
+    if merged:
+        with stage("lexical_vectors"):
+            vectors = await aget_vectors(sorted({str(product_id) for ids in merged.values() for product_id in ids}))
+        for index, product_ids in merged.items():
+            product_ids = [product_id for product_id in product_ids if str(product_id) in vectors]
+            if not product_ids:
+                continue
+            matrix = np.asarray([vectors[str(product_id)] for product_id in product_ids], dtype=np.float64)
+            query_vector = np.asarray(embeddings[index], dtype=np.float64)
+            norms = np.linalg.norm(matrix, axis=1) * np.linalg.norm(query_vector)
+            norms[norms == 0.0] = 1.0
+            distances = 1.0 - matrix @ query_vector / norms
+            # Similarity stays normalized against the ANN distance range; an extra
+            # farther than everything the ANN returned scores as its farthest hit.
+            candidates, ann_distances = found.get(index, ([], []))
+            if ann_distances:
+                distances = np.clip(distances, min(ann_distances), max(ann_distances))
+            else:
+                ann_distances = distances.tolist()
+            extra = [(products[product_id], distance) for product_id, distance in zip(product_ids, distances.tolist())]
+            found[index] = (candidates + extra, ann_distances)
+
+    # One dict per spec: callers cache and mutate each response on its own. Specs
+    # with an unknown category never reach the vector index and have no source.
+    responses: list[dict[str, Any]] = [
+        {"mode": "semantic", "embeddingProvider": provider, "vectorSource": sources.get(index), "items": []}
+        for index in range(len(specs))
+    ]
+    if not found:
+        return responses
+
+    # Columnar scoring: one vectorized pass over every candidate of every spec,
+    # then top-k within each spec's slice.
+    with stage("scoring"):
+        order = sorted(found)
+        bounds = np.cumsum([0] + [len(found[index][0]) for index in order])
+        candidates = [candidate for index in order for candidate in found[index][0]]
+        candidate_tokens = [tokens[index] for index in order for _ in found[index][0]]
+        socials = [signals[product["id"]] for product, _ in candidates]
+        best_distances = np.asarray([distance for _, distance in candidates], dtype=np.float64)
+        similarity_norm = np.concatenate(
+            [
+                normalized_similarity(best_distances[lo:hi], min(found[index][1]), max(found[index][1]))
+                for index, lo, hi in zip(order, bounds[:-1], bounds[1:])
+            ]
         )
-
-    scored_items.sort(key=lambda item: item["score"], reverse=True)
-    return {"mode": "semantic", "embeddingProvider": provider, "items": scored_items[:limit]}
-
-
-def _social_recommendations(category: str | None, limit: int) -> dict[str, Any]:
-    events = fetch_all(
-        """
-        SELECT
-            friend_events.id,
-            friend_events.event_type,
-            friend_events.created_at,
-            friends.name AS friend_name,
-            friends.avatar_url,
-            friends.strength,
-            products.id AS product_id,
-            products.title,
-            products.brand,
-            products.category,
-            products.price,
-            products.description
-        FROM friend_events
-        JOIN friends ON friends.id = friend_events.friend_id
-        JOIN products ON products.id = friend_events.product_id
-        ORDER BY friend_events.created_at DESC
-        LIMIT 200
-        """
-    )
-
-    grouped: dict[int, dict[str, Any]] = defaultdict(lambda: {"events": []})
-    now = dt.datetime.now(dt.timezone.utc)
-
-    for event in events:
-        if category and event["category"].lower() != category.lower():
-            continue
-        grouped[event["product_id"]]["product"] = event
-        grouped[event["product_id"]]["events"].append(event)
-
-    scored_items = []
-
-    for product_id, payload in grouped.items():
-        product = payload["product"]
-        event_list = payload["events"]
-
-        strongest_friend = max(item["strength"] for item in event_list)
-        latest_ts = max(item["created_at"] for item in event_list)
-        days_ago = (now - latest_ts).days
-        recency_score = max(0.0, 1 - min(days_ago / 30.0, 1))
-        event_weight = max(1.0 if item["event_type"] == "purchase" else 0.6 for item in event_list)
-
-        score = 0.45 * strongest_friend + 0.35 * recency_score + 0.2 * event_weight
-        best_event = event_list[0]
-        matches_sorted = sorted(event_list, key=lambda item: item["created_at"], reverse=True)[:3]
-
-        scored_items.append(
-            {
-                "id": product_id,
-                "title": product["title"],
-                "brand": product["brand"],
-                "category": product["category"],
-                "price": f"{float(product['price']):.2f}",
-                "description": product["description"],
-                "friendName": best_event["friend_name"],
-                "friendAvatar": best_event["avatar_url"],
-                "eventType": best_event["event_type"],
-                "distance": None,
-                "similarity": None,
-                "confidence": "Social",
-                "score": score,
-                "explanation": {
-                    "summary": f"Because {best_event['friend_name']} {_event_verb(best_event['event_type'])} {product['title']}",
-                    "semanticScore": None,
-                    "friendStrength": round(strongest_friend, 3),
-                    "recencyScore": round(recency_score, 3),
-                    "eventWeight": event_weight,
-                    "lexicalBoost": 0.0,
-                    "matches": [
-                        {
-                            "friendName": match["friend_name"],
-                            "eventType": match["event_type"],
-                            "distance": None,
-                            "timestamp": match["created_at"].isoformat(),
-                            "productTitle": match["title"],
-                        }
-                        for match in matches_sorted
-                    ],
-                },
-            }
+        strengths = np.asarray([social["strongest_friend"] for social in socials], dtype=np.float64)
+        latest = np.asarray([epoch_micros(social["latest_at"]) for social in socials], dtype=np.int64)
+        recency = recency_scores(latest, dt.datetime.now(dt.timezone.utc))
+        event_weights = np.asarray([social["event_weight"] for social in socials], dtype=np.float64)
+        boosts = np.asarray(
+            [
+                lexical_boost(catalog.lexical.matches(query, product["id"]))
+                for query, (product, _) in zip(candidate_tokens, candidates)
+            ],
+            dtype=np.float64,
         )
-
-    scored_items.sort(key=lambda item: item["score"], reverse=True)
-    return {"mode": "social", "items": scored_items[:limit]}
-
-
-@app.post("/api/ingest")
-def ingest(payload: IngestPayload) -> dict[str, Any]:
-    product = fetch_one(
-        """
-        SELECT products.id, products.title, products.brand, products.description, products.category, products.price,
-               friends.name AS friend_name, friends.avatar_url, friends.strength
-        FROM products
-        JOIN friends ON friends.id = %s
-        WHERE products.id = %s
-        """,
-        (payload.friend_id, payload.product_id),
-    )
-    if not product:
-        raise HTTPException(status_code=404, detail="Product or friend not found")
-
-    event_type = payload.event_type if payload.event_type in {"purchase", "view"} else "purchase"
-    execute(
-        "INSERT INTO friend_events (friend_id, product_id, event_type, created_at) VALUES (%s, %s, %s, %s)",
-        (payload.friend_id, payload.product_id, event_type, dt.datetime.now(dt.timezone.utc)),
-    )
-
-    collection = get_collection()
-    document = f"{product['title']} {product['description']}"
-    embedding = embed_documents([document])[0]
-
-    event_row = fetch_one("SELECT id FROM friend_events ORDER BY id DESC LIMIT 1")
-    event_id = str(event_row["id"]) if event_row else None
-    if event_id:
-        collection.add(
-            ids=[event_id],
-            embeddings=[embedding],
-            metadatas=[
+        scores = semantic_scores(similarity_norm, strengths, recency, event_weights, boosts)
+        tops = {
+            index: (lo + top_k(scores[lo:hi], specs[index][2])).tolist()
+            for index, lo, hi in zip(order, bounds[:-1], bounds[1:])
+        }
+
+    with stage("serialize"):
+        for index, top in tops.items():
+            scored_items = []
+            for idx in top:
+                product, best_distance = candidates[idx]
+                matches_sorted = socials[idx]["events"]
+                best_event = matches_sorted[0]
+                similarity = max(0.0, 1 - best_distance)
+
+                scored_items.append(
+                    {
+                        "id": product["id"],
+                        "title": product["title"],
+                        "brand": product["brand"],
+                        "category": product["category"],
+                        "price": f"{product['price']:.2f}",
+                        "description": product["description"],
+                        "friendName": best_event["friend_name"],
+                        "friendAvatar": best_event["avatar_url"],
+                        "eventType": best_event["event_type"],
+                        "distance": best_distance,
+                        "similarity": similarity,
+                        "confidence": _distance_to_confidence(best_distance),
+                        "score": float(scores[idx]),
+                        "explanation": {
+                            "summary": f"Because {best_event['friend_name']} {_event_verb(best_event['event_type'])} {product['title']}",
+                            "semanticScore": round(float(similarity_norm[idx]), 3),
+                            "friendStrength": round(float(strengths[idx]), 3),
+                            "recencyScore": round(float(recency[idx]), 3),
+                            "eventWeight": float(event_weights[idx]),
+                            "lexicalBoost": round(float(boosts[idx]), 3),
+                            "matches": [
+                                {
+                                    "friendName": match["friend_name"],
+                                    "eventType": match["event_type"],
+                                    "distance": best_distance,
+                                    "timestamp": match["created_at"].isoformat(),
+                                    "productTitle": product["title"],
+                                }
+                                for match in matches_sorted
+                            ],
+                        },
+                    }
+                )
+            responses[index]["items"] = scored_items
+
+    return responses
+
+
+async def _social_recommendations(category: str | None, limit: int) -> dict[str, Any]:
+    now = dt.datetime.now(dt.timezone.utc)
+    with stage("social_feed"):
+        products = await afetch_social_feed(category, limit=limit, now=now)
+    if not products:
+        return {"mode": "social", "items": []}
+
+    with stage("scoring"):
+        strengths = np.asarray([product["strongest_friend"] for product in products], dtype=np.float64)
+        latest = np.asarray([epoch_micros(product["latest_at"]) for product in products], dtype=np.int64)
+        recency = recency_scores(latest, now)
+        event_weights = np.asarray([1.0 if product["any_purchase"] else 0.6 for product in products], dtype=np.float64)
+        scores = 0.45 * strengths + 0.35 * recency + 0.2 * event_weights
+        top = top_k(scores, limit).tolist()
+
+    with stage("recent_events"):
+        events = await afetch_recent_events(products[idx]["product_id"] for idx in top)
+    with stage("catalog"):
+        details = await catalog.aproducts(products[idx]["product_id"] for idx in top)
+
+    with stage("serialize"):
+        scored_items = []
+        for idx in top:
+            product = details.get(products[idx]["product_id"])
+            matches_sorted = events.get(products[idx]["product_id"], [])
+            if product is None or not matches_sorted:
+                continue
+            best_event = matches_sorted[0]
+
+            scored_items.append(
                 {
-                    "product_id": product["id"],
-                    "friend_id": payload.friend_id,
-                    "event_type": event_type,
-                    "timestamp": dt.datetime.now(dt.timezone.utc).isoformat(),
-                    "category": product["category"],
+                    "id": product["id"],
                     "title": product["title"],
                     "brand": product["brand"],
+                    "category": product["category"],
+                    "price": f"{product['price']:.2f}",
                     "description": product["description"],
-                    "friend_name": product["friend_name"],
-                    "friend_avatar": product["avatar_url"],
-                    "friend_strength": product["strength"],
-                    "price": float(product["price"]),
+                    "friendName": best_event["friend_name"],
+                    "friendAvatar": best_event["avatar_url"],
+                    "eventType": best_event["event_type"],
+                    "distance": None,
+                    "similarity": None,
+                    "confidence": "Social",
+                    "score": float(scores[idx]),
+                    "explanation": {
+                        "summary": f"Because {best_event['friend_name']} {_event_verb(best_event['event_type'])} {product['title']}",
+                        "semanticScore": None,
+                        "friendStrength": round(float(strengths[idx]), 3),
+                        "recencyScore": round(float(recency[idx]), 3),
+                        "eventWeight": float(event_weights[idx]),
+                        "lexicalBoost": 0.0,
+                        "matches": [
+                            {
+                                "friendName": match["friend_name"],
+                                "eventType": match["event_type"],
+                                "distance": None,
+                                "timestamp": match["created_at"].isoformat(),
+                                "productTitle": product["title"],
+                            }
+                            for match in matches_sorted
+                        ],
+                    },
                 }
-            ],
-            documents=[document],
-        )
+            )
+
+    return {"mode": "social", "items": scored_items}
+
+
+async def _ingest_events(payloads: list[IngestPayload], defer_vectors: bool = False) -> list[dict[str, Any]]:
+    friend_ids = sorted({payload.friend_id for payload in payloads})
+    product_ids = sorted({payload.product_id for payload in payloads})
+    created_at = dt.datetime.now(dt.timezone.utc)
+    results: list[dict[str, Any]] = [{"status": "not_found"} for _ in payloads]
+
+    friends = await catalog.afriends(friend_ids)
+    products = await catalog.aproducts(product_ids)
+
+    async with async_transaction():
+        accepted = []
+        for index, payload in enumerate(payloads):
+            if payload.friend_id not in friends or payload.product_id not in products:
+                results[index]["detail"] = "Product or friend not found"
+                continue
+            event_type = payload.event_type if payload.event_type in {"purchase", "view"} else "purchase"
+            accepted.append((index, payload, event_type))
+
+        if accepted:
+            # One multi-row INSERT; RETURNING rows come back in VALUES order.
+            inserted = await aexecute_values(
+                "INSERT INTO friend_events (friend_id, product_id, event_type, created_at) VALUES %s RETURNING id",
+                [(payload.friend_id, payload.product_id, event_type, created_at) for _, payload, event_type in accepted],
+                page_size=max(len(accepted), 1),
+                fetch=True,
+            )
+            await arecord_event_signals(
+                {
+                    "product_id": payload.product_id,
+                    "category": products[payload.product_id]["category"],
+                    "strength": friends[payload.friend_id]["strength"],
+                    "event_type": event_type,
+                    "created_at": created_at,
+                }
+                for _, payload, event_type in accepted
+            )
+            for (index, _, event_type), row in zip(accepted, inserted):
+                results[index] = {"status": "ok", "eventId": row["id"], "eventType": event_type}
+
+        if accepted:
+            # Committed with the events, so every replica drops its cached responses.
+            await recommendation_cache.abump_shared()
+        touched = {payload.product_id for _, payload, _ in accepted}
+        if defer_vectors:
+            # Enqueued in the same transaction as the events, so a committed event
+            # always has a pending vector job (at-least-once).
+            await aenqueue_products(touched)
+
+    if defer_vectors:
+        worker.wake()
+    elif await aindex_missing_products(products[product_id] for product_id in touched):
+        await recommendation_cache.abump_shared()
+    if accepted:
+        recommendation_cache.invalidate()
+
+    return results
+
+
+async def _ingest_or_429(payloads: list[IngestPayload], mode: str | None) -> list[dict[str, Any]]:
+    defer = (mode or settings.ingest_mode) == "async"
+    try:
+        return await _ingest_events(payloads, defer_vectors=defer)
+    except QueueFullError as exc:
+        raise HTTPException(
+            status_code=429,
+            detail=str(exc),
+            headers={"Retry-After": str(max(1, int(settings.vector_worker_poll_interval)))},
+        ) from exc
+
 
+@app.post("/api/ingest")
+async def ingest(
+    payload: IngestPayload,
+    response: Response,
+    mode: str | None = Query(None, pattern="^(sync|async)$"),
+) -> dict[str, Any]:
+    _require_warm()
+    result = (await _ingest_or_429([payload], mode))[0]
+    if result["status"] != "ok":
+        raise HTTPException(status_code=404, detail=result["detail"])
+    if (mode or settings.ingest_mode) == "async":
+        response.status_code = 202
+        return {"status": "accepted", "eventId": result["eventId"]}
     return {"status": "ok"}
+
+
+@app.post("/api/ingest/batch")
+async def ingest_batch(
+    payload: IngestBatchPayload,
+    response: Response,
+    mode: str | None = Query(None, pattern="^(sync|async)$"),
+) -> dict[str, Any]:
+    _require_warm()
+    results = await _ingest_or_429(payload.events, mode)
+    accepted = sum(1 for result in results if result["status"] == "ok")
+    if (mode or settings.ingest_mode) == "async":
+        response.status_code = 202
+    return {
+        "status": "ok" if accepted == len(results) else "partial",
+        "accepted": accepted,
+        "rejected": len(results) - accepted,
+        "results": [{"index": index, **result} for index, result in enumerate(results)],
+    }
+
+
+@app.get("/api/ingest/status")
+def ingest_status() -> dict[str, Any]:
+    return {"mode": settings.ingest_mode, "queue": queue_status()}
@@ -0,0 +1,129 @@
+from __future__ import annotations
+
+import bisect
+import contextlib
+import contextvars
+import threading
+import time
+from typing import Iterator
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, label_names: tuple[str, ...], buckets=DEFAULT_BUCKETS) -> None:
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        # labels -> [per-bucket counts..., +Inf count, sum]
+        self._series: dict[tuple[str, ...], list[float]] = {}
+
+    def observe(self, seconds: float, labels: tuple[str, ...]) -> None:
+        index = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += seconds
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = {labels: list(series) for labels, series in self._series.items()}
+        for labels, series in sorted(snapshot.items()):
+            base = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(self.label_names, labels))
+            prefix = f"{base}," if base else ""
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{prefix}le="{bound}"}} {cumulative}')
+            cumulative += series[len(self.buckets)]
+            lines.append(f'{self.name}_bucket{{{prefix}le="+Inf"}} {cumulative}')
+            suffix = f"{{{base}}}" if base else ""
+            lines.append(f"{self.name}_sum{suffix} {series[-1]}")
+            lines.append(f"{self.name}_count{suffix} {cumulative}")
+        return lines
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+HTTP_REQUESTS = Histogram(
+    "phiademo_http_request_duration_seconds",
+    "HTTP request latency by route.",
+    ("method", "route", "status"),
+)
+STAGES = Histogram(
+    "phiademo_stage_duration_seconds",
+    "Latency of hot-path stages inside request handlers.",
+    ("stage",),
+)
+DB_QUERIES = Histogram(
+    "phiademo_db_query_duration_seconds",
+    "Postgres statement latency, including pool checkout.",
+    ("operation",),
+)
+EXTERNAL_CALLS = Histogram(
+    "phiademo_external_call_duration_seconds",
+    "Latency of calls to Chroma and Voyage.",
+    ("service", "operation"),
+)
+REGISTRY = (HTTP_REQUESTS, STAGES, DB_QUERIES, EXTERNAL_CALLS)
+
+# Per-request breakdown, only collected when a caller asks for debug timings.
+_request_timings: contextvars.ContextVar[dict[str, list[float]] | None] = contextvars.ContextVar(
+    "phiademo_request_timings", default=None
+)
+
+
+@contextlib.contextmanager
+def _timed(histogram: Histogram, labels: tuple[str, ...], key: str) -> Iterator[None]:
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        histogram.observe(elapsed, labels)
+        timings = _request_timings.get()
+        if timings is not None:
+            entry = timings.setdefault(key, [0.0, 0])
+            entry[0] += elapsed
+            entry[1] += 1
+
+
+def stage(name: str) -> contextlib.AbstractContextManager[None]:
+    return _timed(STAGES, (name,), name)
+
+
+def db_query(operation: str) -> contextlib.AbstractContextManager[None]:
+    return _timed(DB_QUERIES, (operation,), f"db.{operation}")
+
+
+def external_call(service: str, operation: str) -> contextlib.AbstractContextManager[None]:
+    return _timed(EXTERNAL_CALLS, (service, operation), f"{service}.{operation}")
+
+
+def start_request_timings() -> contextvars.Token:
+    return _request_timings.set({})
+
+
+def stop_request_timings(token: contextvars.Token) -> None:
+    _request_timings.reset(token)
+
+
+def current_timings() -> dict[str, dict[str, float]] | None:
+    timings = _request_timings.get()
+    if timings is None:
+        return None
+    return {key: {"ms": round(total * 1000, 3), "count": count} for key, (total, count) in timings.items()}
+
+
+def render_prometheus() -> str:
+    lines: list[str] = []
+    for histogram in REGISTRY:
+        lines.extend(histogram.render())
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,224 @@
+from __future__ import annotations
+
+import asyncio
+import datetime as dt
+import heapq
+import logging
+import threading
+from typing import Any, Awaitable, Callable
+
+from .config import get_settings
+from .db import aexecute, aexecute_values, afetch_all
+
+logger = logging.getLogger(__name__)
+
+# (normalized q, casefolded category, limit)
+QuerySpec = tuple[str, str, int]
+
+FLUSH_SQL = """
+    INSERT INTO query_log (query, category, page_size, hits, last_seen)
+    VALUES %s
+    ON CONFLICT (query, category, page_size) DO UPDATE
+    SET hits = query_log.hits + EXCLUDED.hits,
+        last_seen = EXCLUDED.last_seen
+"""
+FLUSH_TEMPLATE = "(%s, %s, %s, %s, NOW())"
+HEAD_SQL = """
+    SELECT query, category, page_size, hits
+    FROM query_log
+    WHERE last_seen > NOW() - make_interval(days => %s)
+    ORDER BY hits DESC
+    LIMIT %s
+"""
+PRUNE_SQL = "DELETE FROM query_log WHERE last_seen <= NOW() - make_interval(days => %s)"
+
+
+class QueryLog:
+    """Approximate top-K query counts in fixed memory (the Space-Saving algorithm).
+
+    Every tracked spec's count overestimates its true count by at most its
+    ``error``, and any spec seen more than ``total / capacity`` times is tracked.
+    """
+
+    def __init__(self, capacity: int) -> None:
+        self.capacity = max(1, capacity)
+        self._lock = threading.Lock()
+        # spec -> [count, error, count already flushed]
+        self._counts: dict[QuerySpec, list[int]] = {}
+        # One (count, spec) per tracked spec, possibly behind its current count:
+        # increments do not touch the heap, eviction re-pushes outdated entries.
+        self._heap: list[tuple[int, QuerySpec]] = []
+        self._total = 0
+
+    def __len__(self) -> int:
+        return len(self._counts)
+
+    def record(self, spec: QuerySpec) -> None:
+        with self._lock:
+            self._total += 1
+            entry = self._counts.get(spec)
+            if entry is not None:
+                entry[0] += 1
+                return
+            if len(self._counts) < self.capacity:
+                self._counts[spec] = [1, 0, 0]
+                heapq.heappush(self._heap, (1, spec))
+                return
+            # The newcomer inherits the evicted minimum as its possible overcount.
+            floor = self._evict_min()
+            self._counts[spec] = [floor + 1, floor, floor]
+            heapq.heappush(self._heap, (floor + 1, spec))
+
+    def _evict_min(self) -> int:
+        # Amortized O(log n): each outdated entry popped here is re-pushed once
+        # with its current count, and each increment outdates at most one entry.
+        while True:
+            count, spec = heapq.heappop(self._heap)
+            current = self._counts[spec][0]
+            if current == count:
+                del self._counts[spec]
+                return count
+            heapq.heappush(self._heap, (current, spec))
+
+    def top(self, n: int) -> list[tuple[QuerySpec, int]]:
+        with self._lock:
+            ranked = sorted(self._counts.items(), key=lambda item: item[1][0], reverse=True)[:n]
+            return [(spec, entry[0]) for spec, entry in ranked]
+
+    def take_deltas(self) -> list[tuple[QuerySpec, int]]:
+        # Counts gained since the last call; specs evicted in between are dropped,
+        # which only loses tail queries.
+        with self._lock:
+            deltas = []
+            for spec, entry in self._counts.items():
+                if entry[0] > entry[2]:
+                    deltas.append((spec, entry[0] - entry[2]))
+                    entry[2] = entry[0]
+            return deltas
+
+    def restore(self, deltas: list[tuple[QuerySpec, int]]) -> None:
+        # Hands back deltas whose flush failed, so the next flush retries them.
+        with self._lock:
+            for spec, delta in deltas:
+                entry = self._counts.get(spec)
+                if entry is not None:
+                    entry[2] -= delta
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {"tracked": len(self._counts), "capacity": self.capacity, "recorded": self._total}
+
+
+WarmBatch = Callable[[list[QuerySpec]], Awaitable[None]]
+
+
+class Prewarmer:
+    # Every interval: flush local counts into query_log (shared by all processes),
+    # read back the head of the distribution and compute embeddings and responses
+    # for it, so the first searches after a deploy or an invalidation hit warm caches.
+    def __init__(self, log: QueryLog, interval: float, top_n: int, batch_size: int, retention_days: int) -> None:
+        self.log = log
+        self.interval = interval
+        self.top_n = top_n
+        self.batch_size = max(1, batch_size)
+        self.retention_days = retention_days
+        self._task: asyncio.Task | None = None
+        self._head: list[tuple[QuerySpec, int]] = []
+        self._state: dict[str, Any] = {"runs": 0, "errors": 0, "last_run_at": None, "last_error": None}
+
+    def start(self, warm: WarmBatch, ready: Callable[[], bool]) -> None:
+        if self.interval <= 0 or self.top_n <= 0 or (self._task and not self._task.done()):
+            return
+        self._task = asyncio.get_running_loop().create_task(self._loop(warm, ready), name="prewarm")
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def run_once(self, warm: WarmBatch) -> None:
+        try:
+            await self._flush()
+            self._head = await self._load_head()
+        except Exception as exc:
+            # Without Postgres, warm what this process has seen itself.
+            logger.warning("Could not sync the query log (%r); using local counts.", exc)
+            self._head = self.log.top(self.top_n)
+        specs = [spec for spec, _ in self._head]
+        for start in range(0, len(specs), self.batch_size):
+            await warm(specs[start : start + self.batch_size])
+        self._state["runs"] += 1
+        self._state["last_run_at"] = dt.datetime.now(dt.timezone.utc).isoformat()
+
+    def head(self) -> list[tuple[QuerySpec, int]]:
+        # The specs the last run warmed, with their logged hits.
+        return list(self._head)
+
+    def status(self) -> dict[str, Any]:
+        return {
+            **self._state,
+            "enabled": self.interval > 0 and self.top_n > 0,
+            "interval": self.interval,
+            "log": self.log.stats(),
+        }
+
+    async def _loop(self, warm: WarmBatch, ready: Callable[[], bool]) -> None:
+        while not ready():
+            await asyncio.sleep(1)
+        while True:
+            try:
+                await self.run_once(warm)
+            except Exception as exc:
+                self._state["errors"] += 1
+                self._state["last_error"] = str(exc)
+                logger.exception("Query pre-warm run failed.")
+            await asyncio.sleep(self.interval)
+
+    async def _flush(self) -> None:
+        deltas = self.log.take_deltas()
+        if deltas:
+            try:
+                await aexecute_values(
+                    FLUSH_SQL,
+                    [(query, category, limit, hits) for (query, category, limit), hits in deltas],
+                    template=FLUSH_TEMPLATE,
+                )
+            except Exception:
+                self.log.restore(deltas)
+                raise
+        await aexecute(PRUNE_SQL, (self.retention_days,))
+
+    async def _load_head(self) -> list[tuple[QuerySpec, int]]:
+        rows = await afetch_all(HEAD_SQL, (self.retention_days, self.top_n))
+        return [((row["query"], row["category"], row["page_size"]), row["hits"]) for row in rows]
+
+
+def _prewarm_interval() -> float:
+    # A warmed response has to still be cached, at least as stale, when the next
+    # run recomputes it: runs are at most result_cache_ttl + result_cache_stale_ttl apart.
+    settings = get_settings()
+    window = settings.result_cache_ttl + settings.result_cache_stale_ttl
+    if settings.prewarm_interval > window:
+        logger.warning(
+            "PREWARM_INTERVAL=%.0fs exceeds the result cache window of %.0fs; using %.0fs.",
+            settings.prewarm_interval,
+            window,
+            window,
+        )
+        return window
+    return settings.prewarm_interval
+
+
+query_log = QueryLog(capacity=get_settings().query_log_size)
+prewarmer = Prewarmer(
+    query_log,
+    interval=_prewarm_interval(),
+    top_n=get_settings().prewarm_top,
+    batch_size=get_settings().prewarm_batch_size,
+    retention_days=get_settings().query_log_retention_days,
+)
@@ -0,0 +1,350 @@
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import logging
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Hashable
+
+from .cache import TTLCache
+from .config import get_settings
+from .db import aexecute, afetch_one, execute, fetch_one
+from .embeddings import voyage_enabled
+
+logger = logging.getLogger(__name__)
+
+GENERATION_SQL = "SELECT generation FROM cache_generations WHERE name = %s"
+BUMP_GENERATION_SQL = "UPDATE cache_generations SET generation = generation + 1 WHERE name = %s"
+
+_NOTHING = object()
+
+
+class ComputeAbandoned(RuntimeError):
+    pass
+
+
+class ResultCache:
+    """Response cache invalidated by a generation counter, with stale-while-revalidate.
+
+    An entry is fresh while its generation is current and it is younger than ``ttl``.
+    Past the TTL it is served for up to ``stale_ttl`` more seconds while one
+    background refresh recomputes it. After a generation bump the first caller
+    recomputes inline (so a writer sees its own write) and concurrent callers keep
+    getting the previous value until that finishes. Concurrent misses for a key
+    with no value at all wait for the one caller computing it.
+
+    With ``shared_name`` set, writers also bump a row in ``cache_generations``
+    (see bump_shared) and every process re-reads it at most once per
+    ``shared_ttl`` seconds, so an invalidation reaches all processes within that.
+
+    Values rejected by ``cacheable`` are returned to the caller (and its waiters)
+    but not stored.
+    """
+
+    def __init__(
+        self,
+        max_size: int,
+        ttl: float,
+        stale_ttl: float,
+        refresh_workers: int = 2,
+        shared_name: str | None = None,
+        shared_ttl: float = 1.0,
+        cacheable: Callable[[Any], bool] | None = None,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.ttl = ttl
+        self._clock = clock
+        self._cacheable = cacheable
+        self.shared_name = shared_name
+        self.shared_ttl = shared_ttl
+        self._entries: TTLCache[tuple[float, int, Any]] = TTLCache(
+            max_size=max_size, ttl=ttl + stale_ttl, clock=clock
+        )
+        self._generation = 0
+        self._shared_generation: int | None = None
+        self._shared_checked_at = float("-inf")
+        self._lock = threading.Lock()
+        # Keys being computed or refreshed, with the future their waiters block on.
+        self._pending: dict[Hashable, Future] = {}
+        self._refresh_workers = refresh_workers
+        self._executor: ThreadPoolExecutor | None = None
+        self._tasks: set[asyncio.Task] = set()
+        self._stats = {
+            "fresh": 0,
+            "stale": 0,
+            "misses": 0,
+            "waits": 0,
+            "refreshes": 0,
+            "refresh_errors": 0,
+            "uncacheable": 0,
+            "invalidations": 0,
+        }
+
+    @property
+    def generation(self) -> int:
+        return self._generation
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._generation += 1
+            self._stats["invalidations"] += 1
+
+    def bump_shared(self) -> None:
+        # Run inside the writer's transaction, then invalidate() after commit.
+        if self.shared_name:
+            execute(BUMP_GENERATION_SQL, (self.shared_name,))
+
+    async def abump_shared(self) -> None:
+        if self.shared_name:
+            await aexecute(BUMP_GENERATION_SQL, (self.shared_name,))
+
+    def refresh_generation(self) -> None:
+        if self._shared_due():
+            try:
+                row = fetch_one(GENERATION_SQL, (self.shared_name,))
+            except Exception as exc:
+                row = None
+                logger.warning("Could not read the shared cache generation (%r); using local invalidation.", exc)
+            self._observe_shared(row["generation"] if row else None)
+
+    async def arefresh_generation(self) -> None:
+        if self._shared_due():
+            try:
+                row = await afetch_one(GENERATION_SQL, (self.shared_name,))
+            except Exception as exc:
+                row = None
+                logger.warning("Could not read the shared cache generation (%r); using local invalidation.", exc)
+            self._observe_shared(row["generation"] if row else None)
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        self.refresh_generation()
+        action, value, generation, pending = self._lookup(key)
+        if action == "hit":
+            return value
+        if action == "revalidate":
+            self._submit_refresh(key, compute)
+            return value
+        if action == "wait":
+            try:
+                return pending.result()
+            except ComputeAbandoned:
+                return self._compute(key, compute, generation)
+        try:
+            value = self._compute(key, compute, generation)
+        except BaseException:
+            self._release(key)
+            raise
+        self._release(key, value)
+        return value
+
+    async def aget_or_compute(self, key: Hashable, compute: Callable[[], Awaitable[Any]]) -> Any:
+        await self.arefresh_generation()
+        action, value, generation, pending = self._lookup(key)
+        if action == "hit":
+            return value
+        if action == "revalidate":
+            # A fresh context keeps request-scoped state (pinned connection, debug
+            # timings) out of a refresh that outlives the request.
+            task = asyncio.get_running_loop().create_task(
+                self._arefresh(key, compute), context=contextvars.Context()
+            )
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+            return value
+        if action == "wait":
+            try:
+                # Shielded: a waiter that is cancelled must not cancel the shared future.
+                return await asyncio.shield(asyncio.wrap_future(pending))
+            except ComputeAbandoned:
+                value = await compute()
+                self._store(key, value, generation)
+                return value
+        try:
+            value = await compute()
+            self._store(key, value, generation)
+        except BaseException:
+            self._release(key)
+            raise
+        self._release(key, value)
+        return value
+
+    def peek(self, key: Hashable) -> Any | None:
+        # Fresh, current-generation values only; for callers that compute their
+        # misses together and hand them back through put().
+        entry = self._entries.get(key)
+        if entry is not None:
+            created_at, entry_generation, value = entry
+            if entry_generation == self._generation and self._clock() - created_at < self.ttl:
+                self._count("fresh")
+                return value
+        self._count("misses")
+        return None
+
+    def fresh(self, key: Hashable) -> bool:
+        # Like peek() without touching the hit/miss counters or the LRU order, for reporting.
+        entry = self._entries.peek(key)
+        return (
+            entry is not None
+            and entry[1] == self._generation
+            and self._clock() - entry[0] < self.ttl
+        )
+
+    def put(self, key: Hashable, value: Any, generation: int) -> None:
+        self._store(key, value, generation)
+
+    def close(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            refreshing = len(self._pending)
+        entries = self._entries.stats()
+        return {
+            **stats,
+            "generation": self._generation,
+            "refreshing": refreshing,
+            "size": entries["size"],
+            "max_size": entries["max_size"],
+            "ttl": self.ttl,
+        }
+
+    def _lookup(self, key: Hashable) -> tuple[str, Any, int, Future | None]:
+        # "hit": serve the value as is; "revalidate": serve it and refresh in the
+        # background; "compute": compute inline, holding the key's claim (the
+        # caller releases it); "wait": another caller is computing a missing
+        # value, wait for its future.
+        generation = self._generation
+        entry = self._entries.get(key)
+        if entry is None:
+            claimed, pending = self._claim(key)
+            if claimed:
+                self._count("misses")
+                return "compute", None, generation, None
+            self._count("waits")
+            return "wait", None, generation, pending
+
+        created_at, entry_generation, value = entry
+        if entry_generation == generation:
+            if self._clock() - created_at < self.ttl:
+                self._count("fresh")
+                return "hit", value, generation, None
+            self._count("stale")
+            return ("revalidate" if self._claim(key)[0] else "hit"), value, generation, None
+
+        if self._claim(key)[0]:
+            self._count("misses")
+            return "compute", value, generation, None
+        self._count("stale")
+        return "hit", value, generation, None
+
+    def _shared_due(self) -> bool:
+        return bool(self.shared_name) and self._clock() - self._shared_checked_at >= self.shared_ttl
+
+    def _observe_shared(self, shared: int | None) -> None:
+        # A change in the shared counter (another process's write) bumps the local
+        # generation. Unreadable counters leave local invalidation in charge.
+        with self._lock:
+            self._shared_checked_at = self._clock()
+            if shared is None:
+                return
+            if self._shared_generation is not None and shared != self._shared_generation:
+                self._generation += 1
+                self._stats["invalidations"] += 1
+            self._shared_generation = shared
+
+    def _store(self, key: Hashable, value: Any, generation: int) -> None:
+        # Stamped with the generation read before computing: a write that lands
+        # mid-compute leaves the entry already invalidated.
+        if self._cacheable is not None and not self._cacheable(value):
+            self._count("uncacheable")
+            return
+        self._entries.set(key, (self._clock(), generation, value))
+
+    def _compute(self, key: Hashable, compute: Callable[[], Any], generation: int) -> Any:
+        value = compute()
+        self._store(key, value, generation)
+        return value
+
+    def _refresh(self, key: Hashable, compute: Callable[[], Any]) -> None:
+        value = _NOTHING
+        try:
+            value = self._compute(key, compute, self._generation)
+            self._count("refreshes")
+        except Exception:
+            logger.exception("Background refresh of cached recommendations failed.")
+            self._count("refresh_errors")
+        finally:
+            self._release(key, value)
+
+    async def _arefresh(self, key: Hashable, compute: Callable[[], Awaitable[Any]]) -> None:
+        value = _NOTHING
+        try:
+            generation = self._generation
+            value = await compute()
+            self._store(key, value, generation)
+            self._count("refreshes")
+        except Exception:
+            logger.exception("Background refresh of cached recommendations failed.")
+            self._count("refresh_errors")
+        finally:
+            self._release(key, value)
+
+    def _submit_refresh(self, key: Hashable, compute: Callable[[], Any]) -> None:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=max(1, self._refresh_workers), thread_name_prefix="result-refresh"
+                )
+            executor = self._executor
+        try:
+            executor.submit(self._refresh, key, compute)
+        except RuntimeError:
+            # Shutting down; the stale value is still returned to this caller.
+            self._release(key)
+
+    def _claim(self, key: Hashable) -> tuple[bool, Future]:
+        with self._lock:
+            pending = self._pending.get(key)
+            if pending is not None:
+                return False, pending
+            pending = self._pending[key] = Future()
+            return True, pending
+
+    def _release(self, key: Hashable, value: Any = _NOTHING) -> None:
+        # Hands the value to waiters; without one (the compute failed) they are
+        # told to compute it themselves.
+        with self._lock:
+            pending = self._pending.pop(key, None)
+        if pending is None or pending.done():
+            return
+        if value is _NOTHING:
+            pending.set_exception(ComputeAbandoned(f"computing {key!r} failed"))
+        else:
+            pending.set_result(value)
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self._stats[name] += 1
+
+
+def _from_configured_provider(response: dict[str, Any]) -> bool:
+    # A rate-limited Voyage call answers with hash vectors; that response must not
+    # be served from the key of a Voyage-backed one once Voyage recovers.
+    provider = response.get("embeddingProvider")
+    return provider is None or provider == ("voyage" if voyage_enabled() else "fallback")
+
+
+recommendation_cache = ResultCache(
+    max_size=get_settings().result_cache_size,
+    ttl=get_settings().result_cache_ttl,
+    stale_ttl=get_settings().result_cache_stale_ttl,
+    shared_name="recommendations",
+    shared_ttl=get_settings().result_cache_generation_ttl,
+    cacheable=_from_configured_provider,
+)
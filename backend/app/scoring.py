@@ -0,0 +1,51 @@
+from __future__ import annotations
+
+import datetime as dt
+
+import numpy as np
+
+_EPOCH = dt.datetime(1970, 1, 1, tzinfo=dt.timezone.utc)
+_MICROS_PER_DAY = 86_400_000_000
+
+
+def epoch_micros(value: dt.datetime) -> int:
+    # Integer microseconds keep day arithmetic exact, matching timedelta.days.
+    delta = value - _EPOCH
+    return (delta.days * 86_400 + delta.seconds) * 1_000_000 + delta.microseconds
+
+
+def normalized_similarity(distances: np.ndarray, min_distance: float, max_distance: float) -> np.ndarray:
+    if max_distance - min_distance <= 1e-6:
+        return np.ones_like(distances)
+    return 1 - (distances - min_distance) / (max_distance - min_distance)
+
+
+def recency_scores(latest_micros: np.ndarray, now: dt.datetime) -> np.ndarray:
+    days_ago = np.floor_divide(epoch_micros(now) - latest_micros, _MICROS_PER_DAY)
+    return np.maximum(0.0, 1 - np.minimum(days_ago / 30.0, 1))
+
+
+def semantic_scores(
+    similarity_norm: np.ndarray,
+    strengths: np.ndarray,
+    recency: np.ndarray,
+    event_weights: np.ndarray,
+    lexical: np.ndarray,
+) -> np.ndarray:
+    return 0.75 * similarity_norm + 0.08 * strengths + 0.07 * recency + 0.05 * event_weights + lexical
+
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    # Highest scores first; ties keep input order, like a stable reverse sort.
+    if k <= 0 or scores.size == 0:
+        return np.empty(0, dtype=np.int64)
+    if k < scores.size:
+        candidates = np.argpartition(-scores, k - 1)[:k]
+        # argpartition may cut through a run of tied scores; pull in every tie.
+        threshold = scores[candidates].min()
+        candidates = np.flatnonzero(scores >= threshold)
+    else:
+        candidates = np.arange(scores.size)
+    order = np.lexsort((candidates, -scores[candidates]))
+    return candidates[order][:k]
+
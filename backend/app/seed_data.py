@@ -1,11 +1,27 @@
 from __future__ import annotations
 
 import datetime as dt
+import logging
 import random
 
-from .db import execute, fetch_all, fetch_one
-from .embeddings import embed_documents
-from .vector_store import get_chroma_client, get_collection
+from .batch_embeddings import ProgressCallback, embed_in_batches
+from .config import get_settings
+from .db import execute, execute_values, fetch_all, fetch_one, iter_pages, transaction
+from .local_index import export_snapshot
+from .result_cache import recommendation_cache
+from .social import refresh_social_signals
+from .vector_store import (
+    VERSION_PREFIX,
+    collect_old_versions,
+    get_collection,
+    new_version_name,
+    open_collection,
+    product_document,
+    product_metadata,
+    swap_live_collection,
+)
+
+logger = logging.getLogger(__name__)
 
 
 FRIENDS = [
@@ -106,138 +122,187 @@ def seed_database() -> None:
         print("Seed data already present. Skipping seeding.")
         return
 
-    execute("INSERT INTO users (name) VALUES (%s)", ("You",))
-
-    for idx, name in enumerate(FRIENDS, start=1):
-        avatar = f"https://i.pravatar.cc/100?img={idx}"
-        strength = round(random.uniform(0.45, 0.98), 2)
-        execute(
-            "INSERT INTO friends (name, avatar_url, strength) VALUES (%s, %s, %s)",
-            (name, avatar, strength),
-        )
-
-    products = list(CORE_PRODUCTS)
-    while len(products) < 200:
-        category = random.choice(list(PRODUCT_CATEGORIES.keys()))
-        item = random.choice(PRODUCT_CATEGORIES[category])
-        title = f"{random.choice(['Aura', 'Pulse', 'Nova', 'Echo', 'Glow', 'Summit'])} {item.title()}"
-        brand = random.choice(BRANDS)
-        price = round(random.uniform(28, 320), 2)
-        products.append(
-            {
-                "title": title,
-                "brand": brand,
-                "category": category,
-                "price": price,
-                "description": _random_description(category, item),
-            }
-        )
-
-    for product in products:
-        execute(
-            "INSERT INTO products (title, brand, category, price, description) VALUES (%s, %s, %s, %s, %s)",
-            (
-                product["title"],
-                product["brand"],
-                product["category"],
-                product["price"],
-                product["description"],
-            ),
-        )
-
-    friend_ids = [row["id"] for row in fetch_all("SELECT id FROM friends")]
-    product_ids = [row["id"] for row in fetch_all("SELECT id FROM products")]
-    now = dt.datetime.now(dt.timezone.utc)
-
-    for friend_id in friend_ids:
-        purchases = random.sample(product_ids, k=random.randint(10, 25))
-        views = random.sample(product_ids, k=random.randint(15, 40))
-        for product_id in purchases:
-            timestamp = now - dt.timedelta(days=random.randint(0, 40))
-            execute(
-                "INSERT INTO friend_events (friend_id, product_id, event_type, created_at) VALUES (%s, %s, %s, %s)",
-                (friend_id, product_id, "purchase", timestamp),
+    with transaction():
+        execute("INSERT INTO users (name) VALUES (%s)", ("You",))
+
+        # Multi-row inserts; rows are built in the same order as before, so the
+        # seeded data is unchanged for a given random seed.
+        friends = [
+            (name, f"https://i.pravatar.cc/100?img={idx}", round(random.uniform(0.45, 0.98), 2))
+            for idx, name in enumerate(FRIENDS, start=1)
+        ]
+        friend_ids = [
+            row["id"]
+            for row in execute_values(
+                "INSERT INTO friends (name, avatar_url, strength) VALUES %s RETURNING id", friends, fetch=True
+            )
+        ]
+
+        products = list(CORE_PRODUCTS)
+        while len(products) < 200:
+            category = random.choice(list(PRODUCT_CATEGORIES.keys()))
+            item = random.choice(PRODUCT_CATEGORIES[category])
+            title = f"{random.choice(['Aura', 'Pulse', 'Nova', 'Echo', 'Glow', 'Summit'])} {item.title()}"
+            brand = random.choice(BRANDS)
+            price = round(random.uniform(28, 320), 2)
+            products.append(
+                {
+                    "title": title,
+                    "brand": brand,
+                    "category": category,
+                    "price": price,
+                    "description": _random_description(category, item),
+                }
             )
-        for product_id in views:
-            timestamp = now - dt.timedelta(days=random.randint(0, 40))
-            execute(
-                "INSERT INTO friend_events (friend_id, product_id, event_type, created_at) VALUES (%s, %s, %s, %s)",
-                (friend_id, product_id, "view", timestamp),
+
+        product_ids = [
+            row["id"]
+            for row in execute_values(
+                "INSERT INTO products (title, brand, category, price, description) VALUES %s RETURNING id",
+                [
+                    (product["title"], product["brand"], product["category"], product["price"], product["description"])
+                    for product in products
+                ],
+                fetch=True,
             )
+        ]
+        now = dt.datetime.now(dt.timezone.utc)
+
+        events = []
+        for friend_id in friend_ids:
+            purchases = random.sample(product_ids, k=random.randint(10, 25))
+            views = random.sample(product_ids, k=random.randint(15, 40))
+            for product_id in purchases:
+                events.append((friend_id, product_id, "purchase", now - dt.timedelta(days=random.randint(0, 40))))
+            for product_id in views:
+                events.append((friend_id, product_id, "view", now - dt.timedelta(days=random.randint(0, 40))))
+        execute_values("INSERT INTO friend_events (friend_id, product_id, event_type, created_at) VALUES %s", events)
+
+        refresh_social_signals()
+
+
+REBUILD_PRODUCTS_QUERY = """
+    SELECT id, title, brand, category, price, description
+    FROM products
+    WHERE id > %s
+    ORDER BY id
+"""
+
+
+def _load_checkpoint(collection_name: str) -> dict | None:
+    return fetch_one(
+        "SELECT last_id, completed FROM vector_rebuild_checkpoints WHERE collection = %s",
+        (collection_name,),
+    )
 
 
-def rebuild_vector_store() -> None:
-    events = fetch_all(
+def _save_checkpoint(collection_name: str, last_id: int, completed: bool = False) -> None:
+    execute(
         """
-        SELECT
-            friend_events.id AS event_id,
-            friend_events.friend_id,
-            friend_events.product_id,
-            friend_events.event_type,
-            friend_events.created_at,
-            friends.name AS friend_name,
-            friends.avatar_url,
-            friends.strength,
-            products.title,
-            products.brand,
-            products.category,
-            products.price,
-            products.description
-        FROM friend_events
-        JOIN friends ON friends.id = friend_events.friend_id
-        JOIN products ON products.id = friend_events.product_id
+        INSERT INTO vector_rebuild_checkpoints (collection, last_id, completed, updated_at)
+        VALUES (%s, %s, %s, NOW())
+        ON CONFLICT (collection) DO UPDATE
+        SET last_id = EXCLUDED.last_id,
+            completed = EXCLUDED.completed,
+            updated_at = EXCLUDED.updated_at
+        """,
+        (collection_name, last_id, completed),
+    )
+
+
+def _pending_version() -> str | None:
+    row = fetch_one(
         """
+        SELECT collection FROM vector_rebuild_checkpoints
+        WHERE collection LIKE %s AND NOT completed
+        ORDER BY collection DESC
+        LIMIT 1
+        """,
+        (f"{VERSION_PREFIX}%",),
     )
-    if not events:
-        return
+    return row["collection"] if row else None
 
-    client = get_chroma_client()
-    collections = [c.name for c in client.list_collections()]
-    if "friend_events" in collections:
-        client.delete_collection("friend_events")
-    collection = get_collection()
 
-    documents = [f"{row['title']} {row['description']}" for row in events]
-    embeddings = embed_documents(documents)
-
-    metadata = [
-        {
-            "product_id": row["product_id"],
-            "friend_id": row["friend_id"],
-            "event_type": row["event_type"],
-            "timestamp": row["created_at"].isoformat(),
-            "category": row["category"],
-            "title": row["title"],
-            "brand": row["brand"],
-            "description": row["description"],
-            "friend_name": row["friend_name"],
-            "friend_avatar": row["avatar_url"],
-            "friend_strength": row["strength"],
-            "price": float(row["price"]),
-        }
-        for row in events
-    ]
+def _stream_products_into(
+    collection,
+    collection_name: str,
+    last_id: int,
+    progress: ProgressCallback | None = None,
+) -> int:
+    # Streams products in id order and checkpoints after every upserted chunk, so a
+    # crashed rebuild picks up after the last committed product instead of restarting.
+    settings = get_settings()
+    processed = 0
+    total = 0
+    if progress:
+        row = fetch_one("SELECT COUNT(*) AS count FROM products WHERE id > %s", (last_id,))
+        total = row["count"] if row else 0
+        progress(0, total)
+    chunk_size = max(1, settings.chroma_upsert_batch)
+    for page in iter_pages(REBUILD_PRODUCTS_QUERY, (last_id,), page_size=settings.rebuild_page_size):
+        documents = [product_document(row) for row in page]
+        embeddings = embed_in_batches(documents)
+        for start in range(0, len(page), chunk_size):
+            rows = page[start : start + chunk_size]
+            collection.upsert(
+                ids=[str(row["id"]) for row in rows],
+                embeddings=embeddings[start : start + chunk_size],
+                metadatas=[product_metadata(row) for row in rows],
+                documents=documents[start : start + chunk_size],
+            )
+            last_id = rows[-1]["id"]
+            _save_checkpoint(collection_name, last_id)
+        processed += len(page)
+        if progress:
+            progress(processed, max(total, processed))
+        logger.info("%s: upserted %d products (last id %s).", collection_name, processed, last_id)
+    return last_id
 
-    ids = [str(row["event_id"]) for row in events]
 
-    collection.add(
-        ids=ids,
-        embeddings=embeddings,
-        metadatas=metadata,
-        documents=documents,
-    )
+def rebuild_vector_store(resume: bool = True, progress: ProgressCallback | None = None) -> None:
+    # Builds a new versioned shadow collection while the live one keeps serving,
+    # then flips the alias. Products added during the build are picked up by a
+    # catch-up pass after the swap.
+    pending = _pending_version() if resume else None
+    if pending:
+        name = pending
+        last_id = _load_checkpoint(name)["last_id"]
+        logger.info("Resuming vector rebuild of %s after product id %s.", name, last_id)
+    else:
+        name = new_version_name()
+        last_id = 0
+        _save_checkpoint(name, 0)
+    collection = open_collection(name)
+
+    last_id = _stream_products_into(collection, name, last_id, progress)
+    swap_live_collection(name)
+    last_id = _stream_products_into(collection, name, last_id)
+    _save_checkpoint(name, last_id, completed=True)
+    recommendation_cache.bump_shared()
+    recommendation_cache.invalidate()
+    try:
+        export_snapshot(collection, name)
+    except Exception:
+        # The snapshot is only a fallback; a failed export must not fail the rebuild.
+        logger.exception("Could not export a vector snapshot of %s.", name)
+
+    dropped = collect_old_versions()
+    logger.info("Vector collection %s is live; dropped %s.", name, dropped or "nothing")
 
 
-def ensure_seeded() -> None:
+def ensure_seeded(progress: ProgressCallback | None = None) -> None:
     row = fetch_one("SELECT COUNT(*) AS count FROM friends")
     if row and row["count"] == 0:
         seed_database()
-        rebuild_vector_store()
+        rebuild_vector_store(resume=False, progress=progress)
         print("Seeded DB and populated Chroma.")
 
 
-def ensure_vector_ready() -> None:
+def ensure_vector_ready(progress: ProgressCallback | None = None) -> None:
     collection = get_collection()
-    if collection.count() == 0:
-        rebuild_vector_store()
+    if _pending_version():
+        rebuild_vector_store(resume=True, progress=progress)
+        print("Resumed an interrupted vector rebuild.")
+    elif collection.count() == 0:
+        rebuild_vector_store(resume=False, progress=progress)
         print("Chroma was empty. Rebuilt vectors.")
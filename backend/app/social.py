@@ -0,0 +1,289 @@
+from __future__ import annotations
+
+import datetime as dt
+from typing import Any, Iterable
+
+from .db import aexecute_values, afetch_all, execute, execute_values, fetch_all
+
+MATCHES_PER_PRODUCT = 3
+
+SOCIAL_SIGNALS_SQL = """
+    SELECT *
+    FROM (
+        SELECT
+            friend_events.product_id,
+            friend_events.event_type,
+            friend_events.created_at,
+            friends.name AS friend_name,
+            friends.avatar_url,
+            friends.strength,
+            MAX(friends.strength) OVER product_window AS strongest_friend,
+            MAX(friend_events.created_at) OVER product_window AS latest_at,
+            BOOL_OR(friend_events.event_type = 'purchase') OVER product_window AS any_purchase,
+            ROW_NUMBER() OVER (
+                PARTITION BY friend_events.product_id
+                ORDER BY friends.strength DESC, friend_events.created_at DESC, friend_events.id DESC
+            ) AS rank
+        FROM friend_events
+        JOIN friends ON friends.id = friend_events.friend_id
+        WHERE friend_events.product_id = ANY(%s)
+        WINDOW product_window AS (PARTITION BY friend_events.product_id)
+    ) ranked
+    WHERE rank <= %s
+    ORDER BY product_id, rank
+"""
+
+
+def _group_signals(rows: list[dict]) -> dict[int, dict[str, Any]]:
+    signals: dict[int, dict[str, Any]] = {}
+    for row in rows:
+        entry = signals.setdefault(
+            row["product_id"],
+            {
+                "strongest_friend": row["strongest_friend"],
+                "latest_at": row["latest_at"],
+                "event_weight": 1.0 if row["any_purchase"] else 0.6,
+                "events": [],
+            },
+        )
+        entry["events"].append(row)
+    return signals
+
+
+def fetch_social_signals(product_ids: Iterable[int]) -> dict[int, dict[str, Any]]:
+    # One round trip per query: for each product with friend activity, the
+    # strongest friend, latest event, purchase flag and top events by strength.
+    ids = sorted({int(product_id) for product_id in product_ids})
+    if not ids:
+        return {}
+    return _group_signals(fetch_all(SOCIAL_SIGNALS_SQL, (ids, MATCHES_PER_PRODUCT)))
+
+
+async def afetch_social_signals(product_ids: Iterable[int]) -> dict[int, dict[str, Any]]:
+    ids = sorted({int(product_id) for product_id in product_ids})
+    if not ids:
+        return {}
+    return _group_signals(await afetch_all(SOCIAL_SIGNALS_SQL, (ids, MATCHES_PER_PRODUCT)))
+
+
+# Seconds in the 30-day recency window; recency_key = base_score + 0.35 * epoch / window.
+RECENCY_WINDOW_SECONDS = 30 * 86_400
+
+REFRESH_SIGNALS_SQL = """
+    INSERT INTO product_social_signals (
+        product_id, category_key, strongest_friend, latest_at, any_purchase, event_count, base_score, recency_key
+    )
+    SELECT
+        agg.product_id,
+        agg.category_key,
+        agg.strongest_friend,
+        agg.latest_at,
+        agg.any_purchase,
+        agg.event_count,
+        agg.base_score,
+        agg.base_score + 0.35 * EXTRACT(EPOCH FROM agg.latest_at) / %(window)s
+    FROM (
+        SELECT
+            friend_events.product_id,
+            lower(products.category) AS category_key,
+            MAX(friends.strength) AS strongest_friend,
+            MAX(friend_events.created_at) AS latest_at,
+            BOOL_OR(friend_events.event_type = 'purchase') AS any_purchase,
+            COUNT(*) AS event_count,
+            0.45 * MAX(friends.strength)
+                + 0.2 * CASE WHEN BOOL_OR(friend_events.event_type = 'purchase') THEN 1.0 ELSE 0.6 END AS base_score
+        FROM friend_events
+        JOIN friends ON friends.id = friend_events.friend_id
+        JOIN products ON products.id = friend_events.product_id
+        GROUP BY friend_events.product_id, products.category
+    ) agg
+    ON CONFLICT (product_id) DO UPDATE
+    SET category_key = EXCLUDED.category_key,
+        strongest_friend = EXCLUDED.strongest_friend,
+        latest_at = EXCLUDED.latest_at,
+        any_purchase = EXCLUDED.any_purchase,
+        event_count = EXCLUDED.event_count,
+        base_score = EXCLUDED.base_score,
+        recency_key = EXCLUDED.recency_key
+"""
+
+RECORD_EVENTS_SQL = """
+    INSERT INTO product_social_signals AS signals (
+        product_id, category_key, strongest_friend, latest_at, any_purchase, event_count, base_score, recency_key
+    )
+    SELECT
+        batch.product_id,
+        lower(batch.category),
+        batch.strength,
+        batch.latest_at,
+        batch.purchase,
+        batch.event_count,
+        0.45 * batch.strength + 0.2 * CASE WHEN batch.purchase THEN 1.0 ELSE 0.6 END,
+        0.45 * batch.strength + 0.2 * CASE WHEN batch.purchase THEN 1.0 ELSE 0.6 END
+            + 0.35 * EXTRACT(EPOCH FROM batch.latest_at) / {window}
+    FROM (VALUES %s) AS batch(product_id, category, strength, latest_at, purchase, event_count)
+    ON CONFLICT (product_id) DO UPDATE
+    SET category_key = EXCLUDED.category_key,
+        strongest_friend = GREATEST(signals.strongest_friend, EXCLUDED.strongest_friend),
+        latest_at = GREATEST(signals.latest_at, EXCLUDED.latest_at),
+        any_purchase = signals.any_purchase OR EXCLUDED.any_purchase,
+        event_count = signals.event_count + EXCLUDED.event_count,
+        base_score = 0.45 * GREATEST(signals.strongest_friend, EXCLUDED.strongest_friend)
+            + 0.2 * CASE WHEN signals.any_purchase OR EXCLUDED.any_purchase THEN 1.0 ELSE 0.6 END,
+        recency_key = 0.45 * GREATEST(signals.strongest_friend, EXCLUDED.strongest_friend)
+            + 0.2 * CASE WHEN signals.any_purchase OR EXCLUDED.any_purchase THEN 1.0 ELSE 0.6 END
+            + 0.35 * EXTRACT(EPOCH FROM GREATEST(signals.latest_at, EXCLUDED.latest_at)) / {window}
+""".format(window=RECENCY_WINDOW_SECONDS)
+
+
+def refresh_social_signals() -> None:
+    execute(REFRESH_SIGNALS_SQL, {"window": RECENCY_WINDOW_SECONDS})
+
+
+def _signal_deltas(events: Iterable[dict[str, Any]]) -> list[tuple]:
+    # Folds events into per-product deltas first: one upsert statement may not
+    # touch the same row twice.
+    deltas: dict[int, list[Any]] = {}
+    for event in events:
+        purchase = event["event_type"] == "purchase"
+        delta = deltas.get(event["product_id"])
+        if delta is None:
+            deltas[event["product_id"]] = [
+                event["product_id"],
+                event["category"],
+                event["strength"],
+                event["created_at"],
+                purchase,
+                1,
+            ]
+            continue
+        delta[2] = max(delta[2], event["strength"])
+        delta[3] = max(delta[3], event["created_at"])
+        delta[4] = delta[4] or purchase
+        delta[5] += 1
+    return [tuple(delta) for delta in deltas.values()]
+
+
+RECORD_EVENTS_TEMPLATE = "(%s, %s, %s::real, %s::timestamptz, %s, %s)"
+
+
+def record_event_signals(events: Iterable[dict[str, Any]]) -> None:
+    deltas = _signal_deltas(events)
+    if deltas:
+        execute_values(RECORD_EVENTS_SQL, deltas, template=RECORD_EVENTS_TEMPLATE)
+
+
+async def arecord_event_signals(events: Iterable[dict[str, Any]]) -> None:
+    deltas = _signal_deltas(events)
+    if deltas:
+        await aexecute_values(RECORD_EVENTS_SQL, deltas, template=RECORD_EVENTS_TEMPLATE)
+
+
+# recency_key orders by continuous age, the exact score by whole days: flooring
+# raises a product's recency term by less than 0.35 / 30 over its recency_key.
+RECENCY_KEY_MARGIN = 0.35 / 30
+# Caps the recency read when very many products sit within the margin.
+FEED_MAX_CANDIDATES = 1000
+
+
+def _social_feed_query(category: str | None, limit: int, now: dt.datetime) -> tuple[str, dict[str, Any]]:
+    # Two index-ordered reads whose union holds the exact top `limit`, rescored by
+    # the caller:
+    # - inside the recency window, every product whose recency_key is within
+    #   RECENCY_KEY_MARGIN of the limit-th highest one. A product further below
+    #   scores under each of those limit products even after day flooring.
+    # - the top `limit` by base_score, for products past the window, whose
+    #   score is exactly base_score while nothing scores below its own.
+    category_clause = "AND category_key = %(category)s" if category else ""
+    query = f"""
+        WITH candidates AS (
+            (
+                SELECT product_id FROM product_social_signals
+                WHERE latest_at >= %(window_start)s {category_clause}
+                  AND recency_key >= COALESCE(
+                      (
+                          SELECT recency_key FROM product_social_signals
+                          WHERE latest_at >= %(window_start)s {category_clause}
+                          ORDER BY recency_key DESC
+                          OFFSET %(offset)s
+                          LIMIT 1
+                      ),
+                      '-Infinity'::double precision
+                  ) - %(margin)s
+                ORDER BY recency_key DESC
+                LIMIT %(max_candidates)s
+            )
+            UNION
+            (
+                SELECT product_id FROM product_social_signals
+                WHERE TRUE {category_clause}
+                ORDER BY base_score DESC
+                LIMIT %(limit)s
+            )
+        )
+        SELECT
+            signals.product_id,
+            signals.strongest_friend,
+            signals.latest_at,
+            signals.any_purchase
+        FROM candidates
+        JOIN product_social_signals signals ON signals.product_id = candidates.product_id
+    """
+    params = {
+        "category": category.lower() if category else None,
+        "limit": max(1, limit),
+        "offset": max(1, limit) - 1,
+        "margin": RECENCY_KEY_MARGIN,
+        "max_candidates": max(FEED_MAX_CANDIDATES, limit),
+        # One extra day: a product 30.5 days old still floors to inside the window.
+        "window_start": now - dt.timedelta(seconds=RECENCY_WINDOW_SECONDS + 86_400),
+    }
+    return query, params
+
+
+def fetch_social_feed(category: str | None, limit: int, now: dt.datetime) -> list[dict[str, Any]]:
+    return fetch_all(*_social_feed_query(category, limit, now))
+
+
+async def afetch_social_feed(category: str | None, limit: int, now: dt.datetime) -> list[dict[str, Any]]:
+    return await afetch_all(*_social_feed_query(category, limit, now))
+
+
+RECENT_EVENTS_SQL = """
+    SELECT recent.*
+    FROM unnest(%s::int[]) AS wanted(product_id)
+    CROSS JOIN LATERAL (
+        SELECT
+            friend_events.product_id,
+            friend_events.event_type,
+            friend_events.created_at,
+            friends.name AS friend_name,
+            friends.avatar_url
+        FROM friend_events
+        JOIN friends ON friends.id = friend_events.friend_id
+        WHERE friend_events.product_id = wanted.product_id
+        ORDER BY friend_events.created_at DESC
+        LIMIT %s
+    ) recent
+"""
+
+
+def _group_events(rows: list[dict]) -> dict[int, list[dict[str, Any]]]:
+    events: dict[int, list[dict[str, Any]]] = {}
+    for row in rows:
+        events.setdefault(row["product_id"], []).append(row)
+    return events
+
+
+def fetch_recent_events(product_ids: Iterable[int]) -> dict[int, list[dict[str, Any]]]:
+    ids = sorted({int(product_id) for product_id in product_ids})
+    if not ids:
+        return {}
+    return _group_events(fetch_all(RECENT_EVENTS_SQL, (ids, MATCHES_PER_PRODUCT)))
+
+
+async def afetch_recent_events(product_ids: Iterable[int]) -> dict[int, list[dict[str, Any]]]:
+    ids = sorted({int(product_id) for product_id in product_ids})
+    if not ids:
+        return {}
+    return _group_events(await afetch_all(RECENT_EVENTS_SQL, (ids, MATCHES_PER_PRODUCT)))
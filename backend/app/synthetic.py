@@ -0,0 +1,148 @@
+from __future__ import annotations
+
+import datetime as dt
+import logging
+import time
+from dataclasses import dataclass
+from typing import Iterator
+
+import numpy as np
+
+from .db import copy_rows, execute, iter_pages
+from .seed_data import BRANDS, FRIENDS, PRODUCT_CATEGORIES
+from .social import refresh_social_signals
+
+logger = logging.getLogger(__name__)
+
+TITLE_PREFIXES = ["Aura", "Pulse", "Nova", "Echo", "Glow", "Summit", "Lumen", "Atlas", "Nimbus", "Eden"]
+PHRASES = [
+    "Designed for modern routines with premium materials and thoughtful details.",
+    "Soft-touch finish and lightweight profile keep it easy to use every day.",
+    "Built to feel luxurious with clean lines and a calming aesthetic.",
+    "Pairs effortless style with practical functionality for daily life.",
+]
+
+
+@dataclass(frozen=True)
+class SyntheticSpec:
+    friends: int = 10_000
+    products: int = 1_000_000
+    events: int = 100_000_000
+    seed: int = 42
+    chunk_rows: int = 500_000
+    # Zipf-like exponents: a few products and very active friends dominate traffic.
+    product_skew: float = 1.1
+    friend_skew: float = 0.8
+    purchase_rate: float = 0.3
+    history_days: int = 365
+    recency_scale_days: float = 21.0
+
+
+def _zipf_cdf(size: int, exponent: float) -> np.ndarray:
+    weights = 1.0 / np.arange(1, size + 1, dtype=np.float64) ** exponent
+    cdf = np.cumsum(weights)
+    return cdf / cdf[-1]
+
+
+def _tsv(*columns: list[str]) -> bytes:
+    return ("\n".join("\t".join(row) for row in zip(*columns)) + "\n").encode("utf-8")
+
+
+def _friend_chunks(spec: SyntheticSpec, rng: np.random.Generator) -> Iterator[bytes]:
+    for start in range(0, spec.friends, spec.chunk_rows):
+        count = min(spec.chunk_rows, spec.friends - start)
+        idx = np.arange(start, start + count)
+        names = [f"{FRIENDS[i % len(FRIENDS)]} {i // len(FRIENDS) + 1}" for i in idx.tolist()]
+        avatars = [f"https://i.pravatar.cc/100?img={i % 70 + 1}" for i in idx.tolist()]
+        strengths = np.round(0.3 + 0.69 * rng.beta(2.0, 2.0, count), 2).astype(str).tolist()
+        yield _tsv(names, avatars, strengths)
+
+
+def _product_chunks(spec: SyntheticSpec, rng: np.random.Generator) -> Iterator[bytes]:
+    categories = list(PRODUCT_CATEGORIES)
+    for start in range(0, spec.products, spec.chunk_rows):
+        count = min(spec.chunk_rows, spec.products - start)
+        category_idx = rng.integers(0, len(categories), count)
+        prefix_idx = rng.integers(0, len(TITLE_PREFIXES), count)
+        brand_idx = rng.integers(0, len(BRANDS), count)
+        phrase_idx = rng.integers(0, len(PHRASES), count)
+        item_pick = rng.random(count)
+        prices = np.round(rng.lognormal(4.3, 0.6, count).clip(8, 2000), 2).astype(str).tolist()
+        titles, brands, cats, descriptions = [], [], [], []
+        for row in range(count):
+            category = categories[category_idx[row]]
+            items = PRODUCT_CATEGORIES[category]
+            item = items[int(item_pick[row] * len(items))]
+            titles.append(f"{TITLE_PREFIXES[prefix_idx[row]]} {item.title()} {start + row + 1}")
+            brands.append(BRANDS[brand_idx[row]])
+            cats.append(category)
+            descriptions.append(f"A {item} tailored for {category.lower()} lovers. {PHRASES[phrase_idx[row]]}")
+        yield _tsv(titles, brands, cats, prices, descriptions)
+
+
+def _event_chunks(
+    spec: SyntheticSpec,
+    rng: np.random.Generator,
+    friend_ids: np.ndarray,
+    product_ids: np.ndarray,
+    now: dt.datetime,
+) -> Iterator[bytes]:
+    friend_cdf = _zipf_cdf(len(friend_ids), spec.friend_skew)
+    product_cdf = _zipf_cdf(len(product_ids), spec.product_skew)
+    # Shuffle which ids are popular so rank does not correlate with insertion order.
+    friend_rank = rng.permutation(friend_ids)
+    product_rank = rng.permutation(product_ids)
+    now_s = np.datetime64(now.replace(tzinfo=None), "s")
+    history_s = spec.history_days * 86_400
+
+    for start in range(0, spec.events, spec.chunk_rows):
+        count = min(spec.chunk_rows, spec.events - start)
+        friends = friend_rank[np.searchsorted(friend_cdf, rng.random(count))]
+        products = product_rank[np.searchsorted(product_cdf, rng.random(count))]
+        event_types = np.where(rng.random(count) < spec.purchase_rate, "purchase", "view")
+        age_s = np.minimum(rng.exponential(spec.recency_scale_days * 86_400, count), history_s).astype(np.int64)
+        timestamps = np.datetime_as_string(now_s - age_s.astype("timedelta64[s]"), unit="s")
+        yield _tsv(
+            friends.astype(str).tolist(),
+            products.astype(str).tolist(),
+            event_types.tolist(),
+            [f"{ts}+00" for ts in timestamps.tolist()],
+        )
+
+
+def _load_ids(table: str) -> np.ndarray:
+    ids = [row["id"] for page in iter_pages(f"SELECT id FROM {table} ORDER BY id", page_size=100_000) for row in page]
+    return np.asarray(ids, dtype=np.int64)
+
+
+def generate_dataset(spec: SyntheticSpec, refresh_signals: bool = True) -> dict[str, int]:
+    # Rows are appended to whatever is already present; events draw from every
+    # friend and product id in the tables, not just the generated ones.
+    rng = np.random.default_rng(spec.seed)
+    now = dt.datetime.now(dt.timezone.utc)
+
+    started = time.perf_counter()
+    copy_rows("friends", ["name", "avatar_url", "strength"], _friend_chunks(spec, rng))
+    logger.info("Loaded %d friends in %.1fs.", spec.friends, time.perf_counter() - started)
+
+    started = time.perf_counter()
+    copy_rows("products", ["title", "brand", "category", "price", "description"], _product_chunks(spec, rng))
+    logger.info("Loaded %d products in %.1fs.", spec.products, time.perf_counter() - started)
+
+    friend_ids = _load_ids("friends")
+    product_ids = _load_ids("products")
+    started = time.perf_counter()
+    loaded = 0
+    # One COPY per chunk keeps each transaction bounded and lets progress be logged.
+    for chunk in _event_chunks(spec, rng, friend_ids, product_ids, now):
+        copy_rows("friend_events", ["friend_id", "product_id", "event_type", "created_at"], iter([chunk]))
+        loaded = min(loaded + spec.chunk_rows, spec.events)
+        rate = loaded / max(time.perf_counter() - started, 1e-9)
+        logger.info("Loaded %d/%d events (%.0f rows/s).", loaded, spec.events, rate)
+
+    if refresh_signals:
+        started = time.perf_counter()
+        refresh_social_signals()
+        logger.info("Refreshed product_social_signals in %.1fs.", time.perf_counter() - started)
+    execute("ANALYZE friends; ANALYZE products; ANALYZE friend_events; ANALYZE product_social_signals")
+    return {"friends": spec.friends, "products": spec.products, "events": loaded}
@@ -1,32 +1,365 @@
 from __future__ import annotations
 
+import asyncio
+import logging
+import threading
 import time
+import weakref
+from typing import TYPE_CHECKING, Any
 from urllib.parse import urlparse
 
-import chromadb
+import anyio
 
 from .config import get_settings
+from .db import afetch_one, execute, fetch_one
+from .local_index import alocal_index
+from .metrics import external_call, stage
 
+if TYPE_CHECKING:
+    import chromadb
+    from chromadb.api import AsyncClientAPI
+
+logger = logging.getLogger(__name__)
+
+COLLECTION_NAME = "products"
+VERSION_PREFIX = f"{COLLECTION_NAME}_v"
+# Collections from the per-event index that preceded product vectors.
+LEGACY_PREFIX = "friend_events"
+
+_lock = threading.RLock()
+_client: chromadb.api.ClientAPI | None = None
+_collection = None
+_collection_name: str | None = None
+_live_name: str | None = None
+_live_checked_at = 0.0
+_last_heartbeat = 0.0
+
+_async_locks: weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Lock] = weakref.WeakKeyDictionary()
+_async_loop: asyncio.AbstractEventLoop | None = None
+_async_client: AsyncClientAPI | None = None
+_async_collection = None
+_async_collection_name: str | None = None
+_async_last_heartbeat = 0.0
+_chroma_down_until = 0.0
+
+
+def _chroma_address() -> tuple[str, int, bool]:
+    parsed = urlparse(get_settings().chroma_url)
+    return parsed.hostname or "localhost", parsed.port or 8000, parsed.scheme == "https"
+
+
+def _connect_chroma(retries: int, delay: float) -> chromadb.api.ClientAPI:
+    # chromadb pulls in a large dependency tree; import it on first connect.
+    import chromadb
 
-def get_chroma_client(retries: int = 8, delay: float = 1.5) -> chromadb.HttpClient:
     settings = get_settings()
-    parsed = urlparse(settings.chroma_url)
-    host = parsed.hostname or "localhost"
-    port = parsed.port or 8000
-    ssl = parsed.scheme == "https"
+    if settings.chroma_url.startswith("memory:"):
+        # In-process, non-persistent Chroma for benchmarks and local experiments.
+        return chromadb.EphemeralClient()
+    host, port, ssl = _chroma_address()
     last_error: Exception | None = None
-    for _ in range(retries):
+    for attempt in range(retries):
         try:
             return chromadb.HttpClient(host=host, port=port, ssl=ssl)
         except Exception as exc:  # pragma: no cover - best-effort retry
             last_error = exc
-            time.sleep(delay)
+            if attempt < retries - 1:
+                time.sleep(delay)
     raise RuntimeError("Unable to connect to Chroma") from last_error
 
 
-def get_collection():
-    client = get_chroma_client()
-    return client.get_or_create_collection(
-        name="friend_events",
+def _healthy(client: chromadb.api.ClientAPI) -> bool:
+    global _last_heartbeat
+    interval = get_settings().chroma_heartbeat_interval
+    now = time.monotonic()
+    if now - _last_heartbeat < interval:
+        return True
+    try:
+        client.heartbeat()
+    except Exception:
+        return False
+    _last_heartbeat = now
+    return True
+
+
+def get_chroma_client(retries: int = 8, delay: float = 1.5) -> chromadb.api.ClientAPI:
+    # One client per process keeps its HTTP session (and keep-alive sockets) warm.
+    global _client, _collection, _collection_name, _last_heartbeat
+    with _lock:
+        if _client is not None and _healthy(_client):
+            return _client
+        _client = _connect_chroma(retries, delay)
+        _collection = None
+        _collection_name = None
+        _last_heartbeat = time.monotonic()
+        return _client
+
+
+LIVE_ALIAS_SQL = "SELECT collection FROM vector_collection_aliases WHERE alias = %s"
+
+
+def live_collection_name(refresh: bool = False) -> str:
+    # The alias row is the single source of truth for which versioned collection
+    # serves traffic; it is cached briefly so every request does not hit Postgres.
+    global _live_name, _live_checked_at
+    now = time.monotonic()
+    with _lock:
+        if not refresh and _live_name and now - _live_checked_at < get_settings().vector_alias_ttl:
+            return _live_name
+    row = fetch_one(LIVE_ALIAS_SQL, (COLLECTION_NAME,))
+    with _lock:
+        _live_name = row["collection"] if row else COLLECTION_NAME
+        _live_checked_at = now
+        return _live_name
+
+
+async def alive_collection_name(refresh: bool = False) -> str:
+    global _live_name, _live_checked_at
+    now = time.monotonic()
+    with _lock:
+        if not refresh and _live_name and now - _live_checked_at < get_settings().vector_alias_ttl:
+            return _live_name
+    row = await afetch_one(LIVE_ALIAS_SQL, (COLLECTION_NAME,))
+    with _lock:
+        _live_name = row["collection"] if row else COLLECTION_NAME
+        _live_checked_at = now
+        return _live_name
+
+
+def product_document(product: dict) -> str:
+    return f"{product['title']} {product['description']}"
+
+
+def product_metadata(product: dict) -> dict:
+    # Only what queries filter on; display fields are hydrated from the catalog.
+    return {
+        "product_id": product["id"],
+        "category": product["category"],
+        "price": float(product["price"]),
+    }
+
+
+def open_collection(name: str):
+    return get_chroma_client().get_or_create_collection(
+        name=name,
         metadata={"hnsw:space": "cosine"},
     )
+
+
+def get_collection():
+    global _collection, _collection_name
+    name = live_collection_name()
+    with _lock:
+        if _collection is None or _collection_name != name:
+            _collection = open_collection(name)
+            _collection_name = name
+        return _collection
+
+
+def new_version_name() -> str:
+    return f"{VERSION_PREFIX}{int(time.time() * 1000)}"
+
+
+def swap_live_collection(name: str) -> None:
+    global _live_name, _live_checked_at
+    execute(
+        """
+        INSERT INTO vector_collection_aliases (alias, collection, updated_at)
+        VALUES (%s, %s, NOW())
+        ON CONFLICT (alias) DO UPDATE
+        SET collection = EXCLUDED.collection,
+            updated_at = EXCLUDED.updated_at
+        """,
+        (COLLECTION_NAME, name),
+    )
+    with _lock:
+        _live_name = name
+        _live_checked_at = time.monotonic()
+
+
+def collect_old_versions(keep: int | None = None) -> list[str]:
+    # Drops superseded versions (and the pre-versioning collection) but keeps the
+    # live one, the newest ``keep`` predecessors for rollback, and anything newer
+    # than live, which may be a rebuild still in progress.
+    keep = get_settings().vector_keep_versions if keep is None else keep
+    live = live_collection_name(refresh=True)
+    client = get_chroma_client()
+    names = [c.name for c in client.list_collections()]
+    versions = sorted(n for n in names if n.startswith(VERSION_PREFIX) and n < live)
+    doomed = versions[: max(0, len(versions) - keep)]
+    if live != COLLECTION_NAME and COLLECTION_NAME in names:
+        doomed.append(COLLECTION_NAME)
+    doomed.extend(n for n in names if n.startswith(LEGACY_PREFIX))
+    for name in doomed:
+        client.delete_collection(name)
+        execute("DELETE FROM vector_rebuild_checkpoints WHERE collection = %s", (name,))
+    return doomed
+
+
+class _ThreadedCollection:
+    # Async facade over a sync collection, for the in-process client, which has
+    # no async counterpart; calls run in worker threads instead of on the loop.
+    def __init__(self, collection) -> None:
+        self._collection = collection
+
+    async def _call(self, method: str, **kwargs: Any) -> Any:
+        return await anyio.to_thread.run_sync(lambda: getattr(self._collection, method)(**kwargs))
+
+    async def count(self) -> int:
+        return await self._call("count")
+
+    async def query(self, **kwargs: Any) -> Any:
+        return await self._call("query", **kwargs)
+
+    async def get(self, **kwargs: Any) -> Any:
+        return await self._call("get", **kwargs)
+
+    async def upsert(self, **kwargs: Any) -> None:
+        await self._call("upsert", **kwargs)
+
+
+async def _aconnect_chroma(retries: int, delay: float) -> AsyncClientAPI:
+    import chromadb
+
+    host, port, ssl = _chroma_address()
+    last_error: Exception | None = None
+    for attempt in range(retries):
+        try:
+            return await chromadb.AsyncHttpClient(host=host, port=port, ssl=ssl)
+        except Exception as exc:  # pragma: no cover - best-effort retry
+            last_error = exc
+            if attempt < retries - 1:
+                await asyncio.sleep(delay)
+    raise RuntimeError("Unable to connect to Chroma") from last_error
+
+
+async def _ahealthy(client: AsyncClientAPI) -> bool:
+    global _async_last_heartbeat
+    now = time.monotonic()
+    if now - _async_last_heartbeat < get_settings().chroma_heartbeat_interval:
+        return True
+    try:
+        await client.heartbeat()
+    except Exception:
+        return False
+    _async_last_heartbeat = now
+    return True
+
+
+def _async_lock() -> asyncio.Lock:
+    # The async client and its lock are bound to one event loop; on a different
+    # loop (tests, TestClient portals) both are recreated.
+    global _async_client, _async_collection, _async_collection_name, _async_last_heartbeat, _async_loop
+    loop = asyncio.get_running_loop()
+    if _async_loop is not loop:
+        with _lock:
+            if _async_loop is not loop:
+                _async_client = None
+                _async_collection = None
+                _async_collection_name = None
+                _async_last_heartbeat = 0.0
+                _async_loop = loop
+    lock = _async_locks.get(loop)
+    if lock is None:
+        lock = _async_locks[loop] = asyncio.Lock()
+    return lock
+
+
+async def aget_chroma_client(retries: int = 8, delay: float = 1.5) -> AsyncClientAPI:
+    global _async_client, _async_collection, _async_collection_name, _async_last_heartbeat
+    async with _async_lock():
+        if _async_client is not None and await _ahealthy(_async_client):
+            return _async_client
+        _async_client = await _aconnect_chroma(retries, delay)
+        _async_collection = None
+        _async_collection_name = None
+        _async_last_heartbeat = time.monotonic()
+        return _async_client
+
+
+async def aget_collection():
+    # Same live-alias resolution as get_collection(), on the async HTTP client.
+    global _async_collection, _async_collection_name
+    if get_settings().chroma_url.startswith("memory:"):
+        return _ThreadedCollection(await anyio.to_thread.run_sync(get_collection))
+    name = await alive_collection_name()
+    client = await aget_chroma_client()
+    async with _async_lock():
+        if _async_collection is None or _async_collection_name != name:
+            _async_collection = await client.get_or_create_collection(
+                name=name,
+                metadata={"hnsw:space": "cosine"},
+            )
+            _async_collection_name = name
+        return _async_collection
+
+
+async def aquery_vectors(
+    embeddings: list[list[float]],
+    n_results: int,
+    where: dict[str, Any] | None = None,
+) -> tuple[dict[str, Any], str]:
+    # Nearest products for each query vector (one request for all of them), plus
+    # where they came from. With a local snapshot loaded, Chroma gets
+    # chroma_query_timeout seconds; a failure or timeout serves the snapshot and
+    # skips Chroma for chroma_retry_after seconds.
+    global _chroma_down_until
+    settings = get_settings()
+    index = await alocal_index()
+    if index is None or index.dim != len(embeddings[0]):
+        with external_call("chroma", "query"):
+            return await _aquery_chroma(embeddings, n_results, where), "chroma"
+
+    if time.monotonic() >= _chroma_down_until:
+        try:
+            with external_call("chroma", "query"):
+                results = await asyncio.wait_for(
+                    _aquery_chroma(embeddings, n_results, where),
+                    settings.chroma_query_timeout,
+                )
+            return results, "chroma"
+        except Exception as exc:
+            _chroma_down_until = time.monotonic() + settings.chroma_retry_after
+            logger.warning(
+                "Chroma query failed (%r); serving snapshot %s for the next %.0fs.",
+                exc,
+                index.version,
+                settings.chroma_retry_after,
+            )
+
+    with stage("snapshot_query"):
+        return await anyio.to_thread.run_sync(index.query_many, embeddings, n_results, where), "snapshot"
+
+
+async def _aquery_chroma(
+    embeddings: list[list[float]],
+    n_results: int,
+    where: dict[str, Any] | None,
+) -> dict[str, Any]:
+    collection = await aget_collection()
+    return await collection.query(query_embeddings=embeddings, n_results=n_results, where=where)
+
+
+async def aget_vectors(ids: list[str]) -> dict[str, list[float]]:
+    # Stored vectors by id, from the snapshot while Chroma is being skipped.
+    index = await alocal_index()
+    if index is not None and time.monotonic() < _chroma_down_until:
+        return index.vectors_for(ids)
+    collection = await aget_collection()
+    with external_call("chroma", "get"):
+        found = await collection.get(ids=ids, include=["embeddings"])
+    return {product_id: list(vector) for product_id, vector in zip(found["ids"], found["embeddings"])}
+
+
+def reset_vector_clients() -> None:
+    global _client, _collection, _collection_name, _last_heartbeat
+    global _async_client, _async_collection, _async_collection_name, _async_last_heartbeat
+    with _lock:
+        _client = None
+        _collection = None
+        _collection_name = None
+        _last_heartbeat = 0.0
+        _async_client = None
+        _async_collection = None
+        _async_collection_name = None
+        _async_last_heartbeat = 0.0
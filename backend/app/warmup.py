@@ -0,0 +1,116 @@
+from __future__ import annotations
+
+import datetime as dt
+import logging
+import threading
+from typing import Any, Callable
+
+from .catalog import catalog
+from .local_index import local_index
+from .seed_data import ensure_seeded, ensure_vector_ready
+from .vector_store import get_collection
+
+logger = logging.getLogger(__name__)
+
+
+def _now() -> str:
+    return dt.datetime.now(dt.timezone.utc).isoformat()
+
+
+class Warmup:
+    # Seeding and vector rebuilds run here instead of in on_startup, so the server
+    # accepts connections (and answers probes) immediately. Failed attempts, e.g.
+    # Postgres or Chroma still booting, are retried with capped backoff.
+    def __init__(self, max_backoff: float = 30.0) -> None:
+        self.max_backoff = max_backoff
+        self._stop = threading.Event()
+        self._ready = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+        self._state: dict[str, Any] = {
+            "phase": "idle",
+            "attempts": 0,
+            "started_at": None,
+            "ready_at": None,
+            "finished_at": None,
+            "progress": None,
+            "last_error": None,
+        }
+
+    def start(self, on_complete: Callable[[], None] | None = None) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._update(phase="starting", started_at=_now())
+        self._thread = threading.Thread(target=self._run, args=(on_complete,), name="warmup", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+
+    @property
+    def ready(self) -> bool:
+        return self._ready.is_set()
+
+    @property
+    def blocking(self) -> bool:
+        # Only gate traffic when a warm-up was actually started (tests and scripts
+        # that drive the app without lifespan events prepare data themselves).
+        with self._lock:
+            return self._state["phase"] != "idle" and not self._ready.is_set()
+
+    def wait(self, timeout: float | None = None) -> bool:
+        return self._ready.wait(timeout)
+
+    def status(self) -> dict[str, Any]:
+        with self._lock:
+            return {**self._state, "ready": self._ready.is_set()}
+
+    def _update(self, **changes: Any) -> None:
+        with self._lock:
+            self._state.update(changes)
+
+    def _progress(self, done: int, total: int) -> None:
+        self._update(progress={"done": done, "total": total})
+
+    def _mark_ready(self) -> None:
+        if not self._ready.is_set():
+            self._update(ready_at=_now())
+            self._ready.set()
+
+    def _run(self, on_complete: Callable[[], None] | None) -> None:
+        attempt = 0
+        while not self._stop.is_set():
+            attempt += 1
+            self._update(attempts=attempt)
+            try:
+                self._update(phase="seeding")
+                ensure_seeded(progress=self._progress)
+                self._update(phase="catalog")
+                catalog.refresh(force=True)
+                if get_collection().count() > 0:
+                    # The live collection keeps serving while an interrupted rebuild resumes.
+                    self._mark_ready()
+                self._update(phase="vectors")
+                ensure_vector_ready(progress=self._progress)
+            except Exception as exc:
+                delay = min(self.max_backoff, 2.0**attempt)
+                logger.exception("Warm-up attempt %d failed; retrying in %.0fs.", attempt, delay)
+                self._update(phase="retrying", last_error=str(exc))
+                if local_index() is not None:
+                    # Chroma may be the thing that is down; the snapshot can serve meanwhile.
+                    self._mark_ready()
+                self._stop.wait(delay)
+                continue
+            self._mark_ready()
+            # Map the fallback snapshot now rather than on the first request that needs it.
+            local_index()
+            self._update(phase="done", finished_at=_now())
+            if on_complete:
+                on_complete()
+            return
+
+
+warmup = Warmup()
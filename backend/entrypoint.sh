@@ -23,22 +23,15 @@ wait_for_service() {
 
 db_host="${DB_HOST:-db}"
 db_port="${DB_PORT:-5432}"
-chroma_host="${CHROMA_HOST:-chroma}"
-chroma_port="${CHROMA_PORT:-8000}"
 
 wait_for_service "Postgres" "${db_host}" "${db_port}"
-wait_for_service "Chroma" "${chroma_host}" "${chroma_port}"
 
 echo "Applying migrations..."
-psql "${DB_URL}" -f /app/db/migrations/001_init.sql
+for migration in /app/db/migrations/*.sql; do
+  psql "${DB_URL}" -v ON_ERROR_STOP=1 -f "${migration}"
+done
 echo "Migrations applied."
 
-echo "Seeding database..."
-python /app/scripts/seed_data.py
-echo "DB seeded."
-
-echo "Populating Chroma..."
-python /app/scripts/reset_vector_db.py
-echo "Chroma populated."
-
+# Seeding and the vector index are brought up by the app's background warm-up,
+# which also serves from the last snapshot while Chroma is unavailable.
 exec uvicorn backend.app.main:app --host 0.0.0.0 --port 8000
@@ -0,0 +1,54 @@
+import glob
+import os
+
+import pytest
+
+# Tests marked with the `database` fixture run against a scratch Postgres
+# database named by TEST_DB_URL; its public schema is dropped and rebuilt from
+# db/migrations. Without TEST_DB_URL they are skipped.
+TEST_DB_URL = os.getenv("TEST_DB_URL", "")
+if TEST_DB_URL:
+    # Settings read DB_URL when app.config is first imported.
+    os.environ["DB_URL"] = TEST_DB_URL
+
+MIGRATIONS = os.path.join(os.path.dirname(__file__), "..", "..", "db", "migrations", "*.sql")
+TABLES = ["friend_events", "vector_jobs", "product_social_signals", "products", "friends"]
+
+
+class FakeClock:
+    # Stands in for time.monotonic in classes that take a clock; tests move it by hand.
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture(scope="session")
+def migrated_database():
+    if not TEST_DB_URL:
+        pytest.skip("TEST_DB_URL is not set")
+    import psycopg2
+
+    conn = psycopg2.connect(TEST_DB_URL)
+    conn.autocommit = True
+    with conn.cursor() as cursor:
+        cursor.execute("DROP SCHEMA public CASCADE; CREATE SCHEMA public")
+        for path in sorted(glob.glob(MIGRATIONS)):
+            with open(path, encoding="utf-8") as handle:
+                cursor.execute(handle.read())
+    conn.close()
+    return TEST_DB_URL
+
+
+@pytest.fixture
+def database(migrated_database):
+    from app.db import execute
+
+    execute(f"TRUNCATE {', '.join(TABLES)} RESTART IDENTITY CASCADE")
+    return migrated_database
@@ -0,0 +1,47 @@
+import pytest
+
+from app import batch_embeddings
+from app.batch_embeddings import EmbeddingBatchError, estimate_tokens, plan_batches
+
+
+def test_empty_input_has_no_batches():
+    assert list(plan_batches([], max_items=4, max_tokens=100)) == []
+
+
+def test_splits_on_item_count():
+    texts = ["ab"] * 10
+    assert list(plan_batches(texts, max_items=4, max_tokens=1000)) == [(0, 4), (4, 8), (8, 10)]
+
+
+def test_splits_on_token_budget():
+    texts = ["x" * 30] * 5
+    cost = estimate_tokens(texts[0])
+    batches = list(plan_batches(texts, max_items=100, max_tokens=cost * 2))
+    assert batches == [(0, 2), (2, 4), (4, 5)]
+
+
+def test_oversized_text_gets_its_own_batch():
+    texts = ["a", "x" * 3000, "b"]
+    assert list(plan_batches(texts, max_items=10, max_tokens=50)) == [(0, 1), (1, 2), (2, 3)]
+
+
+def test_batches_cover_every_text_once():
+    texts = ["word " * (i % 7 + 1) for i in range(103)]
+    batches = list(plan_batches(texts, max_items=8, max_tokens=20))
+    assert batches[0][0] == 0
+    assert batches[-1][1] == len(texts)
+    for (_, end), (start, _) in zip(batches, batches[1:]):
+        assert end == start
+    for start, end in batches:
+        assert 0 < end - start <= 8
+        if end - start > 1:
+            assert sum(estimate_tokens(text) for text in texts[start:end]) <= 20
+
+
+def test_short_batch_reply_fails_instead_of_misaligning(monkeypatch):
+    def short_reply(texts, input_type, backoff):
+        return [[float(index)] for index in range(len(texts) - 1)]
+
+    monkeypatch.setattr(batch_embeddings, "_embed_batch", short_reply)
+    with pytest.raises(EmbeddingBatchError, match="2 embeddings for a batch of 3"):
+        batch_embeddings._embed_all(["a", "b", "c"], "document")
@@ -0,0 +1,54 @@
+from app.cache import TTLCache
+
+
+def test_get_returns_default_on_miss():
+    entries = TTLCache(max_size=2)
+    assert entries.get("missing") is None
+    assert entries.get("missing", "fallback") == "fallback"
+    assert entries.stats()["misses"] == 2
+
+
+def test_evicts_least_recently_used():
+    entries = TTLCache(max_size=2)
+    entries.set("a", 1)
+    entries.set("b", 2)
+    assert entries.get("a") == 1
+    entries.set("c", 3)
+    assert entries.get("b") is None
+    assert entries.get("a") == 1
+    assert entries.get("c") == 3
+    assert entries.stats()["evictions"] == 1
+
+
+def test_entries_expire(clock):
+    entries = TTLCache(max_size=4, ttl=10, clock=clock)
+    entries.set("a", 1)
+    entries.set("b", 2, ttl=30)
+    clock.now += 10
+    assert entries.get("a") is None
+    assert entries.get("b") == 2
+    stats = entries.stats()
+    assert stats["expirations"] == 1
+    assert stats["size"] == 1
+
+
+def test_zero_size_stores_nothing():
+    entries = TTLCache(max_size=0)
+    entries.set("a", 1)
+    assert len(entries) == 0
+    assert entries.get("a") is None
+
+
+def test_peek_leaves_stats_and_order_alone(clock):
+    entries = TTLCache(max_size=2, ttl=10, clock=clock)
+    entries.set("a", 1)
+    entries.set("b", 2)
+    before = entries.stats()
+    assert entries.peek("a") == 1
+    assert entries.peek("missing", "fallback") == "fallback"
+    assert entries.stats() == before
+    # "a" was only peeked, so it is still the least recently used.
+    entries.set("c", 3)
+    assert entries.peek("a") is None
+    clock.now += 10
+    assert entries.peek("b") is None
@@ -0,0 +1,134 @@
+import asyncio
+import datetime as dt
+
+import pytest
+
+from app import catalog as catalog_module
+from app.catalog import REFRESH_OVERLAP, Catalog
+from app.lexical import query_tokens
+
+T0 = dt.datetime(2026, 5, 1, tzinfo=dt.timezone.utc)
+
+
+class FakeTables:
+    # Just enough of the catalog's SQL: changed rows past a watermark, rows by
+    # id and the full id list.
+    def __init__(self) -> None:
+        self.rows = {"products": {}, "friends": {}}
+        self.queries = []
+
+    def add_product(self, product_id, title="Desk Lamp", updated_at=T0):
+        self.rows["products"][product_id] = {
+            "id": product_id,
+            "title": title,
+            "brand": "Lumen",
+            "category": "Home",
+            "price": 20,
+            "description": "warm light",
+            "updated_at": updated_at,
+        }
+
+    def fetch_all(self, query, params=None):
+        self.queries.append(query)
+        rows = self.rows["products" if "FROM products" in query else "friends"]
+        if query.startswith("SELECT id FROM"):
+            return [{"id": row_id} for row_id in rows]
+        if "id = ANY" in query:
+            return [rows[row_id] for row_id in params[0] if row_id in rows]
+        return [row for row in rows.values() if row["updated_at"] > params[0]]
+
+    def iter_pages(self, query, params=None, page_size=1000):
+        yield self.fetch_all(query, params)
+
+
+@pytest.fixture
+def tables(monkeypatch):
+    fake = FakeTables()
+    monkeypatch.setattr(catalog_module, "fetch_all", fake.fetch_all)
+    monkeypatch.setattr(catalog_module, "iter_pages", fake.iter_pages)
+
+    async def afetch_all(query, params=None):
+        return fake.fetch_all(query, params)
+
+    monkeypatch.setattr(catalog_module, "afetch_all", afetch_all)
+    return fake
+
+
+def make_catalog(reconcile_interval=3600.0):
+    return Catalog(refresh_interval=0, lexical_max_postings=100, reconcile_interval=reconcile_interval)
+
+
+def test_late_commit_inside_the_overlap_is_picked_up(tables):
+    tables.add_product(1, updated_at=T0)
+    catalog = make_catalog()
+    catalog.refresh()
+
+    # Stamped before the watermark but committed after the last refresh read.
+    tables.add_product(2, updated_at=T0 - REFRESH_OVERLAP / 2)
+    tables.add_product(3, updated_at=T0 - REFRESH_OVERLAP * 2)
+    catalog.refresh()
+    assert catalog.stats()["products"] == 2
+    assert catalog.stats()["watermarks"]["products"] == T0.isoformat()
+
+
+def test_changed_rows_replace_held_entries(tables):
+    tables.add_product(1, title="Desk Lamp")
+    catalog = make_catalog()
+    catalog.refresh()
+    version = catalog.version
+
+    tables.add_product(1, title="Floor Lamp", updated_at=T0 + dt.timedelta(seconds=1))
+    assert catalog.refresh() == 1
+    assert catalog.version == version + 1
+    assert catalog.products([1])[1]["title"] == "Floor Lamp"
+    assert catalog.lexical.search(query_tokens("floor"), 5) == [1]
+    assert catalog.lexical.search(query_tokens("desk"), 5) == []
+
+
+def test_miss_is_fetched_by_id_without_moving_the_watermark(tables):
+    tables.add_product(1, updated_at=T0)
+    catalog = make_catalog()
+    catalog.refresh()
+
+    catalog.refresh_interval = 3600
+    tables.add_product(2, updated_at=T0 + dt.timedelta(minutes=5))
+    assert list(catalog.products([1, 2])) == [1, 2]
+    assert catalog.stats()["misses"] == 1
+    assert catalog.stats()["watermarks"]["products"] == T0.isoformat()
+    assert asyncio.run(catalog.aproducts([2, 3])) == {2: catalog.products([2])[2]}
+
+
+def test_deleted_rows_are_evicted_on_reconcile(tables):
+    tables.add_product(1, title="Desk Lamp")
+    tables.add_product(2, title="Floor Lamp")
+    catalog = make_catalog(reconcile_interval=0)
+    catalog.refresh()
+    assert sorted(catalog.lexical.search(query_tokens("lamp"), 5)) == [1, 2]
+
+    del tables.rows["products"][2]
+    version = catalog.version
+    assert catalog.refresh() == 1
+    assert catalog.version == version + 1
+    assert catalog.stats()["evictions"] == 1
+    assert catalog.lexical.search(query_tokens("lamp"), 5) == [1]
+    assert catalog.products([1, 2]).keys() == {1}
+
+
+def test_async_reconcile_evicts_too(tables):
+    tables.add_product(1)
+    catalog = make_catalog(reconcile_interval=0)
+    asyncio.run(catalog.arefresh())
+
+    tables.rows["products"].clear()
+    assert asyncio.run(catalog.arefresh()) == 1
+    assert len(catalog.lexical) == 0
+
+
+def test_reconcile_waits_for_its_interval(tables):
+    tables.add_product(1)
+    catalog = make_catalog()
+    catalog.refresh()
+    del tables.rows["products"][1]
+    catalog.refresh()
+    assert not any(query.startswith("SELECT id FROM") for query in tables.queries)
+    assert catalog.stats()["products"] == 1
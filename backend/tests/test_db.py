@@ -0,0 +1,201 @@
+import asyncio
+import threading
+import time
+
+import psycopg2
+import pytest
+
+from app import db
+
+
+class FakeConnection:
+    def __init__(self) -> None:
+        self.closed = 0
+        self.autocommit = False
+        self.dead = False
+        self.in_transaction = False
+        self.commits = 0
+        self.rollbacks = 0
+
+    def poll(self) -> None:
+        if self.dead:
+            raise psycopg2.OperationalError("server closed the connection unexpectedly")
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def get_transaction_status(self) -> int:
+        if self.in_transaction:
+            return psycopg2.extensions.TRANSACTION_STATUS_INTRANS
+        return psycopg2.extensions.TRANSACTION_STATUS_IDLE
+
+    def commit(self) -> None:
+        self.commits += 1
+        self.in_transaction = False
+
+    def rollback(self) -> None:
+        self.rollbacks += 1
+        self.in_transaction = False
+
+    def close(self) -> None:
+        self.closed = 1
+
+
+class FakeCursor:
+    def __init__(self, conn: FakeConnection) -> None:
+        self.conn = conn
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        pass
+
+    def execute(self, query, params=None) -> None:
+        self.conn.poll()
+        if not self.conn.autocommit:
+            self.conn.in_transaction = True
+
+
+@pytest.fixture
+def connections(monkeypatch):
+    opened = []
+
+    def connect(dsn, cursor_factory=None):
+        opened.append(FakeConnection())
+        return opened[-1]
+
+    monkeypatch.setattr(db.psycopg2, "connect", connect)
+    return opened
+
+
+def make_pool(**kwargs):
+    options = {"min_size": 0, "max_size": 2, "timeout": 0.05, "check_idle": 3600.0}
+    return db.ConnectionPool("postgresql://test", **{**options, **kwargs})
+
+
+def test_pool_opens_min_size_and_reuses_connections(connections):
+    pool = make_pool(min_size=1)
+    assert len(connections) == 1
+    conn = pool.getconn()
+    assert conn is connections[0] and conn.autocommit
+    pool.putconn(conn)
+    assert pool.getconn() is conn
+    assert pool.stats()["created"] == 1
+    assert pool.stats()["checkouts"] == 2
+
+
+def test_pool_times_out_at_max_size(connections):
+    pool = make_pool(max_size=1)
+    pool.getconn()
+    with pytest.raises(db.PoolTimeoutError):
+        pool.getconn()
+    assert pool.stats()["timeouts"] == 1
+    assert pool.stats()["in_use"] == 1
+
+
+def test_waiter_gets_the_returned_connection(connections):
+    pool = make_pool(max_size=1, timeout=5)
+    conn = pool.getconn()
+    handed = []
+    waiter = threading.Thread(target=lambda: handed.append(pool.getconn()))
+    waiter.start()
+    for _ in range(500):
+        if pool.stats()["waits"]:
+            break
+        time.sleep(0.01)
+    pool.putconn(conn)
+    waiter.join(5)
+    assert handed == [conn]
+    assert len(connections) == 1
+
+
+def test_broken_and_dead_connections_are_replaced(connections):
+    pool = make_pool()
+    first = pool.getconn()
+    pool.putconn(first, broken=True)
+    assert first.closed
+
+    second = pool.getconn()
+    pool.putconn(second)
+    second.dead = True
+    third = pool.getconn()
+    assert third is not second and second.closed
+    assert pool.stats()["discarded"] == 2
+    assert pool.stats()["size"] == 1
+
+
+def test_expired_connections_are_not_handed_out(connections):
+    pool = make_pool(max_lifetime=0)
+    conn = pool.getconn()
+    pool.putconn(conn)
+    assert conn.closed
+    assert pool.getconn() is not conn
+
+
+def test_checkin_rolls_back_an_open_transaction(connections):
+    pool = make_pool()
+    conn = pool.getconn()
+    conn.autocommit = False
+    conn.in_transaction = True
+    pool.putconn(conn)
+    assert conn.rollbacks == 1
+    assert conn.autocommit
+    assert pool.getconn() is conn
+
+
+def test_failed_connect_frees_its_slot(connections, monkeypatch):
+    pool = make_pool(max_size=1)
+
+    def refuse(dsn, cursor_factory=None):
+        raise psycopg2.OperationalError("connection refused")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(db.psycopg2, "connect", refuse)
+        with pytest.raises(psycopg2.OperationalError):
+            pool.getconn()
+    assert pool.stats()["size"] == 0
+    assert pool.getconn() is connections[0]
+
+
+def test_nested_transactions_share_one_connection(connections, monkeypatch):
+    pool = make_pool()
+    monkeypatch.setattr(db, "_pool", pool)
+    with db.transaction() as outer:
+        with db.get_conn() as inner, db.transaction() as joined:
+            assert inner is outer and joined is outer
+        outer.cursor().execute("INSERT")
+    assert outer.commits == 1
+    assert outer.autocommit
+    assert pool.stats()["checkouts"] == 1
+    assert pool.stats()["idle"] == 1
+
+
+def test_transaction_rolls_back_on_error(connections, monkeypatch):
+    monkeypatch.setattr(db, "_pool", make_pool())
+    with pytest.raises(ValueError):
+        with db.transaction() as conn:
+            conn.cursor().execute("INSERT")
+            raise ValueError("boom")
+    assert conn.rollbacks == 1
+    assert conn.commits == 0
+
+
+def test_values_placeholder_is_split_out():
+    assert db._split_values_placeholder("INSERT INTO t (a, b) values  %s RETURNING id") == (
+        "INSERT INTO t (a, b) values  ",
+        " RETURNING id",
+    )
+
+
+@pytest.mark.parametrize(
+    "query",
+    [
+        "INSERT INTO t (a) SELECT 1",
+        "INSERT INTO t (a) VALUES %s; INSERT INTO u (a) VALUES %s",
+        "UPDATE t SET a = %s FROM (VALUES %s) AS v (a)",
+    ],
+)
+def test_values_placeholder_must_be_the_only_parameter(query):
+    with pytest.raises(ValueError):
+        asyncio.run(db.aexecute_values(query, [(1,)]))
@@ -0,0 +1,69 @@
+import pytest
+
+from app import embedding_store
+from app.embedding_store import embed_with_store, embedding_key
+
+
+@pytest.fixture
+def table(monkeypatch):
+    # embedding_store rows keyed like the real table; ON CONFLICT DO NOTHING.
+    rows = {}
+    lookups = []
+
+    def fetch_all(query, params):
+        lookups.append(len(params[0]))
+        return [{"key": key, "embedding": rows[key]} for key in params[0] if key in rows]
+
+    def execute_values(query, values):
+        for key, model, input_type, embedding in values:
+            rows.setdefault(key, embedding)
+
+    monkeypatch.setattr(embedding_store, "fetch_all", fetch_all)
+    monkeypatch.setattr(embedding_store, "execute_values", execute_values)
+    return {"rows": rows, "lookups": lookups}
+
+
+class Provider:
+    def __init__(self, name="voyage") -> None:
+        self.name = name
+        self.calls = []
+
+    def __call__(self, texts):
+        self.calls.append(list(texts))
+        return [[float(len(text)), 0.5] for text in texts], self.name
+
+
+def test_key_separates_model_input_type_and_text():
+    assert embedding_key("m", "document", "a b") != embedding_key("m", "document a", "b")
+    assert embedding_key("m", "query", "x") != embedding_key("m", "document", "x")
+    assert len(embedding_key("m", "query", "x")) == 32
+
+
+def test_only_distinct_unstored_texts_reach_the_provider(table):
+    provider = Provider()
+    assert embed_with_store(["lamp", "desk", "lamp"], "document", provider) == [[4.0, 0.5], [4.0, 0.5], [4.0, 0.5]]
+    assert provider.calls == [["lamp", "desk"]]
+
+    assert embed_with_store(["desk", "chair"], "document", provider) == [[4.0, 0.5], [5.0, 0.5]]
+    assert provider.calls[-1] == ["chair"]
+    assert len(table["rows"]) == 3
+
+
+def test_stored_vectors_round_trip_as_float32(table):
+    embed_with_store(["lamp"], "document", lambda texts: ([[0.1, 1 / 3]], "voyage"))
+    stored = embed_with_store(["lamp"], "document", Provider())
+    assert stored == [[pytest.approx(0.1, rel=1e-7), pytest.approx(1 / 3, rel=1e-7)]]
+
+
+def test_fallback_vectors_are_not_persisted(table):
+    fallback = Provider("fallback")
+    embed_with_store(["lamp"], "document", fallback)
+    embed_with_store(["lamp"], "document", fallback)
+    assert len(fallback.calls) == 2
+    assert table["rows"] == {}
+
+
+def test_lookups_are_paged(table):
+    keys = [embedding_key("m", "document", str(index)) for index in range(5)]
+    assert embedding_store.load_embeddings(keys, page_size=2) == {}
+    assert table["lookups"] == [2, 2, 1]
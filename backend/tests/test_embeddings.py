@@ -0,0 +1,74 @@
+import asyncio
+import importlib.util
+import pathlib
+
+import numpy as np
+
+from app import embeddings
+from app.cache import TTLCache
+from app.embeddings import hash_embeddings
+
+
+SCRIPTS = pathlib.Path(__file__).resolve().parents[2] / "scripts"
+
+
+def _load_reference():
+    # The per-text oracle lives with the benchmark script; one copy for both.
+    spec = importlib.util.spec_from_file_location("bench_hash_embeddings", SCRIPTS / "bench_hash_embeddings.py")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module.reference_hash_embedding
+
+
+reference_embedding = _load_reference()
+
+
+TEXTS = [
+    "Glow serum with vitamin C",
+    "glow GLOW glow",
+    "",
+    "   ",
+    "Noise-cancelling headphones, 30h battery",
+    "café crème — ünïcode tokens",
+    "lamp " * 50,
+]
+
+
+def test_float64_is_bit_identical_to_the_per_text_loop():
+    matrix = hash_embeddings(TEXTS, dtype=np.float64)
+    assert matrix.shape == (len(TEXTS), 256)
+    for row, text in zip(matrix, TEXTS):
+        assert row.tolist() == reference_embedding(text)
+
+
+def test_other_dimensions_match_the_per_text_loop():
+    matrix = hash_embeddings(TEXTS, dim=64, dtype=np.float64)
+    for row, text in zip(matrix, TEXTS):
+        assert row.tolist() == reference_embedding(text, dim=64)
+
+
+def test_float32_is_the_rounded_float64_result():
+    exact = hash_embeddings(TEXTS, dtype=np.float64)
+    assert np.array_equal(hash_embeddings(TEXTS), exact.astype(np.float32))
+
+
+def test_chunking_does_not_change_results():
+    texts = [f"product {i} with shared words {i % 5}" for i in range(50)]
+    assert np.array_equal(hash_embeddings(texts, chunk_size=7), hash_embeddings(texts))
+
+
+def test_empty_batch():
+    assert hash_embeddings([]).shape == (0, 256)
+
+
+def test_rate_limited_queries_report_the_fallback_provider(monkeypatch):
+    async def rate_limited(texts, input_type):
+        return hash_embeddings(list(texts), dtype=np.float64).tolist(), "fallback"
+
+    monkeypatch.setattr(embeddings, "voyage_enabled", lambda: True)
+    monkeypatch.setattr(embeddings, "_aembed_with_provider", rate_limited)
+    monkeypatch.setattr(embeddings, "_query_cache", TTLCache(max_size=16))
+    vectors, provider = asyncio.run(embeddings.aembed_queries_with_provider(["red shoes"]))
+    assert provider == "fallback"
+    assert vectors == hash_embeddings(["red shoes"], dtype=np.float64).tolist()
+    assert not embeddings.query_embedding_cached("red shoes")
@@ -0,0 +1,108 @@
+import dataclasses
+
+import pytest
+
+from app import ingest_worker
+from app.config import get_settings
+from app.db import execute, fetch_one, transaction
+from app.ingest_worker import (
+    QueueDepth,
+    QueueFullError,
+    VectorWorker,
+    _claim_jobs,
+    _fail_exhausted_jobs,
+    enqueue_products,
+)
+
+MAX_ATTEMPTS = 2
+
+
+def add_product() -> int:
+    execute(
+        "INSERT INTO products (title, brand, category, price, description) "
+        "VALUES ('Desk Lamp', 'Lumen', 'Home', 20, 'warm light')"
+    )
+    return fetch_one("SELECT MAX(id) AS id FROM products")["id"]
+
+
+def claim() -> list[int]:
+    # A zero visibility timeout makes every claim expire at once, as if the
+    # worker had died before deleting the job.
+    with transaction():
+        _fail_exhausted_jobs(MAX_ATTEMPTS)
+        return [job["product_id"] for job in _claim_jobs(10, 0)]
+
+
+def job(product_id: int) -> dict:
+    return fetch_one("SELECT attempts, failed_at FROM vector_jobs WHERE product_id = %s", (product_id,))
+
+
+def test_failed_job_is_set_aside_and_revived_by_a_new_ingest(database):
+    product_id = add_product()
+    enqueue_products([product_id])
+    assert claim() == [product_id]
+    assert claim() == [product_id]
+    assert claim() == []
+    assert job(product_id)["failed_at"] is not None
+
+    enqueue_products([product_id])
+    revived = job(product_id)
+    assert revived["failed_at"] is None
+    assert revived["attempts"] == 0
+    assert claim() == [product_id]
+
+
+def test_enqueue_leaves_a_pending_job_alone(database):
+    product_id = add_product()
+    enqueue_products([product_id])
+    assert claim() == [product_id]
+    enqueue_products([product_id])
+    assert job(product_id)["attempts"] == 1
+
+
+def test_queue_depth_is_recounted_only_when_due():
+    depth = QueueDepth(ttl=3600)
+    assert depth.due()
+    depth.set(5)
+    depth.add(2)
+    assert not depth.due()
+    assert depth.value() == 7
+    assert QueueDepth(ttl=0).due()
+
+
+@pytest.fixture
+def settings(monkeypatch):
+    settings = dataclasses.replace(get_settings(), vector_queue_max=2, vector_worker_batch_size=10)
+    monkeypatch.setattr(ingest_worker, "get_settings", lambda: settings)
+    monkeypatch.setattr(ingest_worker, "_depth", QueueDepth(ttl=0))
+    return settings
+
+
+def test_full_queue_refuses_new_jobs(database, settings):
+    product_ids = [add_product() for _ in range(3)]
+    enqueue_products(product_ids[:2])
+    with pytest.raises(QueueFullError):
+        enqueue_products(product_ids[2:])
+    assert job(product_ids[2]) is None
+
+
+def test_worker_deletes_jobs_only_after_indexing(database, settings, monkeypatch):
+    product_ids = [add_product() for _ in range(2)]
+    enqueue_products(product_ids)
+
+    def unavailable(products):
+        raise ConnectionError("chroma is down")
+
+    monkeypatch.setattr(ingest_worker, "index_missing_products", unavailable)
+    worker = VectorWorker()
+    with pytest.raises(ConnectionError):
+        worker.process_batch()
+    assert all(job(product_id)["attempts"] == 1 for product_id in product_ids)
+
+    indexed = []
+    monkeypatch.setattr(ingest_worker, "index_missing_products", lambda products: indexed.extend(products) or 0)
+    execute("UPDATE vector_jobs SET locked_until = 'epoch'")  # the failed claim expired
+    assert worker.process_batch() == 2
+    assert sorted(product["id"] for product in indexed) == product_ids
+    assert all(job(product_id) is None for product_id in product_ids)
+    assert worker.stats()["processed_jobs"] == 2
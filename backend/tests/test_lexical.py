@@ -0,0 +1,68 @@
+import pytest
+
+from app.lexical import LexicalIndex, lexical_boost, query_tokens, tokenize
+
+
+def product(product_id, title, description="", category="Home"):
+    return {"id": product_id, "title": title, "description": description, "category": category}
+
+
+@pytest.fixture
+def index():
+    lexical = LexicalIndex(max_postings=3)
+    lexical.update(product(1, "Vitamin C Serum", "brightening serum for the face", "Beauty"))
+    lexical.update(product(2, "Desk Lamp", "warm light for the desk"))
+    lexical.update(product(3, "Floor Lamp", "tall lamp with a linen shade"))
+    lexical.update(product(4, "Travel Kit", "serum, lotion and a lamp-free bag", "Travel"))
+    return lexical
+
+
+def test_tokenize_casefolds_and_splits_on_non_word_characters():
+    assert tokenize("Noise-Cancelling HEADPHONES, 30h") == ["noise", "cancelling", "headphones", "30h"]
+    assert query_tokens("lamp Lamp LAMP") == frozenset({"lamp"})
+
+
+def test_boost_grows_with_matches_up_to_a_cap():
+    assert [lexical_boost(matches) for matches in range(5)] == pytest.approx([0.0, 0.05, 0.1, 0.15, 0.15])
+
+
+def test_search_ranks_by_matched_tokens_then_title_matches(index):
+    # All three "lamp" products match one token; only 2 and 3 have it in the title.
+    assert index.search(query_tokens("desk lamp"), 3) == [2, 3, 4]
+    assert index.search(query_tokens("lamp"), 3) == [2, 3, 4]
+
+
+def test_search_filters_categories_and_respects_the_limit(index):
+    assert index.search(query_tokens("serum"), 5, categories={"Travel"}) == [4]
+    assert index.search(query_tokens("serum"), 1) == [1]
+    assert index.search(query_tokens("serum"), 0) == []
+    assert index.search(frozenset(), 5) == []
+
+
+def test_tokens_in_too_many_products_do_not_nominate(index):
+    # "for" and "the" are in four products now, over max_postings.
+    index.update(product(5, "Mug", "for the table"))
+    index.update(product(6, "Rug", "for the hallway"))
+    assert index.search(query_tokens("for"), 5) == []
+    assert index.matches(query_tokens("for the desk"), 2) == 3
+
+
+def test_update_replaces_a_products_tokens(index):
+    index.update(product(2, "Desk Organizer", "bamboo trays"))
+    assert 2 not in index.search(query_tokens("lamp"), 5)
+    assert index.search(query_tokens("bamboo"), 5) == [2]
+    assert index.matches(query_tokens("desk lamp"), 2) == 1
+    assert index.stats()["products"] == 4
+
+
+def test_remove_drops_a_product_and_its_empty_postings(index):
+    tokens = index.stats()["tokens"]
+    index.remove(1)
+    index.remove(99)
+    assert index.search(query_tokens("serum"), 5) == [4]
+    assert index.matches(query_tokens("serum"), 1) == 0
+    assert index.stats() == {"products": 3, "tokens": tokens - 4}  # vitamin, c, brightening, face
+
+
+def test_matches_for_unknown_product(index):
+    assert index.matches(query_tokens("lamp"), 99) == 0
@@ -0,0 +1,75 @@
+import numpy as np
+import pytest
+
+from app.local_index import LocalIndex
+
+CATEGORIES = ["Home", "Beauty", "Travel"]
+
+
+@pytest.fixture
+def index():
+    rng = np.random.default_rng(3)
+    vectors = rng.normal(size=(60, 8)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    ids = [str(100 + row) for row in range(60)]
+    metadatas = [{"product_id": 100 + row, "category": CATEGORIES[row % 3]} for row in range(60)]
+    return LocalIndex("v1", vectors, ids, metadatas, chunk_rows=16)
+
+
+def brute_force(index, query, n, categories=None):
+    query = np.asarray(query, dtype=np.float64)
+    distances = 1.0 - index.vectors.astype(np.float64) @ (query / np.linalg.norm(query))
+    rows = [row for row in range(len(index)) if categories is None or index.metadatas[row]["category"] in categories]
+    rows.sort(key=lambda row: distances[row])
+    return [index.ids[row] for row in rows[:n]]
+
+
+def test_query_returns_nearest_by_cosine_distance(index):
+    query = np.linspace(-1, 1, 8)
+    result = index.query(query, 5)
+    assert result["ids"] == [brute_force(index, query, 5)]
+    assert result["distances"][0] == sorted(result["distances"][0])
+    assert [metadata["product_id"] for metadata in result["metadatas"][0]] == [int(i) for i in result["ids"][0]]
+
+
+def test_query_filters_by_category(index):
+    query = np.ones(8)
+    result = index.query(query, 4, where={"category": "Beauty"})
+    assert result["ids"] == [brute_force(index, query, 4, {"Beauty"})]
+    assert {metadata["category"] for metadata in result["metadatas"][0]} == {"Beauty"}
+
+
+def test_query_filters_by_category_list(index):
+    query = np.arange(8.0)
+    result = index.query(query, 30, where={"category": {"$in": ["Home", "Travel", "Garden"]}})
+    assert result["ids"] == [brute_force(index, query, 30, {"Home", "Travel"})]
+
+
+def test_filter_smaller_than_n_returns_every_match(index):
+    result = index.query(np.ones(8), 100, where={"category": "Travel"})
+    assert len(result["ids"][0]) == 20
+
+
+def test_unknown_category_matches_nothing(index):
+    assert index.query(np.ones(8), 5, where={"category": "Garden"})["ids"] == [[]]
+
+
+def test_dimension_mismatch_is_rejected(index):
+    with pytest.raises(ValueError):
+        index.query(np.ones(4), 5)
+
+
+def test_vectors_for_skips_unknown_ids(index):
+    found = index.vectors_for(["100", "missing"])
+    assert list(found) == ["100"]
+    assert found["100"] == index.vectors[0].tolist()
+
+
+@pytest.mark.parametrize("where", [None, {"category": "Home"}, {"category": {"$in": ["Beauty", "Travel"]}}])
+def test_query_many_matches_one_query_per_vector(index, where):
+    queries = [np.linspace(-1, 1, 8), np.ones(8), np.arange(8.0), np.zeros(8)]
+    batched = index.query_many(queries, 6, where)
+    for position, query in enumerate(queries):
+        single = index.query(query, 6, where)
+        for field in ("ids", "distances", "metadatas"):
+            assert batched[field][position] == single[field][0]
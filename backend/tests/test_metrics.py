@@ -0,0 +1,67 @@
+import pytest
+
+from app import metrics
+from app.metrics import Histogram
+
+
+def test_observations_land_in_cumulative_buckets():
+    histogram = Histogram("latency_seconds", "Test latency.", ("route",), buckets=(0.1, 1.0))
+    for seconds in [0.05, 0.1, 0.5, 3.0]:
+        histogram.observe(seconds, ("/a",))
+    assert histogram.render() == [
+        "# HELP latency_seconds Test latency.",
+        "# TYPE latency_seconds histogram",
+        'latency_seconds_bucket{route="/a",le="0.1"} 2',
+        'latency_seconds_bucket{route="/a",le="1.0"} 3',
+        'latency_seconds_bucket{route="/a",le="+Inf"} 4',
+        'latency_seconds_sum{route="/a"} 3.65',
+        'latency_seconds_count{route="/a"} 4',
+    ]
+
+
+def test_label_values_are_escaped_and_series_sorted():
+    histogram = Histogram("h", "Help.", ("name",), buckets=(1.0,))
+    histogram.observe(0.5, ('b"\\\n',))
+    histogram.observe(0.5, ("a",))
+    lines = histogram.render()
+    assert lines[2] == 'h_bucket{name="a",le="1.0"} 1'
+    assert 'h_count{name="b\\"\\\\\\n"} 1' in lines
+
+
+def test_unlabelled_series_render_without_braces():
+    histogram = Histogram("h", "Help.", (), buckets=(1.0,))
+    histogram.observe(2.0, ())
+    assert histogram.render()[-2:] == ["h_sum 2.0", "h_count 1"]
+
+
+def test_request_timings_are_collected_only_when_started():
+    with metrics.stage("outside"):
+        pass
+    assert metrics.current_timings() is None
+
+    token = metrics.start_request_timings()
+    try:
+        with metrics.stage("scoring"):
+            pass
+        with metrics.db_query("fetch_all"), metrics.db_query("fetch_all"):
+            pass
+        with pytest.raises(ValueError), metrics.external_call("voyage", "embed"):
+            raise ValueError("timed even when it fails")
+        timings = metrics.current_timings()
+    finally:
+        metrics.stop_request_timings(token)
+
+    assert {key: value["count"] for key, value in timings.items()} == {
+        "scoring": 1,
+        "db.fetch_all": 2,
+        "voyage.embed": 1,
+    }
+    assert all(value["ms"] >= 0 for value in timings.values())
+    assert metrics.current_timings() is None
+
+
+def test_prometheus_output_lists_every_histogram():
+    text = metrics.render_prometheus()
+    assert text.endswith("\n")
+    for histogram in metrics.REGISTRY:
+        assert f"# TYPE {histogram.name} histogram" in text
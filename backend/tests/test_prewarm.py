@@ -0,0 +1,63 @@
+import collections
+import random
+
+from app.prewarm import QueryLog
+
+
+def spec(query):
+    return (query, "", 10)
+
+
+def test_tracks_exact_counts_below_capacity():
+    log = QueryLog(capacity=4)
+    for query in ["a", "b", "a", "c", "a", "b"]:
+        log.record(spec(query))
+    assert log.top(2) == [(spec("a"), 3), (spec("b"), 2)]
+    assert log.stats() == {"tracked": 3, "capacity": 4, "recorded": 6}
+
+
+def test_newcomer_evicts_the_minimum_and_inherits_its_count():
+    log = QueryLog(capacity=2)
+    for query in ["a", "a", "a", "b"]:
+        log.record(spec(query))
+    log.record(spec("c"))
+    assert len(log) == 2
+    assert dict(log.top(2)) == {spec("a"): 3, spec("c"): 2}
+
+
+def test_eviction_sees_counts_raised_after_insertion():
+    log = QueryLog(capacity=2)
+    log.record(spec("a"))
+    log.record(spec("b"))
+    for _ in range(5):
+        log.record(spec("a"))
+    # "a" entered the heap with count 1; "b" is the real minimum now.
+    log.record(spec("c"))
+    assert dict(log.top(2)) == {spec("a"): 6, spec("c"): 2}
+
+
+def test_heavy_hitters_survive_a_long_tail():
+    rng = random.Random(5)
+    log = QueryLog(capacity=50)
+    true = collections.Counter()
+    for _ in range(50_000):
+        query = spec(str(int(rng.paretovariate(1.1))))
+        log.record(query)
+        true[query] += 1
+    assert len(log) == 50
+    assert [query for query, _ in log.top(5)] == [query for query, _ in true.most_common(5)]
+    for query, count in log.top(50):
+        # Space-Saving only overestimates, by at most total / capacity.
+        assert true[query] <= count <= true[query] + 50_000 // 50
+
+
+def test_deltas_are_taken_once_and_restored_on_failure():
+    log = QueryLog(capacity=4)
+    for query in ["a", "a", "b"]:
+        log.record(spec(query))
+    deltas = log.take_deltas()
+    assert sorted(deltas) == [(spec("a"), 2), (spec("b"), 1)]
+    assert log.take_deltas() == []
+    log.restore(deltas)
+    log.record(spec("a"))
+    assert sorted(log.take_deltas()) == [(spec("a"), 3), (spec("b"), 1)]
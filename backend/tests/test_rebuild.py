@@ -0,0 +1,104 @@
+import dataclasses
+
+import pytest
+
+from app import seed_data
+from app.config import get_settings
+from app.result_cache import ResultCache
+
+PRODUCTS = [
+    {"id": product_id, "title": f"product {product_id}", "brand": "b", "category": "Home", "price": 10, "description": ""}
+    for product_id in range(1, 11)
+]
+
+
+class Crash(Exception):
+    pass
+
+
+class FakeCollection:
+    def __init__(self, fail_after: int | None = None) -> None:
+        self.ids: list[str] = []
+        self.upserts = 0
+        self.fail_after = fail_after
+
+    def upsert(self, ids, embeddings, metadatas, documents) -> None:
+        if self.fail_after is not None and self.upserts == self.fail_after:
+            raise Crash("chroma went away")
+        assert len(ids) == len(embeddings) == len(metadatas) == len(documents)
+        self.upserts += 1
+        self.ids.extend(ids)
+
+
+@pytest.fixture
+def rebuild(monkeypatch):
+    # Products, checkpoints and the alias live in dicts; Chroma is a list of upserted ids.
+    state = {"checkpoints": {}, "collections": {}, "live": [], "queries": []}
+
+    def iter_pages(query, params, page_size):
+        state["queries"].append(params[0])
+        rows = [row for row in PRODUCTS if row["id"] > params[0]]
+        for start in range(0, len(rows), page_size):
+            yield rows[start : start + page_size]
+
+    def save_checkpoint(name, last_id, completed=False):
+        state["checkpoints"][name] = {"last_id": last_id, "completed": completed}
+
+    def pending_version():
+        pending = [name for name, row in state["checkpoints"].items() if not row["completed"]]
+        return max(pending) if pending else None
+
+    names = iter(f"products_v{index}" for index in range(100, 200))
+    settings = dataclasses.replace(get_settings(), rebuild_page_size=4, chroma_upsert_batch=3)
+    monkeypatch.setattr(seed_data, "get_settings", lambda: settings)
+    monkeypatch.setattr(seed_data, "iter_pages", iter_pages)
+    monkeypatch.setattr(seed_data, "embed_in_batches", lambda documents: [[0.0, 1.0] for _ in documents])
+    monkeypatch.setattr(seed_data, "_save_checkpoint", save_checkpoint)
+    monkeypatch.setattr(seed_data, "_load_checkpoint", lambda name: state["checkpoints"].get(name))
+    monkeypatch.setattr(seed_data, "_pending_version", pending_version)
+    monkeypatch.setattr(seed_data, "new_version_name", lambda: next(names))
+    monkeypatch.setattr(seed_data, "open_collection", lambda name: state["collections"][name])
+    monkeypatch.setattr(seed_data, "swap_live_collection", state["live"].append)
+    monkeypatch.setattr(seed_data, "export_snapshot", lambda collection, name: None)
+    monkeypatch.setattr(seed_data, "collect_old_versions", lambda: [])
+    monkeypatch.setattr(seed_data, "recommendation_cache", ResultCache(max_size=1, ttl=1, stale_ttl=1))
+    return state
+
+
+def test_stream_checkpoints_after_every_chunk(rebuild, monkeypatch):
+    monkeypatch.setattr(seed_data, "fetch_one", lambda query, params: {"count": len(PRODUCTS)})
+    collection = FakeCollection()
+    progress = []
+    last_id = seed_data._stream_products_into(collection, "v", 0, lambda done, total: progress.append(done))
+    assert last_id == 10
+    assert collection.ids == [str(row["id"]) for row in PRODUCTS]
+    # Pages of 4 split into upserts of at most 3: 3+1, 3+1, 2.
+    assert collection.upserts == 5
+    assert rebuild["checkpoints"]["v"] == {"last_id": 10, "completed": False}
+    assert progress == [0, 4, 8, 10]
+
+
+def test_interrupted_rebuild_resumes_after_its_last_checkpoint(rebuild):
+    rebuild["collections"]["products_v100"] = FakeCollection(fail_after=2)
+    with pytest.raises(Crash):
+        seed_data.rebuild_vector_store()
+    # Two chunks (ids 1-3, then 4) were upserted and checkpointed before the crash.
+    assert rebuild["checkpoints"]["products_v100"] == {"last_id": 4, "completed": False}
+    assert rebuild["live"] == []
+
+    collection = rebuild["collections"]["products_v100"]
+    collection.fail_after = None
+    seed_data.rebuild_vector_store()
+    assert rebuild["queries"][-2:] == [4, 10]  # resumed pass, then the catch-up pass after the swap
+    assert collection.ids == [str(row["id"]) for row in PRODUCTS]
+    assert rebuild["live"] == ["products_v100"]
+    assert rebuild["checkpoints"]["products_v100"] == {"last_id": 10, "completed": True}
+
+
+def test_rebuild_without_resume_starts_a_new_version(rebuild):
+    rebuild["checkpoints"]["products_v099"] = {"last_id": 4, "completed": False}
+    rebuild["collections"]["products_v100"] = FakeCollection()
+    seed_data.rebuild_vector_store(resume=False)
+    assert rebuild["live"] == ["products_v100"]
+    assert rebuild["queries"][0] == 0
+    assert len(rebuild["collections"]["products_v100"].ids) == len(PRODUCTS)
@@ -0,0 +1,216 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from app.result_cache import ResultCache
+
+
+@pytest.fixture
+def results(clock):
+    cache = ResultCache(max_size=16, ttl=10, stale_ttl=30, clock=clock)
+    yield cache
+    cache.close()
+
+
+class Counter:
+    def __init__(self) -> None:
+        self.calls = 0
+
+    def __call__(self) -> int:
+        self.calls += 1
+        return self.calls
+
+
+def test_fresh_entries_are_served_without_recomputing(clock, results):
+    compute = Counter()
+    assert results.get_or_compute("q", compute) == 1
+    clock.now += 9
+    assert results.get_or_compute("q", compute) == 1
+    assert compute.calls == 1
+    assert results.stats()["fresh"] == 1
+
+
+def test_invalidation_recomputes_inline(clock, results):
+    compute = Counter()
+    results.get_or_compute("q", compute)
+    results.invalidate()
+    assert results.get_or_compute("q", compute) == 2
+    assert results.get_or_compute("q", compute) == 2
+    assert results.stats()["invalidations"] == 1
+
+
+def test_concurrent_callers_get_the_previous_value_during_a_recompute(clock, results):
+    results.get_or_compute("q", lambda: "old")
+    results.invalidate()
+    started, release = threading.Event(), threading.Event()
+
+    def slow() -> str:
+        started.set()
+        release.wait(5)
+        return "new"
+
+    recomputed = []
+    writer = threading.Thread(target=lambda: recomputed.append(results.get_or_compute("q", slow)))
+    writer.start()
+    assert started.wait(5)
+    assert results.get_or_compute("q", lambda: "unexpected") == "old"
+    release.set()
+    writer.join(5)
+    assert recomputed == ["new"]
+    assert results.get_or_compute("q", lambda: "unexpected") == "new"
+
+
+def test_write_during_compute_leaves_the_entry_invalidated(clock, results):
+    def compute() -> str:
+        results.invalidate()
+        return "computed before the write landed"
+
+    results.get_or_compute("q", compute)
+    assert results.get_or_compute("q", lambda: "after") == "after"
+
+
+def test_stale_entry_is_served_while_one_refresh_runs(clock, results):
+    results.get_or_compute("q", lambda: "old")
+    clock.now += 15
+    refreshed = threading.Event()
+
+    def refresh() -> str:
+        refreshed.set()
+        return "new"
+
+    assert results.get_or_compute("q", refresh) == "old"
+    assert refreshed.wait(5)
+    for _ in range(100):
+        if results.stats()["refreshes"]:
+            break
+        time.sleep(0.01)
+    assert results.get_or_compute("q", lambda: "unexpected") == "new"
+    assert results.stats()["stale"] == 1
+
+
+def test_entry_past_the_stale_window_is_recomputed(clock, results):
+    compute = Counter()
+    results.get_or_compute("q", compute)
+    clock.now += 40
+    assert results.get_or_compute("q", compute) == 2
+
+
+def test_async_stale_entry_refreshes_in_the_background(clock, results):
+    async def scenario() -> list[str]:
+        async def old() -> str:
+            return "old"
+
+        async def new() -> str:
+            return "new"
+
+        served = [await results.aget_or_compute("q", old)]
+        clock.now += 15
+        served.append(await results.aget_or_compute("q", new))
+        await asyncio.gather(*results._tasks)
+        served.append(await results.aget_or_compute("q", old))
+        return served
+
+    assert asyncio.run(scenario()) == ["old", "old", "new"]
+
+
+def test_fresh_does_not_count_hits_or_misses(clock, results):
+    results.get_or_compute("q", lambda: "value")
+    before = results.stats()
+    assert results.fresh("q")
+    assert not results.fresh("other")
+    assert results.stats() == before
+    clock.now += 15
+    assert not results.fresh("q")
+
+
+def test_concurrent_misses_compute_once(clock, results):
+    started, release = threading.Event(), threading.Event()
+    compute = Counter()
+
+    def slow() -> int:
+        started.set()
+        release.wait(5)
+        return compute()
+
+    served = []
+    first = threading.Thread(target=lambda: served.append(results.get_or_compute("q", slow)))
+    first.start()
+    assert started.wait(5)
+    second = threading.Thread(target=lambda: served.append(results.get_or_compute("q", compute)))
+    second.start()
+    for _ in range(100):
+        if results.stats()["waits"]:
+            break
+        time.sleep(0.01)
+    release.set()
+    first.join(5)
+    second.join(5)
+    assert served == [1, 1]
+    assert compute.calls == 1
+
+
+def test_waiters_compute_themselves_when_the_first_miss_fails(clock, results):
+    async def scenario() -> list[str]:
+        gate = asyncio.Event()
+
+        async def failing() -> str:
+            await gate.wait()
+            raise RuntimeError("upstream down")
+
+        async def working() -> str:
+            return "value"
+
+        first = asyncio.ensure_future(results.aget_or_compute("q", failing))
+        await asyncio.sleep(0)
+        second = asyncio.ensure_future(results.aget_or_compute("q", working))
+        await asyncio.sleep(0)
+        gate.set()
+        with pytest.raises(RuntimeError):
+            await first
+        return [await second, await results.aget_or_compute("q", failing)]
+
+    assert asyncio.run(scenario()) == ["value", "value"]
+    assert results.stats()["waits"] == 1
+
+
+def test_shared_generation_change_invalidates(clock, monkeypatch):
+    shared = {"generation": 3}
+    monkeypatch.setattr("app.result_cache.fetch_one", lambda query, params: dict(shared))
+    results = ResultCache(
+        max_size=16, ttl=10, stale_ttl=30, shared_name="recommendations", shared_ttl=1, clock=clock
+    )
+    compute = Counter()
+    assert results.get_or_compute("q", compute) == 1
+
+    shared["generation"] = 4
+    assert results.get_or_compute("q", compute) == 1  # read again only after shared_ttl
+    clock.now += 1
+    assert results.get_or_compute("q", compute) == 2
+    clock.now += 1
+    assert results.get_or_compute("q", compute) == 2
+
+
+def test_unreadable_shared_generation_falls_back_to_local(clock, monkeypatch):
+    def down(query, params):
+        raise OSError("database unavailable")
+
+    monkeypatch.setattr("app.result_cache.fetch_one", down)
+    results = ResultCache(
+        max_size=16, ttl=10, stale_ttl=30, shared_name="recommendations", shared_ttl=1, clock=clock
+    )
+    compute = Counter()
+    assert results.get_or_compute("q", compute) == 1
+    results.invalidate()
+    assert results.get_or_compute("q", compute) == 2
+
+
+def test_uncacheable_values_are_served_but_not_stored(clock):
+    results = ResultCache(
+        max_size=16, ttl=10, stale_ttl=30, cacheable=lambda value: value["provider"] == "voyage", clock=clock
+    )
+    assert results.get_or_compute("q", lambda: {"provider": "fallback"}) == {"provider": "fallback"}
+    assert results.get_or_compute("q", lambda: {"provider": "voyage"}) == {"provider": "voyage"}
+    assert results.get_or_compute("q", lambda: {"provider": "unexpected"}) == {"provider": "voyage"}
+    assert results.stats()["uncacheable"] == 1
@@ -0,0 +1,55 @@
+import datetime as dt
+
+import numpy as np
+import pytest
+
+from app.scoring import epoch_micros, normalized_similarity, recency_scores, top_k
+
+
+def reference_top_k(scores, k):
+    # What the handlers did before: a stable sort by descending score.
+    return sorted(range(len(scores)), key=lambda idx: -scores[idx])[:k]
+
+
+@pytest.mark.parametrize("k", [0, 1, 3, 5, 8, 20])
+def test_top_k_keeps_input_order_within_ties(k):
+    scores = np.asarray([0.5, 0.9, 0.5, 0.9, 0.1, 0.5, 0.9, 0.5])
+    assert top_k(scores, k).tolist() == reference_top_k(scores.tolist(), k)
+
+
+def test_top_k_pulls_in_ties_cut_by_the_partition():
+    rng = np.random.default_rng(7)
+    for _ in range(200):
+        scores = rng.integers(0, 4, size=int(rng.integers(1, 40))).astype(np.float64)
+        k = int(rng.integers(1, 12))
+        assert top_k(scores, k).tolist() == reference_top_k(scores.tolist(), k)
+
+
+def test_top_k_of_nothing():
+    assert top_k(np.asarray([], dtype=np.float64), 3).tolist() == []
+
+
+def test_normalized_similarity_maps_the_range_to_one_and_zero():
+    distances = np.asarray([0.2, 0.4, 0.6])
+    assert normalized_similarity(distances, 0.2, 0.6).tolist() == pytest.approx([1.0, 0.5, 0.0])
+
+
+def test_normalized_similarity_with_a_flat_range():
+    assert normalized_similarity(np.asarray([0.3, 0.3]), 0.3, 0.3).tolist() == [1.0, 1.0]
+
+
+def test_recency_matches_whole_days_of_timedelta():
+    now = dt.datetime(2026, 5, 1, 12, 0, tzinfo=dt.timezone.utc)
+    ages = [
+        dt.timedelta(0),
+        dt.timedelta(hours=23, minutes=59),
+        dt.timedelta(days=1),
+        dt.timedelta(days=14, hours=12),
+        dt.timedelta(days=29, hours=23),
+        dt.timedelta(days=30),
+        dt.timedelta(days=400),
+        -dt.timedelta(hours=2),
+    ]
+    latest = np.asarray([epoch_micros(now - age) for age in ages], dtype=np.int64)
+    expected = [max(0.0, 1 - min(age.days / 30, 1)) for age in ages]
+    assert recency_scores(latest, now).tolist() == expected
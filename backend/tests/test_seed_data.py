@@ -0,0 +1,23 @@
+import contextlib
+
+from app import seed_data
+
+
+def test_seed_database_inserts_each_table_in_one_statement(monkeypatch):
+    statements = []
+
+    def execute_values(query, rows, template=None, page_size=1000, fetch=False):
+        statements.append((query.split()[2], len(rows)))
+        return [{"id": index} for index in range(1, len(rows) + 1)] if fetch else []
+
+    monkeypatch.setattr(seed_data, "fetch_all", lambda query, params=None: [])
+    monkeypatch.setattr(seed_data, "execute", lambda query, params=None: statements.append((query.split()[2], 1)))
+    monkeypatch.setattr(seed_data, "execute_values", execute_values)
+    monkeypatch.setattr(seed_data, "transaction", contextlib.nullcontext)
+    monkeypatch.setattr(seed_data, "refresh_social_signals", lambda: None)
+    seed_data.seed_database()
+
+    tables = [table for table, _ in statements]
+    assert tables == ["users", "friends", "products", "friend_events"]
+    assert dict(statements)["friends"] == len(seed_data.FRIENDS)
+    assert dict(statements)["products"] == 200
@@ -0,0 +1,20 @@
+import asyncio
+
+from app import main
+
+
+def test_empty_responses_are_separate_and_complete(monkeypatch):
+    async def embed(texts):
+        return [[0.0] * 4 for _ in texts], "fallback"
+
+    async def no_spellings(category):
+        return ()
+
+    monkeypatch.setattr(main, "aembed_queries_with_provider", embed)
+    monkeypatch.setattr(main, "_category_spellings", no_spellings)
+    responses = asyncio.run(main._semantic_batch([("shoes", "unknown", 5), ("hats", "unknown", 5)]))
+
+    assert responses[0] == {"mode": "semantic", "embeddingProvider": "fallback", "vectorSource": None, "items": []}
+    assert responses[0] is not responses[1]
+    responses[0]["items"].append("mutated")
+    assert responses[1]["items"] == []
@@ -0,0 +1,42 @@
+import datetime as dt
+
+from app.social import _signal_deltas
+
+T0 = dt.datetime(2026, 5, 1, tzinfo=dt.timezone.utc)
+
+
+def event(product_id, event_type="view", strength=0.5, minutes=0, category="Home"):
+    return {
+        "product_id": product_id,
+        "event_type": event_type,
+        "strength": strength,
+        "created_at": T0 + dt.timedelta(minutes=minutes),
+        "category": category,
+    }
+
+
+def test_single_event_becomes_one_delta():
+    assert _signal_deltas([event(1, "purchase", 0.7)]) == [(1, "Home", 0.7, T0, True, 1)]
+
+
+def test_events_for_one_product_fold_into_one_delta():
+    deltas = _signal_deltas(
+        [
+            event(1, "view", 0.4, minutes=5),
+            event(1, "purchase", 0.9, minutes=1),
+            event(1, "view", 0.6, minutes=3),
+        ]
+    )
+    assert deltas == [(1, "Home", 0.9, T0 + dt.timedelta(minutes=5), True, 3)]
+
+
+def test_products_keep_first_seen_order():
+    deltas = _signal_deltas([event(3), event(1, category="Beauty"), event(3, "purchase"), event(2)])
+    assert [delta[0] for delta in deltas] == [3, 1, 2]
+    assert deltas[0][4] is True
+    assert deltas[0][5] == 2
+    assert deltas[1][1] == "Beauty"
+
+
+def test_no_events():
+    assert _signal_deltas([]) == []
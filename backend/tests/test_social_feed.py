@@ -0,0 +1,79 @@
+import datetime as dt
+import random
+
+import numpy as np
+import pytest
+
+from app.db import execute, execute_values, fetch_one
+from app.scoring import epoch_micros, recency_scores
+from app.social import fetch_social_feed, fetch_social_signals, record_event_signals, refresh_social_signals
+
+NOW = dt.datetime(2026, 5, 1, 12, tzinfo=dt.timezone.utc)
+CATEGORIES = ["Home", "Beauty", "Travel"]
+
+
+def scores(rows):
+    strengths = np.asarray([row["strongest_friend"] for row in rows], dtype=np.float64)
+    latest = np.asarray([epoch_micros(row["latest_at"]) for row in rows], dtype=np.int64)
+    weights = np.asarray([1.0 if row["any_purchase"] else 0.6 for row in rows], dtype=np.float64)
+    return 0.45 * strengths + 0.35 * recency_scores(latest, NOW) + 0.2 * weights
+
+
+@pytest.fixture
+def catalog(database):
+    # Few distinct strengths and whole-day ages, so many products tie or sit
+    # within the recency margin of each other; some fall outside the window.
+    rng = random.Random(7)
+    execute_values(
+        "INSERT INTO friends (name, avatar_url, strength) VALUES %s",
+        [(f"friend {index}", "", rng.choice([0.5, 0.7, 0.9])) for index in range(6)],
+    )
+    execute_values(
+        "INSERT INTO products (title, brand, category, price, description) VALUES %s",
+        [(f"product {index}", "brand", CATEGORIES[index % 3], 10, "") for index in range(60)],
+    )
+    events = [
+        (
+            rng.randint(1, 6),
+            rng.randint(1, 60),
+            rng.choice(["view", "purchase"]),
+            NOW - dt.timedelta(days=rng.randint(0, 45), hours=rng.choice([0, 6, 23])),
+        )
+        for _ in range(150)
+    ]
+    execute_values("INSERT INTO friend_events (friend_id, product_id, event_type, created_at) VALUES %s", events)
+    refresh_social_signals()
+
+
+@pytest.mark.parametrize("category", [None, "home", "TRAVEL"])
+@pytest.mark.parametrize("limit", [1, 5, 12, 50])
+def test_feed_candidates_hold_the_exact_top_scores(catalog, category, limit):
+    feed = fetch_social_feed(category, limit=limit, now=NOW)
+
+    everything = fetch_social_signals(range(1, 61))
+    categories = {product_id: CATEGORIES[(product_id - 1) % 3].lower() for product_id in everything}
+    brute = [
+        {
+            "strongest_friend": signal["strongest_friend"],
+            "latest_at": signal["latest_at"],
+            "any_purchase": signal["event_weight"] == 1.0,
+        }
+        for product_id, signal in everything.items()
+        if category is None or categories[product_id] == category.lower()
+    ]
+
+    expected = np.sort(scores(brute))[::-1][:limit]
+    found = np.sort(scores(feed))[::-1][:limit]
+    assert np.allclose(found, expected, atol=1e-6)
+
+
+def test_incremental_signals_follow_a_category_change(database):
+    execute("INSERT INTO friends (name, avatar_url, strength) VALUES ('Ada', '', 0.8)")
+    execute("INSERT INTO products (title, brand, category, price, description) VALUES ('Lamp', 'b', 'Home', 10, '')")
+    event = {"product_id": 1, "category": "Home", "strength": 0.8, "event_type": "view", "created_at": NOW}
+    record_event_signals([event])
+
+    execute("UPDATE products SET category = 'Office' WHERE id = 1")
+    record_event_signals([{**event, "category": "Office"}])
+    assert fetch_one("SELECT category_key FROM product_social_signals WHERE product_id = 1")["category_key"] == "office"
+    assert [row["product_id"] for row in fetch_social_feed("office", limit=5, now=NOW)] == [1]
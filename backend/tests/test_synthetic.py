@@ -0,0 +1,73 @@
+import datetime as dt
+import io
+
+import numpy as np
+
+from app import synthetic
+from app.db import _ChunkStream
+from app.synthetic import SyntheticSpec, _event_chunks, _friend_chunks, _product_chunks, _zipf_cdf
+
+NOW = dt.datetime(2026, 5, 1, 12, tzinfo=dt.timezone.utc)
+SPEC = SyntheticSpec(friends=7, products=11, events=25, chunk_rows=4, history_days=30)
+
+
+def rows(chunks):
+    return [line.split("\t") for chunk in chunks for line in chunk.decode("utf-8").splitlines()]
+
+
+def test_chunks_cover_every_row_in_copy_text_format():
+    rng = np.random.default_rng(1)
+    friends = rows(_friend_chunks(SPEC, rng))
+    products = rows(_product_chunks(SPEC, rng))
+    assert len(friends) == SPEC.friends and all(len(row) == 3 for row in friends)
+    assert len(products) == SPEC.products and all(len(row) == 5 for row in products)
+    assert all(0.3 <= float(strength) <= 0.99 for _, _, strength in friends)
+    assert [title.rsplit(" ", 1)[1] for title, *_ in products] == [str(index) for index in range(1, 12)]
+
+
+def test_events_draw_known_ids_within_the_history():
+    rng = np.random.default_rng(2)
+    friend_ids = np.arange(100, 107)
+    product_ids = np.arange(500, 511)
+    events = rows(_event_chunks(SPEC, rng, friend_ids, product_ids, NOW))
+    assert len(events) == SPEC.events
+    for friend_id, product_id, event_type, created_at in events:
+        assert int(friend_id) in friend_ids and int(product_id) in product_ids
+        assert event_type in {"purchase", "view"}
+        timestamp = dt.datetime.fromisoformat(created_at)
+        assert NOW - dt.timedelta(days=SPEC.history_days) <= timestamp <= NOW
+
+
+def test_generation_is_deterministic_for_a_seed():
+    first = b"".join(_product_chunks(SPEC, np.random.default_rng(SPEC.seed)))
+    second = b"".join(_product_chunks(SPEC, np.random.default_rng(SPEC.seed)))
+    assert first == second
+
+
+def test_zipf_cdf_is_increasing_and_ends_at_one():
+    cdf = _zipf_cdf(50, 1.1)
+    assert np.all(np.diff(cdf) > 0)
+    assert cdf[-1] == 1.0
+    # The most popular rank takes far more than a uniform share.
+    assert cdf[0] > 5 / 50
+
+
+def test_chunk_stream_reads_across_chunk_boundaries():
+    stream = io.BufferedReader(_ChunkStream(iter([b"ab", b"", b"cde", b"f"])), buffer_size=4)
+    assert stream.read(3) == b"abc"
+    assert stream.read() == b"def"
+    assert stream.read() == b""
+
+
+def test_generate_dataset_copies_each_table(monkeypatch):
+    copies = {}
+
+    def copy_rows(table, columns, chunks):
+        copies.setdefault(table, []).extend(rows(chunks))
+
+    ids = {"friends": np.arange(1, 8), "products": np.arange(1, 12)}
+    monkeypatch.setattr(synthetic, "copy_rows", copy_rows)
+    monkeypatch.setattr(synthetic, "_load_ids", ids.__getitem__)
+    monkeypatch.setattr(synthetic, "execute", lambda query: None)
+    assert synthetic.generate_dataset(SPEC, refresh_signals=False) == {"friends": 7, "products": 11, "events": 25}
+    assert {table: len(loaded) for table, loaded in copies.items()} == {"friends": 7, "products": 11, "friend_events": 25}
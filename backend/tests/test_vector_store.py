@@ -0,0 +1,88 @@
+import dataclasses
+
+import pytest
+
+from app import vector_store
+from app.config import get_settings
+
+
+class FakeChroma:
+    def __init__(self, names) -> None:
+        self.names = list(names)
+        self.opened = []
+
+    def list_collections(self):
+        return [type("Collection", (), {"name": name})() for name in self.names]
+
+    def delete_collection(self, name) -> None:
+        self.names.remove(name)
+
+    def get_or_create_collection(self, name, metadata=None):
+        self.opened.append(name)
+        if name not in self.names:
+            self.names.append(name)
+        return name
+
+
+@pytest.fixture
+def store(monkeypatch):
+    # The alias table is one dict entry; checkpoint deletes are recorded.
+    state = {"alias": None, "reads": 0, "deleted_checkpoints": []}
+
+    def fetch_one(query, params):
+        state["reads"] += 1
+        return {"collection": state["alias"]} if state["alias"] else None
+
+    def execute(query, params):
+        if "vector_collection_aliases" in query:
+            state["alias"] = params[1]
+        else:
+            state["deleted_checkpoints"].append(params[0])
+
+    settings = dataclasses.replace(get_settings(), vector_alias_ttl=60, vector_keep_versions=1)
+    monkeypatch.setattr(vector_store, "get_settings", lambda: settings)
+    monkeypatch.setattr(vector_store, "fetch_one", fetch_one)
+    monkeypatch.setattr(vector_store, "execute", execute)
+    for name in ["_live_name", "_collection", "_collection_name"]:
+        monkeypatch.setattr(vector_store, name, None)
+    monkeypatch.setattr(vector_store, "_live_checked_at", 0.0)
+    return state
+
+
+def test_live_name_falls_back_to_the_unversioned_collection(store):
+    assert vector_store.live_collection_name() == vector_store.COLLECTION_NAME
+
+
+def test_alias_is_cached_until_refreshed(store):
+    store["alias"] = "products_v1"
+    assert vector_store.live_collection_name() == "products_v1"
+    store["alias"] = "products_v2"  # flipped by another process
+    assert vector_store.live_collection_name() == "products_v1"
+    assert vector_store.live_collection_name(refresh=True) == "products_v2"
+    assert store["reads"] == 2
+
+
+def test_swap_repoints_the_alias_and_the_local_collection(store, monkeypatch):
+    chroma = FakeChroma(["products_v1", "products_v2"])
+    monkeypatch.setattr(vector_store, "get_chroma_client", lambda: chroma)
+    store["alias"] = "products_v1"
+    assert vector_store.get_collection() == "products_v1"
+
+    vector_store.swap_live_collection("products_v2")
+    assert store["alias"] == "products_v2"
+    assert vector_store.get_collection() == "products_v2"
+    assert store["reads"] == 1  # the swapping process does not wait for the alias TTL
+
+
+def test_old_versions_are_collected_around_the_live_one(store, monkeypatch):
+    chroma = FakeChroma(
+        ["products", "friend_events", "products_v1", "products_v2", "products_v3", "products_v4", "products_v5"]
+    )
+    monkeypatch.setattr(vector_store, "get_chroma_client", lambda: chroma)
+    store["alias"] = "products_v4"
+
+    dropped = vector_store.collect_old_versions()
+    # v3 is kept for rollback and v5 may be a rebuild still in progress.
+    assert sorted(dropped) == ["friend_events", "products", "products_v1", "products_v2"]
+    assert sorted(chroma.names) == ["products_v3", "products_v4", "products_v5"]
+    assert sorted(store["deleted_checkpoints"]) == sorted(dropped)
@@ -0,0 +1,15 @@
+-- The vector index is keyed by product rather than by friend event.
+DO $$
+BEGIN
+  IF EXISTS (
+    SELECT 1 FROM information_schema.columns
+    WHERE table_name = 'vector_rebuild_checkpoints' AND column_name = 'last_event_id'
+  ) THEN
+    ALTER TABLE vector_rebuild_checkpoints RENAME COLUMN last_event_id TO last_id;
+  END IF;
+END
+$$;
+
+-- Rebuild checkpoints from the per-event index cannot be resumed as product rebuilds.
+DELETE FROM vector_rebuild_checkpoints WHERE collection LIKE 'friend\_events%';
+DELETE FROM vector_collection_aliases WHERE alias = 'friend_events';
@@ -0,0 +1,10 @@
+-- Products waiting for the background vectorization worker. One row per product:
+-- repeated events for a product collapse into a single pending job.
+CREATE TABLE IF NOT EXISTS vector_jobs (
+  product_id INTEGER PRIMARY KEY REFERENCES products(id) ON DELETE CASCADE,
+  enqueued_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+  attempts INTEGER NOT NULL DEFAULT 0,
+  locked_until TIMESTAMPTZ NOT NULL DEFAULT 'epoch'
+);
+
+CREATE INDEX IF NOT EXISTS idx_vector_jobs_locked_until ON vector_jobs(locked_until);
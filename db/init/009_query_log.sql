@@ -0,0 +1,12 @@
+-- Search frequencies merged from every backend process's in-memory heavy-hitters
+-- log; the head of this table is what the pre-warmer keeps cached.
+CREATE TABLE IF NOT EXISTS query_log (
+  query TEXT NOT NULL,
+  category TEXT NOT NULL DEFAULT '',
+  page_size INTEGER NOT NULL,
+  hits BIGINT NOT NULL DEFAULT 0,
+  last_seen TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+  PRIMARY KEY (query, category, page_size)
+);
+
+CREATE INDEX IF NOT EXISTS idx_query_log_hits ON query_log(hits DESC);
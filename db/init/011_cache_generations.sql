@@ -0,0 +1,9 @@
+-- Invalidation counters for in-process result caches. Writers bump the row in
+-- the same transaction as their write; every API process re-reads it at most
+-- once per RESULT_CACHE_GENERATION_TTL seconds and drops entries when it moves.
+CREATE TABLE IF NOT EXISTS cache_generations (
+    name TEXT PRIMARY KEY,
+    generation BIGINT NOT NULL DEFAULT 0
+);
+
+INSERT INTO cache_generations (name) VALUES ('recommendations') ON CONFLICT (name) DO NOTHING;
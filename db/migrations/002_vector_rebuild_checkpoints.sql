@@ -0,0 +1,6 @@
+CREATE TABLE IF NOT EXISTS vector_rebuild_checkpoints (
+  collection TEXT PRIMARY KEY,
+  last_event_id INTEGER NOT NULL DEFAULT 0,
+  completed BOOLEAN NOT NULL DEFAULT FALSE,
+  updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
@@ -0,0 +1,5 @@
+CREATE TABLE IF NOT EXISTS vector_collection_aliases (
+  alias TEXT PRIMARY KEY,
+  collection TEXT NOT NULL,
+  updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
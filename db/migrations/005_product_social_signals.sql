@@ -0,0 +1,53 @@
+-- Per-product aggregate of friend activity, maintained incrementally on ingest.
+-- base_score is the time-independent part of the social feed score
+-- (0.45 * strongest_friend + 0.2 * event_weight); recency_key adds the recency
+-- term as a linear function of latest_at, so ordering by it ranks products
+-- inside the 30-day recency window without recomputing anything at read time.
+CREATE TABLE IF NOT EXISTS product_social_signals (
+  product_id INTEGER PRIMARY KEY REFERENCES products(id) ON DELETE CASCADE,
+  category_key TEXT NOT NULL,
+  strongest_friend REAL NOT NULL,
+  latest_at TIMESTAMPTZ NOT NULL,
+  any_purchase BOOLEAN NOT NULL,
+  event_count INTEGER NOT NULL,
+  base_score DOUBLE PRECISION NOT NULL,
+  recency_key DOUBLE PRECISION NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_product_social_signals_recency ON product_social_signals(recency_key DESC);
+CREATE INDEX IF NOT EXISTS idx_product_social_signals_category_recency
+  ON product_social_signals(category_key, recency_key DESC);
+CREATE INDEX IF NOT EXISTS idx_product_social_signals_base ON product_social_signals(base_score DESC);
+CREATE INDEX IF NOT EXISTS idx_product_social_signals_category_base
+  ON product_social_signals(category_key, base_score DESC);
+CREATE INDEX IF NOT EXISTS idx_friend_events_product_created
+  ON friend_events(product_id, created_at DESC);
+
+INSERT INTO product_social_signals (
+  product_id, category_key, strongest_friend, latest_at, any_purchase, event_count, base_score, recency_key
+)
+SELECT
+  agg.product_id,
+  agg.category_key,
+  agg.strongest_friend,
+  agg.latest_at,
+  agg.any_purchase,
+  agg.event_count,
+  agg.base_score,
+  agg.base_score + 0.35 * EXTRACT(EPOCH FROM agg.latest_at) / 2592000.0
+FROM (
+  SELECT
+    friend_events.product_id,
+    lower(products.category) AS category_key,
+    MAX(friends.strength) AS strongest_friend,
+    MAX(friend_events.created_at) AS latest_at,
+    BOOL_OR(friend_events.event_type = 'purchase') AS any_purchase,
+    COUNT(*) AS event_count,
+    0.45 * MAX(friends.strength)
+      + 0.2 * CASE WHEN BOOL_OR(friend_events.event_type = 'purchase') THEN 1.0 ELSE 0.6 END AS base_score
+  FROM friend_events
+  JOIN friends ON friends.id = friend_events.friend_id
+  JOIN products ON products.id = friend_events.product_id
+  GROUP BY friend_events.product_id, products.category
+) agg
+ON CONFLICT (product_id) DO NOTHING;
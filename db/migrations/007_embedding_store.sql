@@ -0,0 +1,10 @@
+-- Provider embeddings keyed by sha256(model, input_type, text), so rebuilds and
+-- re-ingests only pay the embedding API for text it has not seen before.
+-- Vectors are little-endian float32.
+CREATE TABLE IF NOT EXISTS embedding_store (
+  key BYTEA PRIMARY KEY,
+  model TEXT NOT NULL,
+  input_type TEXT NOT NULL,
+  embedding BYTEA NOT NULL,
+  created_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
@@ -0,0 +1,22 @@
+-- Row change stamps for the in-process catalog cache, which re-reads only rows
+-- whose updated_at moved since its last refresh.
+ALTER TABLE products ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW();
+ALTER TABLE friends ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW();
+
+CREATE OR REPLACE FUNCTION touch_updated_at() RETURNS TRIGGER AS $$
+BEGIN
+  NEW.updated_at := NOW();
+  RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS products_touch_updated_at ON products;
+CREATE TRIGGER products_touch_updated_at BEFORE UPDATE ON products
+  FOR EACH ROW EXECUTE FUNCTION touch_updated_at();
+
+DROP TRIGGER IF EXISTS friends_touch_updated_at ON friends;
+CREATE TRIGGER friends_touch_updated_at BEFORE UPDATE ON friends
+  FOR EACH ROW EXECUTE FUNCTION touch_updated_at();
+
+CREATE INDEX IF NOT EXISTS idx_products_updated_at ON products(updated_at);
+CREATE INDEX IF NOT EXISTS idx_friends_updated_at ON friends(updated_at);
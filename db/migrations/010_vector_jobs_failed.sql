@@ -0,0 +1,6 @@
+-- Jobs that failed vector_worker_max_attempts times are kept for inspection but
+-- no longer claimed or counted towards the queue bound. A later ingest of the
+-- product requeues its job; to retry by hand, clear failed_at and attempts.
+ALTER TABLE vector_jobs ADD COLUMN IF NOT EXISTS failed_at TIMESTAMPTZ;
+
+CREATE INDEX IF NOT EXISTS idx_vector_jobs_pending ON vector_jobs(locked_until) WHERE failed_at IS NULL;
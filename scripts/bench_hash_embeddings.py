@@ -0,0 +1,72 @@
+import argparse
+import hashlib
+import math
+import random
+import sys
+import time
+
+import numpy as np
+
+sys.path.append("backend")
+
+from app.embeddings import hash_embeddings  # noqa: E402
+from app.seed_data import BRANDS, PRODUCT_CATEGORIES, _random_description  # noqa: E402
+
+
+def reference_hash_embedding(text: str, dim: int = 256) -> list[float]:
+    # The original per-text implementation, kept here as the correctness oracle.
+    tokens = [t for t in text.lower().split() if t.strip()]
+    vector = [0.0] * dim
+    for token in tokens:
+        digest = hashlib.sha256(token.encode("utf-8")).digest()
+        for idx in range(0, len(digest), 4):
+            bucket = digest[idx] % dim
+            value = int.from_bytes(digest[idx : idx + 4], "little") % 1000
+            vector[bucket] += value / 1000.0
+    norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+    return [v / norm for v in vector]
+
+
+def synthetic_documents(count: int, seed: int) -> list[str]:
+    random.seed(seed)
+    documents = []
+    for idx in range(count):
+        category = random.choice(list(PRODUCT_CATEGORIES))
+        item = random.choice(PRODUCT_CATEGORIES[category])
+        title = f"{random.choice(BRANDS)} {item.title()} {idx % 997}"
+        documents.append(f"{title} {_random_description(category, item)}")
+    return documents
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the fallback hash embedder.")
+    parser.add_argument("--docs", type=int, default=100_000)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    documents = synthetic_documents(args.docs, args.seed)
+
+    start = time.perf_counter()
+    reference = [reference_hash_embedding(text) for text in documents]
+    reference_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    batched = hash_embeddings(documents, dtype=np.float64)
+    batched_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    hash_embeddings(documents)
+    float32_seconds = time.perf_counter() - start
+
+    identical = np.array_equal(np.asarray(reference, dtype=np.float64), batched)
+    print(f"documents:          {args.docs}")
+    print(f"reference (python): {reference_seconds:.2f}s")
+    print(f"batched float64:    {batched_seconds:.2f}s ({reference_seconds / batched_seconds:.1f}x)")
+    print(f"batched float32:    {float32_seconds:.2f}s ({reference_seconds / float32_seconds:.1f}x)")
+    print(f"bit-identical:      {identical}")
+    if not identical:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,257 @@
+"""End-to-end latency/throughput benchmark for the phiademo backend.
+
+By default the app is driven in-process through FastAPI's TestClient with an
+in-memory Chroma (CHROMA_URL=memory://) and the deterministic hash embedder, so
+only a local Postgres is needed (DB_URL). Use a dedicated database: the run
+seeds it, ingests events and repoints the live vector collection. Pass
+--base-url to benchmark a running server over HTTP instead (DB_URL is still
+read to pick friend/product ids for ingest).
+
+    python scripts/benchmark.py --concurrency 16 --requests 500 --output bench.json
+    python scripts/benchmark.py --baseline bench.json --threshold 0.10
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+
+os.environ.setdefault("CHROMA_URL", "memory://")
+if "--keep-voyage" not in sys.argv:
+    os.environ["VOYAGE_API_KEY"] = ""
+
+sys.path.append("backend")
+
+QUERIES = ["serum", "lamp", "headphones", "carry-on", "yoga mat", "sneakers", "coffee maker", "travel kit"]
+CATEGORIES = ["Beauty", "Home", "Electronics", "Travel", "Fitness", "Fashion"]
+SCENARIOS = ["semantic", "social", "category", "ingest", "rebuild"]
+
+
+def percentile(samples: list[float], pct: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = (len(ordered) - 1) * pct / 100
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+class Driver:
+    # In process, one TestClient is entered for the whole run: startup and
+    # shutdown handlers run once and every worker thread's request goes through
+    # its portal onto a single event loop, as it would under uvicorn.
+    def __init__(self, base_url: str | None, ready_timeout: float = 120.0) -> None:
+        self.base_url = base_url.rstrip("/") if base_url else None
+        self.ready_timeout = ready_timeout
+        self._client = None
+
+    def __enter__(self) -> "Driver":
+        if self.base_url is None:
+            from fastapi.testclient import TestClient
+
+            from app.main import app
+
+            self._client = TestClient(app)
+            self._client.__enter__()
+        try:
+            self.wait_ready()
+        except BaseException:
+            self.__exit__(None, None, None)
+            raise
+        return self
+
+    def wait_ready(self) -> None:
+        # Startup warms caches in the background; timing before /api/ready says so
+        # would measure the warmup instead of the app.
+        deadline = time.monotonic() + self.ready_timeout
+        while True:
+            try:
+                if self.request("GET", "/api/ready") == 200:
+                    return
+            except (urllib.error.URLError, OSError):
+                pass
+            if time.monotonic() >= deadline:
+                raise SystemExit(f"/api/ready did not report ready within {self.ready_timeout:g}s; not benchmarking.")
+            time.sleep(0.5)
+
+    def __exit__(self, *exc_info) -> None:
+        if self._client is not None:
+            self._client.__exit__(*exc_info)
+            self._client = None
+
+    def request(self, method: str, path: str, body: dict | None = None) -> int:
+        if self.base_url is None:
+            response = self._client.request(method, path, json=body)
+            return response.status_code
+        data = json.dumps(body).encode("utf-8") if body is not None else None
+        request = urllib.request.Request(
+            f"{self.base_url}{path}", data=data, method=method, headers={"Content-Type": "application/json"}
+        )
+        with urllib.request.urlopen(request, timeout=60) as response:
+            response.read()
+            return response.status
+
+
+def run_load(name: str, call: Callable[[int], int], total: int, concurrency: int) -> dict:
+    latencies: list[float] = []
+    errors = 0
+    lock = threading.Lock()
+
+    def one(index: int) -> None:
+        nonlocal errors
+        started = time.perf_counter()
+        try:
+            status = call(index)
+            failed = status >= 400
+        except Exception:
+            failed = True
+        elapsed = (time.perf_counter() - started) * 1000
+        with lock:
+            latencies.append(elapsed)
+            errors += failed
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(total)))
+    wall = time.perf_counter() - started
+    return {
+        "scenario": name,
+        "requests": total,
+        "concurrency": concurrency,
+        "errors": errors,
+        "rps": total / wall if wall else 0.0,
+        "p50_ms": percentile(latencies, 50),
+        "p95_ms": percentile(latencies, 95),
+        "p99_ms": percentile(latencies, 99),
+        "mean_ms": statistics.fmean(latencies) if latencies else 0.0,
+    }
+
+
+def build_scenarios(driver: Driver, rng: random.Random) -> dict[str, Callable[[int], int]]:
+    from app.db import fetch_all
+
+    friend_ids = [row["id"] for row in fetch_all("SELECT id FROM friends ORDER BY id LIMIT 1000")]
+    product_ids = [row["id"] for row in fetch_all("SELECT id FROM products ORDER BY id LIMIT 5000")]
+
+    def semantic(index: int) -> int:
+        return driver.request("GET", f"/api/recommendations?q={QUERIES[index % len(QUERIES)]}&limit=12")
+
+    def social(index: int) -> int:
+        return driver.request("GET", "/api/recommendations?limit=12")
+
+    def category(index: int) -> int:
+        query = QUERIES[index % len(QUERIES)]
+        return driver.request(
+            "GET", f"/api/recommendations?q={query}&category={CATEGORIES[index % len(CATEGORIES)]}&limit=12"
+        )
+
+    def ingest(index: int) -> int:
+        body = {
+            "friend_id": rng.choice(friend_ids),
+            "product_id": rng.choice(product_ids),
+            "event_type": "purchase" if index % 3 == 0 else "view",
+        }
+        return driver.request("POST", "/api/ingest", body)
+
+    def rebuild(index: int) -> int:
+        from app.seed_data import rebuild_vector_store
+
+        rebuild_vector_store(resume=False)
+        return 200
+
+    return {"semantic": semantic, "social": social, "category": category, "ingest": ingest, "rebuild": rebuild}
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list[str]:
+    regressions = []
+    previous = {entry["scenario"]: entry for entry in baseline.get("scenarios", [])}
+    for entry in results["scenarios"]:
+        base = previous.get(entry["scenario"])
+        if not base:
+            continue
+        for metric in ("p50_ms", "p95_ms", "p99_ms"):
+            if base[metric] > 0 and entry[metric] > base[metric] * (1 + threshold):
+                regressions.append(
+                    f"{entry['scenario']}: {metric} {base[metric]:.1f} -> {entry[metric]:.1f} "
+                    f"(+{(entry[metric] / base[metric] - 1) * 100:.0f}%)"
+                )
+        if base["rps"] > 0 and entry["rps"] < base["rps"] * (1 - threshold):
+            regressions.append(
+                f"{entry['scenario']}: rps {base['rps']:.1f} -> {entry['rps']:.1f} "
+                f"(-{(1 - entry['rps'] / base['rps']) * 100:.0f}%)"
+            )
+        if entry["errors"] > base.get("errors", 0):
+            regressions.append(f"{entry['scenario']}: errors {base.get('errors', 0)} -> {entry['errors']}")
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help=f"comma-separated subset of {SCENARIOS}")
+    parser.add_argument("--requests", type=int, default=300, help="requests per HTTP scenario")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--rebuilds", type=int, default=3, help="timed rebuild_vector_store runs")
+    parser.add_argument("--warmup", type=int, default=20, help="untimed requests per scenario")
+    parser.add_argument("--base-url", help="benchmark a running server instead of the in-process app")
+    parser.add_argument("--ready-timeout", type=float, default=120.0, help="seconds to wait for /api/ready")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--output", help="write results as JSON to this path")
+    parser.add_argument("--baseline", help="compare against a previous JSON result")
+    parser.add_argument("--threshold", type=float, default=0.10, help="allowed relative regression (0.10 = 10%%)")
+    parser.add_argument("--keep-voyage", action="store_true", help="use VOYAGE_API_KEY instead of hash embeddings")
+    args = parser.parse_args()
+
+    if args.base_url is None:
+        from app.seed_data import ensure_seeded, ensure_vector_ready
+
+        ensure_seeded()
+        ensure_vector_ready()
+
+    with Driver(args.base_url, args.ready_timeout) as driver:
+        scenarios = build_scenarios(driver, random.Random(args.seed))
+        results = {
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "target": args.base_url or "in-process",
+            "python": platform.python_version(),
+            "scenarios": [],
+        }
+
+        for name in [item.strip() for item in args.scenarios.split(",") if item.strip()]:
+            if name not in scenarios:
+                parser.error(f"unknown scenario {name!r}")
+            if name == "rebuild":
+                entry = run_load(name, scenarios[name], args.rebuilds, 1)
+            else:
+                for index in range(args.warmup):
+                    scenarios[name](index)
+                entry = run_load(name, scenarios[name], args.requests, args.concurrency)
+            results["scenarios"].append(entry)
+            print(
+                f"{name:<9} rps={entry['rps']:8.1f}  p50={entry['p50_ms']:8.1f}ms  "
+                f"p95={entry['p95_ms']:8.1f}ms  p99={entry['p99_ms']:8.1f}ms  errors={entry['errors']}"
+            )
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as handle:
+            json.dump(results, handle, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as handle:
+            regressions = compare(results, json.load(handle), args.threshold)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
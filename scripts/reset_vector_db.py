@@ -1,3 +1,4 @@
+import logging
 import sys
 
 sys.path.append("backend")
@@ -6,4 +7,5 @@ from app.seed_data import rebuild_vector_store  # noqa: E402
 
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
     rebuild_vector_store()
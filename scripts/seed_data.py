@@ -1,9 +1,43 @@
+import argparse
+import logging
 import sys
 
 sys.path.append("backend")
 
 from app.seed_data import seed_database  # noqa: E402
+from app.synthetic import SyntheticSpec, generate_dataset  # noqa: E402
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Seed the demo dataset, or stream a large synthetic dataset when any size is given."
+    )
+    parser.add_argument("--friends", type=int, help="number of synthetic friends (e.g. 10000)")
+    parser.add_argument("--products", type=int, help="number of synthetic products (e.g. 1000000)")
+    parser.add_argument("--events", type=int, help="number of synthetic friend events (e.g. 100000000)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--chunk-rows", type=int, default=SyntheticSpec.chunk_rows)
+    parser.add_argument("--product-skew", type=float, default=SyntheticSpec.product_skew)
+    parser.add_argument("--friend-skew", type=float, default=SyntheticSpec.friend_skew)
+    parser.add_argument("--skip-signals", action="store_true", help="do not rebuild product_social_signals")
+    args = parser.parse_args()
+
+    if args.friends is None and args.products is None and args.events is None:
+        seed_database()
+        return
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    spec = SyntheticSpec(
+        friends=args.friends if args.friends is not None else SyntheticSpec.friends,
+        products=args.products if args.products is not None else SyntheticSpec.products,
+        events=args.events if args.events is not None else SyntheticSpec.events,
+        seed=args.seed,
+        chunk_rows=args.chunk_rows,
+        product_skew=args.product_skew,
+        friend_skew=args.friend_skew,
+    )
+    print(generate_dataset(spec, refresh_signals=not args.skip_signals))
 
 
 if __name__ == "__main__":
-    seed_database()
+    main()
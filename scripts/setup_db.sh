@@ -7,7 +7,9 @@ if [[ -z "${DB_URL:-}" ]]; then
 fi
 
 echo "Running migrations..."
-psql "${DB_URL}" -f db/migrations/001_init.sql
+for migration in db/migrations/*.sql; do
+  psql "${DB_URL}" -v ON_ERROR_STOP=1 -f "${migration}"
+done
 
 echo "Seeding relational data..."
 python scripts/seed_data.py